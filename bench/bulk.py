@@ -0,0 +1,67 @@
+"""
+Bulk construction benchmark.
+
+Compares the best time of a number of runs to build instances from rows
+of values: with the generic `Model.__init__`, with the generated
+`__init__` of a model class, and with `Model.bulk_create`, from tuples
+and from dicts.
+
+    python bench/bulk.py [--runs N] [--count N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydynasync import attributes as A, models as M  # noqa: E402
+
+
+class Reading(M.Model):
+
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Number()
+    flagged = A.Boolean(nullable=True)
+    note = A.String(nullable=True)
+
+
+def best(func, runs):
+    return min(timeit.repeat(func, number=1, repeat=runs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args(argv)
+    names = [name for name, _ in Reading._attributes]
+    rows = [(f'sensor-{i % 100}', i, i / 10, False, 'ok')
+            for i in range(args.count)]
+    dicts = [dict(zip(names, row)) for row in rows]
+    generated = Reading.__init__
+
+    def generic():
+        Reading.__init__ = M.Model.__init__
+        try:
+            return [Reading(**row) for row in dicts]
+        finally:
+            Reading.__init__ = generated
+
+    times = [
+        ('Model.__init__', best(generic, args.runs)),
+        ('generated __init__', best(
+            lambda: [Reading(**row) for row in dicts], args.runs)),
+        ('bulk_create tuples', best(
+            lambda: Reading.bulk_create(rows), args.runs)),
+        ('bulk_create dicts', best(
+            lambda: Reading.bulk_create(dicts), args.runs)),
+    ]
+    print(f'{args.count} instances, best of {args.runs} runs')
+    for label, seconds in times:
+        print(f'{label:20} {seconds:8.3f}s  {times[0][1] / seconds:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
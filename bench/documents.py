@@ -0,0 +1,77 @@
+"""
+Document codec benchmark.
+
+Times `documents.encode` and `documents.decode` on a wide document (a map
+of many small maps and lists) and on deep documents (many documents nested
+to the maximum depth), reporting the best time of a number of runs and the
+rate in document nodes per second.
+
+    python bench/documents.py [--runs N] [--width N]
+"""
+import argparse
+import decimal
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydynasync import documents  # noqa: E402
+
+
+def wide(width):
+    return {
+        f'key{i}': {
+            'name': f'item {i}', 'count': i, 'price': decimal.Decimal('9.99'),
+            'flags': [True, False, None], 'tags': {'a', 'b'},
+        }
+        for i in range(width)
+    }
+
+
+def deep(count, depth=documents.DEFAULT_MAX_DEPTH):
+    def one(i):
+        value = i
+        for level in range(depth):
+            value = [value, level] if level % 2 else {'k': value, 'n': 'x'}
+        return value
+    return [one(i) for i in range(count)]
+
+
+def count_nodes(typed):
+    nodes = 0
+    stack = [typed]
+    while stack:
+        (tag, data), = stack.pop().items()
+        nodes += 1
+        if tag == 'L':
+            stack.extend(data)
+        elif tag == 'M':
+            stack.extend(data.values())
+    return nodes
+
+
+def report(name, value, runs):
+    # the deep documents are in a list, so allow one more level
+    max_depth = documents.DEFAULT_MAX_DEPTH + 1
+    typed = documents.encode(value, max_depth=max_depth)
+    nodes = count_nodes(typed)
+    for label, func, arg in (('encode', documents.encode, value),
+                             ('decode', documents.decode, typed)):
+        best = min(timeit.repeat(lambda: func(arg, max_depth=max_depth),
+                                 number=1, repeat=runs))
+        print(f'{name:<6} {label}  {nodes:>8} nodes  {best * 1000:8.1f} ms  '
+              f'{nodes / best / 1e6:6.2f} M nodes/s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--width', type=int, default=10000)
+    args = parser.parse_args(argv)
+    report('wide', wide(args.width), args.runs)
+    report('deep', deep(args.width // 10), args.runs)
+
+
+if __name__ == '__main__':
+    main()
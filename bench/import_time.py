@@ -0,0 +1,76 @@
+"""
+Import-time benchmark.
+
+Imports each module in a fresh interpreter with `python -X importtime`,
+and reports the best cumulative import time of the module over a number of
+runs. Fails (with exit status 1) if a module that should be cheap to import
+pulls in boto3 or botocore, or if a time exceeds `--budget` milliseconds.
+
+    python bench/import_time.py [--runs N] [--budget MS] [module ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# modules that must not import the client stack
+LIGHT_MODULES = (
+    'pydynasync.types', 'pydynasync.attributes', 'pydynasync.models',
+    'pydynasync.table', 'pydynasync.memory', 'pydynasync.exp',
+    'pydynasync.devguide', 'pydynasync.provision',
+)
+HEAVY_MODULES = ('boto3', 'botocore')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """
+    Import `module` in a new interpreter, returning a dict of the
+    cumulative import time (in microseconds) of each module imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, stderr=subprocess.PIPE, check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        # "import time: <self us> | <cumulative us> | <indented name>"
+        fields = line.split('|')
+        if len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('modules', nargs='*', default=LIGHT_MODULES)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None,
+                        help='maximum import time in milliseconds')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        best = None
+        for _ in range(args.runs):
+            times = import_times(module)
+            heavy = [name for name in HEAVY_MODULES if name in times]
+            if best is None or times[module] < best:
+                best = times[module]
+        status = ''
+        if heavy:
+            status = 'imports ' + ', '.join(heavy)
+            failed = True
+        elif args.budget is not None and best / 1000 > args.budget:
+            status = f'over budget of {args.budget:g} ms'
+            failed = True
+        print(f'{module:<24} {best / 1000:8.1f} ms  {status}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
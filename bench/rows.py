@@ -0,0 +1,69 @@
+"""
+Read-only rows benchmark.
+
+Compares loading items as model instances and as read-only rows: the best
+time of a number of runs to load them all, and the memory they take.
+
+    python bench/rows.py [--runs N] [--count N]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydynasync import attributes as A, models as M, rows  # noqa: E402
+
+
+class Reading(M.Model):
+
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Number()
+    flagged = A.Boolean(nullable=True)
+    tags = A.StringSet(nullable=True)
+
+
+def best(func, runs):
+    return min(timeit.repeat(func, number=1, repeat=runs))
+
+
+def memory(func):
+    tracemalloc.start()
+    try:
+        loaded = func()
+        return tracemalloc.get_traced_memory()[0], loaded
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args(argv)
+    items = [
+        Reading(sensor=f'sensor-{i % 100}', taken=i, celsius=i % 400,
+                flagged=False, tags={'a'}).to_item()
+        for i in range(args.count)
+    ]
+    row_class = rows.row_class(Reading)
+
+    def instances():
+        return [Reading.from_item(item) for item in items]
+
+    def read_only():
+        return [row_class.from_item(item) for item in items]
+
+    print(f'{args.count} items, best of {args.runs} runs')
+    for label, func in (('instances', instances), ('rows', read_only)):
+        seconds = best(func, args.runs)
+        size, _ = memory(func)
+        print(f'{label:10} {seconds:8.3f}s {size / args.count:8.0f} '
+              'bytes/item')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Snapshot benchmark.
+
+Compares a snapshot of model instances with JSON of their typed items:
+the size of each, and the best time of a number of runs to write it, to
+read all of it back as instances, and to read the first instance and count
+the rest from a memory-mapped snapshot file.
+
+    python bench/snapshot.py [--runs N] [--count N]
+"""
+import argparse
+import decimal
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydynasync import attributes as A, models as M, snapshot  # noqa: E402
+
+
+class Reading(M.Model):
+
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Decimal()
+    tags = A.StringSet(nullable=True)
+    extra = A.Map(nullable=True)
+
+
+def readings(count):
+    return [
+        Reading(sensor=f'sensor-{i % 100}', taken=1500000000 + i,
+                celsius=decimal.Decimal(i % 400) / 10, tags={'a', 'b'},
+                extra={'count': i, 'note': 'ok'})
+        for i in range(count)
+    ]
+
+
+def best(func, runs):
+    return min(timeit.repeat(func, number=1, repeat=runs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--count', type=int, default=50000)
+    args = parser.parse_args(argv)
+    values = readings(args.count)
+
+    as_json = json.dumps([r.to_item() for r in values])
+    data = snapshot.dumps(values, model=Reading)
+    with tempfile.NamedTemporaryFile(suffix='.snapshot') as file:
+        file.write(data)
+        file.flush()
+
+        def first():
+            with snapshot.Snapshot.open(file.name, model=Reading) as snap:
+                next(iter(snap))
+                len(snap)
+
+        rows = [
+            ('size', f'{len(as_json):>10,d} B', f'{len(data):>10,d} B'),
+            ('write', best(lambda: json.dumps([r.to_item() for r in values]),
+                           args.runs),
+             best(lambda: snapshot.dumps(values, model=Reading), args.runs)),
+            ('read', best(lambda: [Reading.from_item(item)
+                                   for item in json.loads(as_json)],
+                          args.runs),
+             best(lambda: snapshot.loads(data, model=Reading), args.runs)),
+            ('first', best(lambda: Reading.from_item(json.loads(as_json)[0]),
+                           args.runs),
+             best(first, args.runs)),
+        ]
+    print(f'{args.count} instances      JSON    snapshot')
+    for name, json_result, snapshot_result in rows:
+        if name != 'size':
+            json_result = f'{json_result * 1000:8.1f} ms'
+            snapshot_result = f'{snapshot_result * 1000:8.1f} ms'
+        print(f'{name:<8} {json_result:>12} {snapshot_result:>12}')
+
+
+if __name__ == '__main__':
+    main()
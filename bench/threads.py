@@ -0,0 +1,91 @@
+"""
+Multithreaded attribute access benchmark.
+
+Times threads that each set and get attributes of their own model
+instances (so change tracking is exercised, but no state is shared between
+threads), for each of a number of thread counts, reporting the best time
+of a number of runs, the rate in operations per second and the speedup
+over one thread. Whether the GIL is enabled is reported too: with the GIL,
+throughput stays flat as threads are added; on a free-threaded build it
+should scale with them.
+
+    python bench/threads.py [--runs N] [--ops N] [--threads N [N ...]]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydynasync import attributes as A, models as M  # noqa: E402
+
+
+class Reading(M.Model):
+
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Integer()
+    note = A.String(nullable=True)
+
+
+def work(ops, instances=100):
+    readings = [Reading(sensor='s', taken=i, celsius=0)
+                for i in range(instances)]
+    for reading in readings:
+        M.ModelMeta.set_saved(reading)
+    for i in range(ops // (2 * instances)):
+        for reading in readings:
+            # a set (which updates the changes) and a get
+            reading.celsius = i
+            reading.note = reading.note
+        M.ModelMeta.get_changed(readings[0])
+
+
+def run(threads, ops):
+    """
+    Time `threads` threads each doing `ops` operations, in seconds.
+    """
+    barrier = threading.Barrier(threads + 1)
+
+    def target():
+        barrier.wait()
+        work(ops)
+
+    workers = [threading.Thread(target=target) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def gil_enabled():
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--ops', type=int, default=200000,
+                        help='operations per thread')
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+    print(f'Python {sys.version.split()[0]}, GIL '
+          f'{"enabled" if gil_enabled() else "disabled"}')
+    base = None
+    for threads in args.threads:
+        best = min(run(threads, args.ops) for _ in range(args.runs))
+        rate = threads * args.ops / best
+        base = base or rate / threads
+        print(f'{threads:>3} threads  {best * 1000:8.1f} ms  '
+              f'{rate / 1e6:6.2f} M ops/s  {rate / base:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
 import abc
 import collections.abc
+import datetime
 import decimal
 import weakref
 
-from . import ddb, types, util
+from . import ddb, documents, tracking, types, util
 
 # TODO: maybe change 'nullable' to 'required', with semantics of
 # allowing None for scalars, empty set for set types, and empty
@@ -17,6 +18,8 @@ def check_number_range(value):
 
 class SetAttributeMixin:
 
+    TRACKED_TYPE = tracking.TrackedSet
+
     def __init__(self, *args, **kwargs):
         if kwargs.get('hash_key') or kwargs.get('range_key'):
             raise TypeError("Set attribute cannot be used as a "
@@ -36,6 +39,128 @@ class SetAttributeMixin:
         return value
 
 
+class InstanceState:
+
+    """
+    The attribute values, original values and changes of a model instance,
+    kept on the instance (as `_state`) and indexed by attribute index.
+    Absent values are `util.NOTFOUND`.
+    """
+
+    __slots__ = ('values', 'original', 'changed', 'shard')
+
+    def __init__(self, size):
+        self.values = [util.NOTFOUND] * size
+        self.original = [util.NOTFOUND] * size
+        # bitmask of changed attributes
+        self.changed = 0
+        # shard of the item's hash key, if its model shards them
+        self.shard = None
+
+
+def get_state(instance):
+    """
+    Get the `InstanceState` of a model instance, creating it if needed (for
+    an instance that was made without calling `__init__`).
+    """
+    try:
+        return instance._state
+    except AttributeError:
+        state = instance._state = InstanceState(
+            len(type(instance)._attributes))
+        return state
+
+
+class InstanceValues:
+
+    """
+    A mapping-like view of the values (or original values) of one
+    attribute on instances, which are kept in each instance's state.
+    """
+
+    __slots__ = ('attribute', 'field')
+
+    def __init__(self, attribute, field):
+        self.attribute = attribute
+        self.field = field
+
+    def _values(self, instance):
+        return getattr(get_state(instance), self.field)
+
+    def get(self, instance, default=None):
+        value = self._values(instance)[self.attribute._index]
+        return default if value is util.NOTFOUND else value
+
+    def __getitem__(self, instance):
+        value = self._values(instance)[self.attribute._index]
+        if value is util.NOTFOUND:
+            raise KeyError(instance)
+        return value
+
+    def __setitem__(self, instance, value):
+        self._values(instance)[self.attribute._index] = value
+
+    def __contains__(self, instance):
+        index = self.attribute._index
+        return self._values(instance)[index] is not util.NOTFOUND
+
+    def pop(self, instance, default=None):
+        values = self._values(instance)
+        index = self.attribute._index
+        value, values[index] = values[index], util.NOTFOUND
+        return default if value is util.NOTFOUND else value
+
+
+class TrackedAttributeMixin:
+
+    """
+    Mixin for attributes whose values are held in a `tracking` container
+    of type `TRACKED_TYPE`, which marks the attribute changed when it is
+    mutated.
+
+    Assigning a value stores a tracked copy of it, and marks the attribute
+    changed without comparing the value to the original.
+    """
+
+    TRACKED_TYPE = None
+
+    def _track(self, instance, value):
+        if value is None or value is util.NOTSET or value is util.NOTFOUND:
+            return value
+        return self.TRACKED_TYPE(value, instance, self)
+
+    def reset(self, instance, value):
+        if (isinstance(value, tracking.Tracked) and
+                value.owned_by(instance, self)):
+            value.saved()
+        else:
+            value = self._track(instance, value)
+        super().reset(instance, value)
+
+    def __set__(self, instance, value):
+        value = self._check(value)
+        # augmented assignment (`instance.tags |= ...`) assigns the same
+        # container, whose changes are already tracked
+        if (value is not None and
+                value is get_state(instance).values[self._index]):
+            return
+        value = self._track(instance, value)
+        if value is not None:
+            value.replaced = True
+        self._mark_changed(instance)
+        self._set(instance, value)
+
+    def _restore(self, instance, value, original):
+        # the changes made to a container aren't kept, so a changed one is
+        # written whole
+        state = get_state(instance)
+        tracked = self._track(instance, value)
+        if isinstance(tracked, tracking.Tracked):
+            tracked.replaced = bool(state.changed & (1 << self._index))
+        super()._restore(instance, tracked,
+                         tracked if original is value else original)
+
+
 class Attribute(metaclass=abc.ABCMeta):
 
     # The types.AttrType value for this attribute, which if set by
@@ -66,8 +191,8 @@ class Attribute(metaclass=abc.ABCMeta):
         self.__nullable = nullable
         self.__ddb_name = ddb_name
         self.__set_type = self.type.is_set_type()
-        self.values = weakref.WeakKeyDictionary()
-        self.original = weakref.WeakKeyDictionary()
+        self.values = InstanceValues(self, 'values')
+        self.original = InstanceValues(self, 'original')
         self.__hash_key = hash_key
         self.__range_key = range_key
 
@@ -95,44 +220,68 @@ class Attribute(metaclass=abc.ABCMeta):
     def range_key(self):
         return self.__range_key
 
+    @property
+    def _index(self):
+        return self.__index
+
     def reset(self, instance, value):
         """
         Set value for instance and use that value as the original value
         for change tracking.
         """
-        self.original[instance] = value
+        get_state(instance).original[self.__index] = value
         self._set(instance, value)
 
     def __get__(self, instance, owner):
         if instance is None:
             return self
-        val = self.values.get(instance)
-        return val if val is not util.NOTSET else None
+        val = get_state(instance).values[self.__index]
+        return (val if val is not util.NOTSET and val is not util.NOTFOUND
+                else None)
 
     def __set__(self, instance, value):
         value = self._check(value)
+        state = get_state(instance)
+        index = self.__index
 
         # if value is unchanged, we don't need to do anything
-        if self.values.get(instance, util.NOTFOUND) == value:
+        if state.values[index] == value:
             return
 
-        update = getattr(
-            type(type(instance))._changes,
-            'unset' if value == self.original.get(instance, util.NOTFOUND)
-            else 'set',
-        )
-        update(instance, self.__index)
-        self._set(instance, value)
+        if value == state.original[index]:
+            state.changed &= ~(1 << index)
+        else:
+            state.changed |= 1 << index
+        state.values[index] = value
 
     def _set(self, instance, value):
-        self.values[instance] = value
+        get_state(instance).values[self.__index] = value
+
+    def _mark_changed(self, instance):
+        get_state(instance).changed |= 1 << self.__index
+
+    def _restore(self, instance, value, original):
+        """
+        Set the value and original value for instance as they were when it
+        was pickled, without change tracking.
+        """
+        state = get_state(instance)
+        state.values[self.__index] = value
+        state.original[self.__index] = original
 
     def __delete__(self, instance):
         if not self.nullable:
             raise TypeError("{} attribute '{}' is not nullable and may not "
                             "be deleted".format(type(self).__name__,
                                                 self.name))
-        self.values.pop(instance, None)
+        get_state(instance).values[self.__index] = util.NOTFOUND
+
+    def __reduce__(self):
+        # attributes are pickled by reference, as their model class's
+        if self.__owner is None:
+            raise TypeError(f"cannot pickle {type(self).__name__} attribute "
+                            "that isn't defined on a model class")
+        return getattr, (self.__owner, self.__name)
 
     def __set_name__(self, owner, name):
         from . import models
@@ -198,6 +347,21 @@ class Attribute(metaclass=abc.ABCMeta):
         """
         return self.__type.deserialize(self.ddb_name, value)
 
+    def serialize_prefix(self, prefix):
+        """
+        Serialize a prefix of this attribute's stored values to a DynamoDB
+        dict, for a begins_with condition: a str prefix of a String
+        attribute's values, or a bytes one of a Binary attribute's.
+        """
+        if self.__type is types.AttrType.S and isinstance(prefix, str):
+            return {self.ddb_name: {'S': prefix}}
+        if (self.__type is types.AttrType.B and
+                isinstance(prefix, types.BINARY_TYPES)):
+            return types.AttrType.B.to_client(self.ddb_name, prefix)
+        raise TypeError(f"invalid prefix '{prefix}' of type "
+                        f"[{type(prefix).__name__}] for {type(self).__name__}"
+                        f" attribute '{self.name}'")
+
 
 Attribute._indexes = weakref.WeakKeyDictionary()
 
@@ -212,7 +376,7 @@ class String(Attribute):
     PYTHON_TYPES = (str,)
 
 
-class StringSet(SetAttributeMixin, Attribute):
+class StringSet(SetAttributeMixin, TrackedAttributeMixin, Attribute):
 
     """
     Attribute that allows a set of strings, and optionally None (if `nullable).
@@ -228,34 +392,50 @@ class StringSet(SetAttributeMixin, Attribute):
         return value
 
     def deserialize(self, value):
-        return set(value[self.ddb_name][type.AttrType.SS.value])
+        return set(value[self.ddb_name][types.AttrType.SS.value])
 
 
 class Binary(Attribute):
 
     """
-    Attribute that allows bytes values.
+    Attribute that allows bytes, bytearray or memoryview values.
+
+    Values are serialized for a boto3 client, which does the base64
+    encoding itself, so they are passed through without being encoded or
+    copied (see `types.binary_value`).
     """
 
     TYPE = types.AttrType.B
-    PYTHON_TYPES = (bytes, bytearray)
+    PYTHON_TYPES = types.BINARY_TYPES
 
-    def _check(self, value):
-        value = super()._check(value)
-        if value is not None and not isinstance(value, (bytearray, bytes)):
-            raise TypeError(value)
+    def serialize(self, value):
+        value = self._check(value)
+        if value is not None:
+            value = types.AttrType.B.to_client(self.ddb_name, value)
         return value
 
+    def deserialize(self, value):
+        return types.AttrType.B.from_client(self.ddb_name, value)
+
 
-class BinarySet(SetAttributeMixin, Attribute):
+class BinarySet(SetAttributeMixin, TrackedAttributeMixin, Attribute):
 
     """
-    Attribute that allows a set of bytes or bytearray values.
+    Attribute that allows a set of bytes, bytearray or memoryview values.
     """
 
     TYPE = types.AttrType.BS
     PYTHON_TYPES = Binary.PYTHON_TYPES
 
+    def serialize(self, value):
+        value = self._check(value)
+        if value is not None:
+            value = types.AttrType.BS.to_client(self.ddb_name, value)
+        return value
+
+    def deserialize(self, value):
+        return types.AttrType.BS.from_client(self.ddb_name, value)
+
 
 class Number(Attribute):
 
@@ -284,11 +464,8 @@ class Number(Attribute):
                 raise ValueError(f'{value} is outside permitted numeric range')
         return value
 
-    def __set__(self, instance, value):
-        super().__set__(instance, self._check(value))
-
 
-class NumberSet(SetAttributeMixin, Attribute):
+class NumberSet(SetAttributeMixin, TrackedAttributeMixin, Attribute):
 
     """
     Attribute that allows int, decimal, and float values.
@@ -307,7 +484,39 @@ class Integer(Number):
     PYTHON_TYPES = (int,)
 
 
-class IntegerSet(SetAttributeMixin, Attribute):
+class Counter(Integer):
+
+    """
+    Integer attribute for a counter, whose changes are written as an
+    increment (with ADD) rather than as a new value, so that increments of
+    the same item made elsewhere aren't lost. A counter with no value is 0.
+
+    A `buffer.WriteBuffer` can add up the increments of many requests
+    (see `WriteBuffer.increment`) to write them in one update of each item.
+    """
+
+    def __init__(self, **kwargs):
+        if kwargs.get('hash_key') or kwargs.get('range_key'):
+            raise TypeError("Counter attribute cannot be used as a hash or "
+                            "range key")
+        super().__init__(**kwargs)
+
+    def __get__(self, instance, owner):
+        value = super().__get__(instance, owner)
+        return 0 if value is None and instance is not None else value
+
+    def delta(self, instance):
+        """
+        Get the change of an instance's value since it was loaded or saved.
+        """
+        state = get_state(instance)
+        value = state.values[self._index]
+        original = state.original[self._index]
+        return ((value if isinstance(value, int) else 0) -
+                (original if isinstance(original, int) else 0))
+
+
+class IntegerSet(SetAttributeMixin, TrackedAttributeMixin, Attribute):
 
     """
     Attribute that allows a set of integer values.
@@ -327,7 +536,7 @@ class Decimal(Number):
     PYTHON_TYPES = (decimal.Decimal, float)
 
 
-class DecimalSet(SetAttributeMixin, Attribute):
+class DecimalSet(SetAttributeMixin, TrackedAttributeMixin, Attribute):
 
     """
     Attribute that allows a set of decimal.Decimal values.
@@ -346,23 +555,6 @@ class Boolean(Attribute):
     TYPE = types.AttrType.BOOL
     PYTHON_TYPES = (bool,)
 
-    def __set__(self, instance, value):
-        super().__set__(instance, self._check(value))
-
-    def serialize(self, value):
-        value = self._check(value)
-        return None if value is None else ('true' if value else 'false')
-
-    def deserialize(self, value):
-        if self.nullable and value is None:
-            return None
-        result = {'true': True, 'false': False}.get(value)
-        if result is None:
-            msg = ("serialized boolean value should be 'true' or 'false', "
-                   f"not {value}")
-            raise ValueError(msg)
-        return result
-
 
 class Null(Attribute):
 
@@ -377,9 +569,197 @@ class Null(Attribute):
         return None
 
 
-class List(Attribute):
+class DateTime(Attribute):
+
+    """
+    Attribute that allows timezone-aware datetime.datetime values, which
+    are stored in UTC so that the stored values sort in time order, and
+    can be used in range key conditions (see `table.Table.query`).
+
+    With `encoding='iso'` (the default) values are stored as fixed-width
+    ISO 8601 strings, such as '2015-09-22T19:58:22.947000Z', and with
+    `encoding='epoch'` as numbers of seconds since the Unix epoch. Values
+    are loaded as UTC datetimes (a stored string without a timezone is
+    taken to be UTC).
+    """
+
+    PYTHON_TYPES = (datetime.datetime,)
+    ENCODINGS = ('iso', 'epoch')
+
+    def __init__(self, *, encoding='iso', **kwargs):
+        if encoding not in self.ENCODINGS:
+            raise ValueError("encoding must be one of: " +
+                             ', '.join(self.ENCODINGS))
+        self.encoding = encoding
+        kwargs['attr_type'] = (types.AttrType.S if encoding == 'iso' else
+                               types.AttrType.N)
+        super().__init__(**kwargs)
+
+    def _check(self, value):
+        value = super()._check(value)
+        if value is not None:
+            if value.utcoffset() is None:
+                raise ValueError(
+                    "expected timezone-aware datetime for DateTime "
+                    f"attribute '{self.name}', but received '{value}'")
+            value = value.astimezone(datetime.timezone.utc)
+        return value
+
+    def encode(self, value):
+        """
+        Get the stored str form of a UTC datetime.
+        """
+        if self.encoding == 'iso':
+            return value.replace(tzinfo=None).isoformat(
+                timespec='microseconds') + 'Z'
+        micros = (value - _EPOCH) // datetime.timedelta(microseconds=1)
+        if micros % 1000000 == 0:
+            return str(micros // 1000000)
+        return format(decimal.Decimal(micros).scaleb(-6), 'f')
+
+    def decode(self, text):
+        """
+        Get the UTC datetime of a stored str form.
+        """
+        if self.encoding == 'iso':
+            if text.endswith('Z'):
+                text = text[:-1]
+            value = datetime.datetime.fromisoformat(text)
+            if value.tzinfo is None:
+                return value.replace(tzinfo=datetime.timezone.utc)
+            return value.astimezone(datetime.timezone.utc)
+        micros = int(decimal.Decimal(text).scaleb(6))
+        return _EPOCH + datetime.timedelta(microseconds=micros)
+
+    def serialize(self, value):
+        value = self._check(value)
+        if value is not None:
+            value = {self.ddb_name: {self.type.value: self.encode(value)}}
+        return value
+
+    def deserialize(self, value):
+        return self.decode(value[self.ddb_name][self.type.value])
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class CompositeKey(String):
+
+    """
+    String attribute for keys made of several parts joined by `separator`,
+    such as 'Amazon DynamoDB#DynamoDB Thread 1', whose values are tuples
+    of the (str) `parts` parts. Only the last part may contain the
+    separator.
+
+    A tuple of the first parts of values is a prefix of them, for
+    begins_with range key conditions (see `table.Table.query`).
+    """
+
+    PYTHON_TYPES = (tuple,)
+
+    def __init__(self, parts, *, separator='#', **kwargs):
+        if not isinstance(parts, int) or parts < 2:
+            raise ValueError("parts must be a number of parts of at least 2")
+        if not separator:
+            raise ValueError("separator must be a non-empty string")
+        self.parts = parts
+        self.separator = separator
+        super().__init__(**kwargs)
+
+    def _check_parts(self, value, count):
+        if not (isinstance(value, tuple) and 0 < len(value) <= count and
+                all(isinstance(part, str) for part in value)):
+            raise TypeError(
+                f"expected tuple of {count} str parts for CompositeKey "
+                f"attribute '{self.name}', but received value '{value}'")
+        separator = self.separator
+        for part in value[:self.parts - 1]:
+            if separator in part:
+                raise ValueError(
+                    f"part '{part}' of CompositeKey attribute '{self.name}' "
+                    f"contains the separator '{separator}'")
+
+    def _check(self, value):
+        value = super()._check(value)
+        if value is not None:
+            if len(value) != self.parts:
+                raise TypeError(
+                    f"expected tuple of {self.parts} str parts for "
+                    f"CompositeKey attribute '{self.name}', but received "
+                    f"value '{value}'")
+            self._check_parts(value, self.parts)
+        return value
+
+    def serialize(self, value):
+        value = self._check(value)
+        if value is not None:
+            value = {self.ddb_name: {'S': self.separator.join(value)}}
+        return value
+
+    def deserialize(self, value):
+        text = value[self.ddb_name]['S']
+        parts = tuple(text.split(self.separator, self.parts - 1))
+        if len(parts) != self.parts:
+            raise ValueError(f"stored value '{text}' of CompositeKey "
+                             f"attribute '{self.name}' has {len(parts)} "
+                             f"parts, not {self.parts}")
+        return parts
+
+    def serialize_prefix(self, prefix):
+        if isinstance(prefix, str):
+            return super().serialize_prefix(prefix)
+        self._check_parts(prefix, self.parts)
+        text = self.separator.join(prefix)
+        if len(prefix) < self.parts:
+            # so that ('a',) doesn't match ('ab', ...)
+            text += self.separator
+        return {self.ddb_name: {'S': text}}
+
+
+class DocumentAttributeMixin:
+
+    """
+    Mixin for attributes whose values are documents, which are converted to
+    and from typed DynamoDB values by `documents.encode` and
+    `documents.decode`, and may be nested up to `max_depth` levels deep.
+    """
+
+    def __init__(self, *, max_depth=documents.DEFAULT_MAX_DEPTH, **kwargs):
+        super().__init__(**kwargs)
+        self.__max_depth = max_depth
+
+    @property
+    def max_depth(self):
+        return self.__max_depth
+
+    def __set__(self, instance, value):
+        super().__set__(instance, self._check(value))
+
+    def serialize(self, value):
+        value = self._check(value)
+        if value is not None:
+            value = {self.ddb_name: documents.encode(
+                value, max_depth=self.__max_depth)}
+        return value
+
+    def deserialize(self, value):
+        typed = value[self.ddb_name]
+        if self.type.value not in typed:
+            raise ValueError("no value found for descriptor '{}' in DynamoDB "
+                             "dict: {}".format(self.type.value, typed))
+        return documents.decode(typed, max_depth=self.__max_depth)
+
+
+class List(DocumentAttributeMixin, TrackedAttributeMixin, Attribute):
+
+    """
+    Attribute that allows a list (or tuple) of document values (see
+    `documents`), and optionally None (if `nullable`).
+    """
 
     TYPE = types.AttrType.L
+    TRACKED_TYPE = tracking.TrackedList
 
     def _check(self, value):
         if not (isinstance(value, (list, tuple)) or
@@ -390,20 +770,21 @@ class List(Attribute):
                                                   type(value).__name__))
         return value
 
-    def __set__(self, instance, value):
-        super().__set__(instance, self._check(value))
-
-    def serialize(self, value):
-        value = self._check(value)
-        return None if value is None else value
 
+class Map(DocumentAttributeMixin, TrackedAttributeMixin, Attribute):
 
-class Map(Attribute):
+    """
+    Attribute that allows a mapping of str keys to document values (see
+    `documents`), and optionally None (if `nullable`).
+    """
 
     TYPE = types.AttrType.M
+    TRACKED_TYPE = tracking.TrackedDict
 
     def _check(self, value):
-        # TODO: check value in map
+        # values in the map are checked when it's serialized
+        if value is None and self.nullable:
+            return value
         if (not isinstance(value, collections.abc.Mapping) or
                 not (value or self.nullable)):
             raise TypeError("expected value of type [mapping] for Map "
@@ -412,9 +793,202 @@ class Map(Attribute):
                                                   type(value).__name__))
         return value
 
+
+def _zlib_codec():
+    import zlib
+    return zlib.compress, zlib.decompress
+
+
+def _lzma_codec():
+    import lzma
+    return lzma.compress, lzma.decompress
+
+
+# Compression codecs for compressed attributes, by name: the id stored in
+# the header of compressed values, and a function returning the compress
+# and decompress functions (so modules are only imported when used).
+COMPRESSION_CODECS = {
+    'zlib': (1, _zlib_codec),
+    'lzma': (2, _lzma_codec),
+}
+
+# first byte of the header of a compressed attribute value; the second is
+# the codec id, or 0 if the value is stored uncompressed
+COMPRESSED_MAGIC = 0xC5
+_UNCOMPRESSED = 0
+
+
+class Compressed:
+
+    """
+    A compressed attribute value as loaded from DynamoDB, which is
+    decompressed the first time its `value` is used.
+    """
+
+    __slots__ = ('attribute', 'data', '_value')
+
+    def __init__(self, attribute, data):
+        self.attribute = attribute
+        self.data = data
+        self._value = util.NOTSET
+
+    @property
+    def value(self):
+        if self._value is util.NOTSET:
+            self._value = self.attribute.decompress(self.data)
+            self.data = None
+        return self._value
+
+    def __repr__(self):
+        return f'<{type(self).__name__} of {type(self.attribute).__name__}>'
+
+
+class CompressedAttributeMixin(metaclass=abc.ABCMeta):
+
+    """
+    Mixin for attributes whose values are stored compressed as binary.
+
+    Values whose encoded size is at least `threshold` bytes are compressed
+    with `codec` ('zlib' or 'lzma'), unless that doesn't make them smaller.
+    Stored values start with a two-byte header giving the codec (or that
+    the value is uncompressed), so the codec and threshold can be changed
+    without affecting values already stored. Loaded values are only
+    decompressed when first accessed.
+    """
+
+    TYPE = types.AttrType.B
+
+    def __init__(self, *, codec='zlib', threshold=1024, level=None,
+                 **kwargs):
+        if kwargs.get('hash_key') or kwargs.get('range_key'):
+            raise TypeError("Compressed attribute cannot be used as a "
+                            "hash or range key")
+        if codec not in COMPRESSION_CODECS:
+            raise ValueError("compression codec must be one of: " +
+                             ', '.join(COMPRESSION_CODECS))
+        super().__init__(**kwargs)
+        self.__codec = codec
+        self.__threshold = threshold
+        self.__level = level
+
+    @property
+    def codec(self):
+        return self.__codec
+
+    @property
+    def threshold(self):
+        return self.__threshold
+
+    @abc.abstractmethod
+    def _encode(self, value):
+        """Convert a valid value to bytes (or another buffer) to store."""
+
+    @abc.abstractmethod
+    def _decode(self, data):
+        """Convert stored bytes back to a value."""
+
+    def compress(self, value):
+        """
+        Get the stored form (header and payload bytes) of a valid value.
+        """
+        data = self._encode(value)
+        codec_id = _UNCOMPRESSED
+        if len(data) >= self.__threshold:
+            codec_id, get_codec = COMPRESSION_CODECS[self.__codec]
+            compress = get_codec()[0]
+            if self.__level is None:
+                compressed = compress(data)
+            elif self.__codec == 'lzma':
+                compressed = compress(data, preset=self.__level)
+            else:
+                compressed = compress(data, self.__level)
+            if len(compressed) < len(data):
+                data = compressed
+            else:
+                codec_id = _UNCOMPRESSED
+        return bytes((COMPRESSED_MAGIC, codec_id)) + data
+
+    def decompress(self, stored):
+        """
+        Get the value for the stored form of a value.
+        """
+        stored = memoryview(stored)
+        if len(stored) < 2 or stored[0] != COMPRESSED_MAGIC:
+            raise ValueError(f"{type(self).__name__} attribute '{self.name}' "
+                             "value does not have a compression header")
+        codec_id, data = stored[1], stored[2:]
+        if codec_id != _UNCOMPRESSED:
+            for name, (id_, get_codec) in COMPRESSION_CODECS.items():
+                if id_ == codec_id:
+                    data = get_codec()[1](data)
+                    break
+            else:
+                raise ValueError(f"unknown compression codec id {codec_id} "
+                                 f"for attribute '{self.name}'")
+        return self._decode(data)
+
+    def _resolve(self, instance):
+        value = self.values.get(instance)
+        if isinstance(value, Compressed):
+            decompressed = value.value
+            self.values[instance] = decompressed
+            if self.original.get(instance) is value:
+                self.original[instance] = decompressed
+            value = decompressed
+        return value
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        self._resolve(instance)
+        return super().__get__(instance, owner)
+
     def __set__(self, instance, value):
-        super().__set__(instance, self._check(value))
+        self._resolve(instance)
+        super().__set__(instance, value)
 
     def serialize(self, value):
+        if isinstance(value, Compressed):
+            # a loaded value that was never accessed is stored as it was
+            if value.data is not None:
+                return types.AttrType.B.to_client(self.ddb_name, value.data)
+            value = value.value
         value = self._check(value)
-        return None if value is None else value
+        if value is not None:
+            value = types.AttrType.B.to_client(self.ddb_name,
+                                               self.compress(value))
+        return value
+
+    def deserialize(self, value):
+        """
+        Deserialize to a `Compressed` value, which the attribute
+        decompresses when it is first accessed on an instance.
+        """
+        return Compressed(self, types.AttrType.B.from_client(self.ddb_name,
+                                                             value))
+
+
+class CompressedString(CompressedAttributeMixin, String):
+
+    """
+    String attribute that is stored as compressed UTF-8 binary.
+    """
+
+    def _encode(self, value):
+        return value.encode('utf-8')
+
+    def _decode(self, data):
+        return str(data, 'utf-8')
+
+
+class CompressedBinary(CompressedAttributeMixin, Binary):
+
+    """
+    Binary attribute that is stored compressed.
+    """
+
+    def _encode(self, value):
+        return types.binary_value(value)
+
+    def _decode(self, data):
+        return bytes(data)
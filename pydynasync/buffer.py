@@ -0,0 +1,342 @@
+"""
+Write buffering that coalesces repeated writes to the same item.
+
+A `WriteBuffer` holds the writes of a table's instances, keyed by primary
+key, until a time or size window closes. Successive updates of the same
+key are merged: the newest value of each changed attribute wins, so a
+burst of updates becomes a single UpdateItem call. Puts replace what's
+pending for their key, and are written in batch writes. (Updates of
+instances of overflow models are buffered as puts.)
+
+Increments of `attributes.Counter` attributes are added up, so the
+increments of a key's counters from many requests become a single
+UpdateItem that ADDs their sums.
+
+Buffered writes aren't visible to reads until they're flushed, so a buffer
+trades up to `max_delay` seconds of staleness (and the loss of unflushed
+writes if the process dies) for fewer requests and write capacity units.
+"""
+import atexit
+import threading
+import time
+import weakref
+
+import attr
+
+from . import attributes, models, overflow, util
+
+# buffers with a background flusher, which are closed at exit so that their
+# pending writes aren't lost
+_running = weakref.WeakSet()
+
+
+@atexit.register
+def _close_running():
+    for buffer in list(_running):
+        buffer.close()
+
+
+@attr.s
+class BufferStats:
+    """Counts of a buffer's writes and the requests that flushed them."""
+    writes = attr.ib(default=0)
+    flushes = attr.ib(default=0)
+    keys_flushed = attr.ib(default=0)
+    update_requests = attr.ib(default=0)
+    batch_requests = attr.ib(default=0)
+    increments = attr.ib(default=0)
+
+    @property
+    def coalesced(self):
+        """Number of writes merged into another write of the same key."""
+        return self.writes - self.keys_flushed
+
+
+class _Pending:
+
+    """
+    The merged writes of one key: either the changed attribute values to
+    update and the increments of counters to add, or an item to put.
+    """
+
+    __slots__ = ('key', 'values', 'deltas', 'item', 'added')
+
+    def __init__(self, key, added):
+        self.key = key
+        self.values = {}
+        self.deltas = {}
+        self.item = None
+        self.added = added
+
+    def update(self, model, values):
+        if self.item is None:
+            self.values.update(values)
+            for name in values:
+                self.deltas.pop(name, None)
+            return
+        for name, value in values.items():
+            attribute = getattr(model, name)
+            if value is None:
+                self.item.pop(attribute.ddb_name, None)
+            else:
+                self.item.update(attribute.serialize(value))
+
+    def increment(self, model, deltas):
+        for name, delta in deltas.items():
+            attribute = getattr(model, name)
+            if self.item is not None:
+                value = (attribute.deserialize(self.item)
+                         if attribute.ddb_name in self.item else 0)
+                self.item.update(attribute.serialize(value + delta))
+            elif name in self.values:
+                # a value (or removal) to write, to add to
+                self.values[name] = (self.values[name] or 0) + delta
+            else:
+                self.deltas[name] = self.deltas.get(name, 0) + delta
+
+    def put(self, item):
+        self.values = {}
+        self.deltas = {}
+        self.item = item
+
+    def merge(self, model, newer):
+        if newer.item is not None:
+            self.put(newer.item)
+        else:
+            self.update(model, newer.values)
+            self.increment(model, newer.deltas)
+
+
+class WriteBuffer:
+
+    """
+    Buffers the writes of a `table.Table`'s instances, coalescing those to
+    the same key, and flushes them when the oldest has waited `max_delay`
+    seconds or when `max_keys` keys are pending.
+
+    Writing an instance to the buffer marks it as saved. Call `close` (or
+    use the buffer as a context manager) to flush the remaining writes;
+    buffers that haven't been closed are closed at exit. An error while
+    flushing in the background is raised by the next call to the buffer,
+    and the writes that weren't flushed are kept.
+    """
+
+    def __init__(self, table, *, max_delay=1.0, max_keys=100):
+        if max_delay <= 0 or max_keys < 1:
+            raise ValueError("max_delay must be positive and max_keys at "
+                             "least 1")
+        self.table = table
+        self.max_delay = max_delay
+        self.max_keys = max_keys
+        self.stats = BufferStats()
+        self._pending = {}
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._error = None
+        self._closed = False
+        self._flusher = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    @property
+    def pending_deltas(self):
+        """
+        The sums of the pending increments of each counter, over all keys.
+        """
+        totals = {}
+        with self._lock:
+            for pending in self._pending.values():
+                for name, delta in pending.deltas.items():
+                    totals[name] = totals.get(name, 0) + delta
+        return totals
+
+    def _add(self, instance, write):
+        self.table._check_instance(instance)
+        self._add_key(instance.key_item(), write)
+        models.ModelMeta.set_saved(instance)
+
+    def _add_key(self, key, write):
+        with self._lock:
+            self._check_error()
+            if self._closed:
+                raise ValueError("write to a closed buffer")
+            pending = self._pending.get(util.hashable_key(key))
+            if pending is None:
+                pending = _Pending(key, time.monotonic())
+                self._pending[util.hashable_key(key)] = pending
+            write(pending)
+            self.stats.writes += 1
+            full = len(self._pending) >= self.max_keys
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run, name='pydynasync-write-buffer',
+                    daemon=True)
+                self._flusher.start()
+                _running.add(self)
+            self._lock.notify()
+        if full:
+            self.flush()
+
+    def update(self, instance):
+        """
+        Buffer the changed attributes of an instance.
+
+        Instances of overflow models are buffered as puts, as
+        `table.Table.update` writes them, since their values may need to be
+        split.
+        """
+        model = self.table.model
+        if model._overflow:
+            return self.put(instance)
+        mask = models.ModelMeta.get_changed_mask(instance)
+        values, deltas = {}, {}
+        for index, (name, attribute) in enumerate(model._attributes):
+            if mask & (1 << index):
+                value = attribute.values.get(instance)
+                if (isinstance(attribute, attributes.Counter) and
+                        value is not None):
+                    deltas[name] = attribute.delta(instance)
+                else:
+                    values[name] = value
+
+        def write(pending):
+            pending.update(model, values)
+            pending.increment(model, deltas)
+
+        self._add(instance, write)
+
+    def increment(self, hash_value, range_value=None, **deltas):
+        """
+        Buffer increments of the Counter attributes of the item with the
+        given key values, given as keyword arguments (like `views=1`).
+        """
+        model = self.table.model
+        for name in deltas:
+            if not isinstance(getattr(model, name, None),
+                              attributes.Counter):
+                raise TypeError(f"'{name}' is not a Counter attribute of "
+                                f"model class '{model.__name__}'")
+        key = model.make_key(hash_value, range_value)
+
+        def write(pending):
+            pending.increment(model, deltas)
+            self.stats.increments += 1
+
+        self._add_key(key, write)
+
+    def put(self, instance):
+        """
+        Buffer a put of an instance, which replaces any pending writes of
+        its key.
+        """
+        item = instance.to_item()
+        self._add(instance, lambda pending: pending.put(item))
+
+    def flush(self):
+        """
+        Write all pending writes.
+        """
+        with self._flush_lock:
+            with self._lock:
+                self._check_error()
+                pending, self._pending = self._pending, {}
+            self._write(pending)
+
+    def _write(self, pending):
+        from . import provision
+        table = self.table
+        written = set()
+        try:
+            puts = [(hashed, p) for hashed, p in pending.items()
+                    if p.item is not None]
+            if table.model._overflow:
+                for hashed, p in puts:
+                    table._writing(p.key)
+                    overflow.put_item(table.client, table.name, table.model,
+                                      p.item)
+                    table._written(p.key)
+                    written.add(hashed)
+            else:
+                batch_size = provision.BATCH_WRITE_SIZE
+                for start in range(0, len(puts), batch_size):
+                    batch = puts[start:start + batch_size]
+                    for _, p in batch:
+                        table._writing(p.key)
+                    provision.batch_write(table.client, table.name, (
+                        {'PutRequest': {'Item': p.item}} for _, p in batch
+                    ))
+                    for _, p in batch:
+                        table._written(p.key)
+                    written.update(hashed for hashed, _ in batch)
+                    self.stats.batch_requests += 1
+            for hashed, p in pending.items():
+                if p.item is None:
+                    table.update_item(p.key, p.values, deltas=p.deltas)
+                    written.add(hashed)
+                    self.stats.update_requests += 1
+        except BaseException:
+            self._restore({hashed: p for hashed, p in pending.items()
+                           if hashed not in written})
+            raise
+        finally:
+            self.stats.keys_flushed += len(written)
+            if pending:
+                self.stats.flushes += 1
+
+    def _restore(self, unwritten):
+        # put back the writes that weren't flushed, ahead of newer ones
+        with self._lock:
+            for hashed, newer in self._pending.items():
+                older = unwritten.get(hashed)
+                if older is None:
+                    unwritten[hashed] = newer
+                else:
+                    older.merge(self.table.model, newer)
+            self._pending = unwritten
+
+    def _run(self):
+        with self._lock:
+            while not self._closed:
+                if not self._pending:
+                    self._lock.wait()
+                    continue
+                oldest = next(iter(self._pending.values())).added
+                remaining = oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._lock.wait(remaining)
+                    continue
+                self._lock.release()
+                try:
+                    self.flush()
+                except Exception as e:
+                    self._error = e
+                finally:
+                    self._lock.acquire()
+                if self._error is not None:
+                    # don't retry until the error has been seen
+                    self._lock.wait()
+
+    def close(self):
+        """
+        Flush the pending writes and stop the background flusher.
+        """
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        _running.discard(self)
+        self.flush()
@@ -0,0 +1,270 @@
+"""
+Export a table as JSON lines.
+
+Each line is a `{"PutRequest": {"Item": ...}}` object, the same shape that
+`pydynasync.cmd.load` reads, with binary values base64-encoded as in
+DynamoDB's JSON format. The table is read with a segmented parallel scan;
+scanned pages pass through a bounded queue to a single writer, so memory
+use stays bounded however large the table is. With a checkpoint file, the
+position of each segment is saved after every page is written, and an
+interrupted export resumes from there, appending to its output.
+"""
+import argparse
+import base64
+import concurrent.futures
+import gzip
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import attr
+
+from .. import exp
+
+# number of scanned pages that may be waiting to be written
+QUEUE_SIZE = 16
+
+
+@attr.s
+class ExportStats:
+    items = attr.ib(default=0)
+    pages = attr.ib(default=0)
+    bytes = attr.ib(default=0)
+    elapsed = attr.ib(default=0.0)
+
+    @property
+    def items_per_second(self):
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return ('exported {} items in {} pages ({:.1f} MB) in {:.2f}s: '
+                '{:.0f} items/s, {:.2f} MB/s'.format(
+                    self.items, self.pages, self.bytes / 1e6, self.elapsed,
+                    self.items_per_second, self.bytes_per_second / 1e6))
+
+
+def encode_value(value):
+    """
+    Convert a typed attribute value to DynamoDB JSON, base64-encoding binary.
+    """
+    (type_, data), = value.items()
+    if type_ == 'B':
+        data = base64.b64encode(data).decode('ascii')
+    elif type_ == 'BS':
+        data = [base64.b64encode(elem).decode('ascii') for elem in data]
+    elif type_ == 'L':
+        data = [encode_value(elem) for elem in data]
+    elif type_ == 'M':
+        data = {k: encode_value(v) for k, v in data.items()}
+    return {type_: data}
+
+
+def decode_value(value):
+    """
+    Convert a DynamoDB JSON attribute value to a typed attribute value.
+    """
+    (type_, data), = value.items()
+    if type_ == 'B':
+        data = base64.b64decode(data)
+    elif type_ == 'BS':
+        data = [base64.b64decode(elem) for elem in data]
+    elif type_ == 'L':
+        data = [decode_value(elem) for elem in data]
+    elif type_ == 'M':
+        data = {k: decode_value(v) for k, v in data.items()}
+    return {type_: data}
+
+
+def encode_item(item):
+    return {name: encode_value(value) for name, value in item.items()}
+
+
+def decode_item(item):
+    return {name: decode_value(value) for name, value in item.items()}
+
+
+class Checkpoint:
+
+    """
+    Scan positions of the segments of an export, saved to a JSON file.
+
+    A segment's position is None before its first page, the
+    LastEvaluatedKey of the last page written, or True once it is done.
+    """
+
+    def __init__(self, path, table_name, segments):
+        self.path = path
+        self.table_name = table_name
+        self.positions = [None] * segments
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as f:
+                state = json.load(f)
+            if (state['table'], len(state['positions'])) != (table_name,
+                                                             segments):
+                raise ValueError(f"checkpoint '{path}' is for a different "
+                                 "table or number of segments")
+            self.positions = [
+                p if p in (None, True) else decode_item(p)
+                for p in state['positions']
+            ]
+
+    @property
+    def started(self):
+        return any(p is not None for p in self.positions)
+
+    def update(self, segment, last_key):
+        self.positions[segment] = True if last_key is None else last_key
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        state = {
+            'table': self.table_name,
+            'positions': [
+                p if p in (None, True) else encode_item(p)
+                for p in self.positions
+            ],
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+
+def scan_segment(client, table_name, segment, total_segments, start,
+                 pages, *, page_size=None, stop=None):
+    """
+    Scan one segment of a table from `start`, putting each page on `pages`
+    as a (segment, items, last_key) tuple, until done or until the
+    `threading.Event` `stop` is set.
+    """
+    params = dict(TableName=table_name, Segment=segment,
+                  TotalSegments=total_segments)
+    if page_size:
+        params['Limit'] = page_size
+    if start is not None:
+        params['ExclusiveStartKey'] = start
+    while stop is None or not stop.is_set():
+        page = client.scan(**params)
+        last_key = page.get('LastEvaluatedKey')
+        pages.put((segment, page.get('Items', []), last_key))
+        if last_key is None:
+            return
+        params['ExclusiveStartKey'] = last_key
+
+
+def export_table(client, table_name, out, *, segments=4, page_size=None,
+                 checkpoint=None):
+    """
+    Write all items of a table to text file `out` as JSON lines, returning
+    `ExportStats`.
+
+    `checkpoint` is an optional `Checkpoint` to resume from and update.
+    """
+    if checkpoint is None:
+        checkpoint = Checkpoint(None, table_name, segments)
+    stats = ExportStats()
+    started = time.monotonic()
+    pages = queue.Queue(QUEUE_SIZE)
+    stop = threading.Event()
+    remaining = [segment for segment, position
+                 in enumerate(checkpoint.positions) if position is not True]
+    if not remaining:
+        return stats
+    with concurrent.futures.ThreadPoolExecutor(len(remaining)) as executor:
+        futures = [
+            executor.submit(scan_segment, client, table_name, segment,
+                            segments, checkpoint.positions[segment], pages,
+                            page_size=page_size, stop=stop)
+            for segment in remaining
+        ]
+        active = len(remaining)
+        try:
+            while active:
+                try:
+                    segment, items, last_key = pages.get(timeout=0.1)
+                except queue.Empty:
+                    for future in futures:
+                        if future.done() and future.exception():
+                            raise future.exception()
+                    continue
+                for item in items:
+                    line = json.dumps({'PutRequest': {
+                        'Item': encode_item(item),
+                    }}, separators=(',', ':')) + '\n'
+                    out.write(line)
+                    stats.bytes += len(line.encode('utf-8'))
+                out.flush()
+                stats.items += len(items)
+                stats.pages += 1
+                checkpoint.update(segment, last_key)
+                if last_key is None:
+                    active -= 1
+        finally:
+            # after an error, stop the scanners between pages, and unblock
+            # any waiting on a full queue
+            stop.set()
+            while active and any(not f.done() for f in futures):
+                try:
+                    pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    stats.elapsed = time.monotonic() - started
+    return stats
+
+
+def open_output(path, *, compress=False, append=False):
+    mode = 'at' if append else 'wt'
+    if path in (None, '-'):
+        if compress:
+            return gzip.open(sys.stdout.buffer, mode, encoding='utf-8')
+        return open(sys.stdout.fileno(), mode, encoding='utf-8',
+                    closefd=False)
+    if compress:
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m pydynasync.cmd.export',
+        description='Export a table as JSON lines of PutRequest items.')
+    parser.add_argument('table', help='name of the table to export')
+    parser.add_argument('-o', '--output', default='-',
+                        help="output path, or '-' for stdout (default)")
+    parser.add_argument('-z', '--gzip', action='store_true',
+                        help='gzip-compress the output')
+    parser.add_argument('-s', '--segments', type=int, default=4,
+                        help='number of parallel scan segments')
+    parser.add_argument('-l', '--page-size', type=int, default=None,
+                        help='maximum number of items per scanned page')
+    parser.add_argument('-c', '--checkpoint', default=None,
+                        help='checkpoint file for resuming the export')
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    checkpoint = Checkpoint(args.checkpoint, args.table, args.segments)
+    if checkpoint.started and args.output == '-':
+        raise ValueError("cannot resume an export to stdout")
+    client = exp.get_client()
+    with open_output(args.output, compress=args.gzip,
+                     append=checkpoint.started) as out:
+        stats = export_table(client, args.table, out,
+                             segments=args.segments,
+                             page_size=args.page_size,
+                             checkpoint=checkpoint)
+    print(stats, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
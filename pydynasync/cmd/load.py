@@ -1,10 +1,9 @@
+import gzip
 import json
 import sys
-import time
 
-from botocore.exceptions import ClientError
-
-from .. import exp, devguide
+from .. import devguide, exp, provision
+from .export import decode_item
 
 
 def read_json(path):
@@ -12,25 +11,35 @@ def read_json(path):
         return json.load(f)
 
 
-def delete_table(client, table_name, *, wait=True):
-    try:
-        client.delete_table(TableName=table_name)
-    except ClientError as e:
-        if e.response['Error']['Code'] == 'ResourceNotFoundException':
-            return
-        raise
-    else:
-        waiter = client.get_waiter('table_not_exists')
-        while waiter.wait(TableName=table_name):
-            time.sleep(0.25)
+def read_jsonl(path, table_name):
+    """
+    Read JSON lines written by `pydynasync.cmd.export` (gzip-compressed
+    if the path ends with '.gz') as data for `table_name`.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        elems = []
+        for line in f:
+            elem = json.loads(line)
+            item = elem['PutRequest']['Item']
+            elem['PutRequest']['Item'] = decode_item(item)
+            elems.append(elem)
+    return {table_name: elems}
+
+
+def recreate_tables(client, table_names):
+    provision.delete_tables(client, table_names)
+    specs = [devguide.specs[table_name] for table_name in table_names]
+    timings = provision.create_tables(client, specs)
+    for timing in timings.values():
+        print('TableName=%s: active after %.2fs' % (
+            timing.name, timing.elapsed))
 
 
 def put_json(client, data):
+    recreate_tables(client, list(data))
     for table_name, elems in data.items():
         print('TableName=%s: ' % (table_name,), sep='', end='')
-        delete_table(client, table_name, wait=True)
-        spec = devguide.specs[table_name]
-        exp.create_table(client, spec, wait=True)
         for elem in elems:
             params = elem['PutRequest']
             params['TableName'] = table_name
@@ -44,11 +53,16 @@ def put_json(client, data):
 def main(argv=None):
     if argv is None:
         argv = sys.argv[1:]
-    if len(argv) != 1 or argv[0] in ('-h', '--help'):
-        msg = "usage: python -m pydynasync.load path"
+    if not 1 <= len(argv) <= 2 or argv[0] in ('-h', '--help'):
+        msg = "usage: python -m pydynasync.cmd.load path [table]"
         raise ValueError(msg)
     path = argv[0]
-    data = read_json(path)
+    if '.jsonl' in path:
+        if len(argv) != 2:
+            raise ValueError("a table name is required to load JSON lines")
+        data = read_jsonl(path, argv[1])
+    else:
+        data = read_json(path)
     client = exp.get_client()
     put_json(client, data)
 
@@ -6,6 +6,9 @@ DynamoDB utilities.
 # these are the non-inclusive min/max
 NUMBER_RANGE = (-1E130, 1E125)
 
+# maximum size of an item in bytes, including its attribute names
+MAX_ITEM_SIZE = 400 * 1024
+
 
 def is_reserved_word(word):
     """
@@ -14,6 +17,40 @@ def is_reserved_word(word):
     return word.upper() in ddb_reserved_words
 
 
+def value_size(value):
+    """
+    Get the approximate size in bytes of a typed attribute value, as
+    DynamoDB counts it.
+    """
+    (type_, data), = value.items()
+    if type_ == 'S':
+        return len(data.encode('utf-8'))
+    elif type_ == 'N':
+        digits = str(data).lstrip('-').replace('.', '').strip('0')
+        return len(digits) // 2 + 2
+    elif type_ == 'B':
+        if isinstance(data, str):
+            return len(data.encode('utf-8'))
+        return memoryview(data).nbytes
+    elif type_ in ('BOOL', 'NULL'):
+        return 1
+    elif type_ in ('SS', 'NS', 'BS'):
+        base = type_[0]
+        return sum(value_size({base: elem}) for elem in data)
+    elif type_ == 'L':
+        return 3 + sum(1 + value_size(elem) for elem in data)
+    return 3 + sum(1 + len(k.encode('utf-8')) + value_size(v)
+                   for k, v in data.items())
+
+
+def item_size(item):
+    """
+    Get the approximate size in bytes of an item, as DynamoDB counts it.
+    """
+    return sum(len(name.encode('utf-8')) + value_size(value)
+               for name, value in item.items())
+
+
 # http://docs.aws.amazon.com/amazondynamodb/latest/developerguide/ReservedWords.html
 ddb_reserved_words = {
     'ABORT', 'ABSOLUTE', 'ACTION', 'ADD', 'AFTER', 'AGENT', 'AGGREGATE',
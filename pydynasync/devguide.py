@@ -1,22 +1,60 @@
-from . import exp
+"""
+Table specs for the sample tables of the DynamoDB Developer Guide.
+
+Specs are built when first looked up in `specs`, so importing this module
+doesn't import `exp` (or build specs that aren't used).
+"""
+import collections.abc
+
 from .types import KeyType, ProjectionType, AttrType
 
 
-specs = {
-    'ProductCatalog': exp.make_table_spec(
+class LazySpecs(collections.abc.Mapping):
+
+    """
+    A mapping of table names to specs, each made by calling a function of
+    no arguments the first time it is looked up.
+    """
+
+    def __init__(self, makers):
+        self._makers = makers
+        self._specs = {}
+
+    def __getitem__(self, name):
+        spec = self._specs.get(name)
+        if spec is None:
+            spec = self._specs[name] = self._makers[name]()
+        return spec
+
+    def __iter__(self):
+        return iter(self._makers)
+
+    def __len__(self):
+        return len(self._makers)
+
+
+def _make_table_spec(*args, **kwargs):
+    def make():
+        from . import exp
+        return exp.make_table_spec(*args, **kwargs)
+    return make
+
+
+specs = LazySpecs({
+    'ProductCatalog': _make_table_spec(
         'ProductCatalog',
         id=('Id', AttrType.N),
     ),
-    'Forum': exp.make_table_spec(
+    'Forum': _make_table_spec(
         'Forum',
         id=('Name', AttrType.S),
     ),
-    'Thread': exp.make_table_spec(
+    'Thread': _make_table_spec(
         'Thread',
         id=('ForumName', AttrType.S),
         range=('Subject', AttrType.S),
     ),
-    'Reply': exp.make_table_spec(
+    'Reply': _make_table_spec(
         'Reply',
         id=('Id', AttrType.S),
         range=('ReplyDateTime', AttrType.S),
@@ -34,13 +72,13 @@ specs = {
             }
         }]
     ),
-    'Test': exp.make_table_spec(
+    'Test': _make_table_spec(
         'Test',
         id=('Id', AttrType.N),
         range=('Handiness', AttrType.S),
     ),
-    'Test1': exp.make_table_spec(
+    'Test1': _make_table_spec(
         'Test1',
         id=('Id', AttrType.N),
     ),
-}
+})
@@ -0,0 +1,224 @@
+"""
+Conversion of document values to and from typed DynamoDB values.
+
+A document value is a dict (or other mapping) with str keys, a list or
+tuple, or a scalar: str, int, float, decimal.Decimal, bool, None, or a
+binary value. Values in documents may also be non-empty sets of strings,
+numbers or binary values. `encode` converts one to its typed form, such as
+{'M': {'name': {'S': 'x'}}}, and `decode` converts it back, with numbers
+decoded as int or decimal.Decimal.
+
+Both walk the document with an explicit stack rather than recursion, so
+they aren't limited by the interpreter's recursion limit and don't pay for
+a call per container. Scalars are converted as their container is visited,
+through tables of converters by type (or type tag). Documents nested more
+than `max_depth` levels deep are rejected; DynamoDB allows 32.
+"""
+import collections.abc
+import decimal
+
+from .ddb import NUMBER_RANGE
+from .types import AttrType, binary_from_client, binary_value, number_from_str
+
+# maximum nesting of maps and lists that DynamoDB allows
+DEFAULT_MAX_DEPTH = 32
+
+_convert_number = AttrType.N.convert
+
+
+def _string(value):
+    return {'S': value}
+
+
+def _number(value):
+    if not (NUMBER_RANGE[0] < value < NUMBER_RANGE[1]):
+        raise ValueError(f'{value} is outside permitted numeric range')
+    return {'N': _convert_number(value)}
+
+
+def _bool(value):
+    return {'BOOL': value}
+
+
+def _null(value):
+    return {'NULL': True}
+
+
+def _binary(value):
+    return {'B': binary_value(value)}
+
+
+def _set(value):
+    if not value:
+        raise ValueError("empty sets are not allowed in documents")
+    types = {_SET_TYPES.get(type(elem)) for elem in value}
+    if len(types) != 1 or None in types:
+        raise TypeError("expected a set of only strings, only numbers or "
+                        f"only binary values, but received {value!r}")
+    tag = types.pop()
+    if tag == 'SS':
+        return {tag: list(value)}
+    elif tag == 'NS':
+        return {tag: [_number(elem)['N'] for elem in value]}
+    return {tag: [binary_value(elem) for elem in value]}
+
+
+_SET_TYPES = {
+    str: 'SS',
+    int: 'NS', float: 'NS', decimal.Decimal: 'NS',
+    bytes: 'BS', bytearray: 'BS', memoryview: 'BS',
+}
+
+# Encoders of scalar (and set) values by type. Subclasses of these types
+# are added the first time they're seen (see `_encoder`).
+ENCODERS = {
+    str: _string,
+    bool: _bool,
+    int: _number,
+    float: _number,
+    decimal.Decimal: _number,
+    type(None): _null,
+    bytes: _binary,
+    bytearray: _binary,
+    memoryview: _binary,
+    set: _set,
+    frozenset: _set,
+}
+
+# Marks container types in ENCODERS: the type tag of their typed form.
+_LIST = 'L'
+_MAP = 'M'
+ENCODERS.update({list: _LIST, tuple: _LIST, dict: _MAP})
+
+# base types to look for in a type not in ENCODERS, in order (bool is
+# before int, since it's a subclass of it)
+_BASES = (
+    (bool, _bool), (str, _string), ((int, float, decimal.Decimal), _number),
+    ((bytes, bytearray, memoryview), _binary),
+    (collections.abc.Set, _set), ((list, tuple), _LIST),
+    (collections.abc.Mapping, _MAP),
+)
+
+
+def _encoder(type_):
+    for base, encoder in _BASES:
+        if issubclass(type_, base):
+            ENCODERS[type_] = encoder
+            return encoder
+    raise TypeError(f"unsupported type [{type_.__name__}] in document")
+
+
+def _too_deep(max_depth):
+    return ValueError(f"document is nested more than {max_depth} levels "
+                      "deep")
+
+
+def encode(value, *, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Get the typed DynamoDB value of a document value.
+    """
+    encoder = ENCODERS.get(type(value)) or _encoder(type(value))
+    if encoder is not _LIST and encoder is not _MAP:
+        return encoder(value)
+    result = {}
+    # (value, encoder, typed value to fill in, depth)
+    stack = [(value, encoder, result, 1)]
+    encoders = ENCODERS
+    while stack:
+        value, encoder, parent, depth = stack.pop()
+        if depth > max_depth:
+            raise _too_deep(max_depth)
+        if encoder is _LIST:
+            children = []
+            items = enumerate(value)
+        else:
+            children = {}
+            items = value.items()
+        parent[encoder] = children
+        for key, child in items:
+            if encoder is _MAP and type(key) is not str:
+                raise TypeError("expected str keys in document map, but "
+                                f"received key {key!r}")
+            child_encoder = (encoders.get(type(child)) or
+                             _encoder(type(child)))
+            if child_encoder is _LIST or child_encoder is _MAP:
+                typed = {}
+                stack.append((child, child_encoder, typed, depth + 1))
+            else:
+                typed = child_encoder(child)
+            if encoder is _LIST:
+                children.append(typed)
+            else:
+                children[key] = typed
+    return result
+
+
+def _decode_null(data):
+    return None
+
+
+# Decoders of scalar (and set) typed values by type tag.
+DECODERS = {
+    'S': str,
+    'N': number_from_str,
+    'B': binary_from_client,
+    'BOOL': bool,
+    'NULL': _decode_null,
+    'SS': set,
+    'NS': lambda data: set(map(number_from_str, data)),
+    'BS': lambda data: set(map(binary_from_client, data)),
+}
+
+
+def _invalid(typed):
+    return ValueError(f"invalid typed value in document: {typed!r}")
+
+
+def decode(typed, *, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Get the document value of a typed DynamoDB value.
+    """
+    try:
+        (tag, data), = typed.items()
+    except (AttributeError, ValueError):
+        raise _invalid(typed) from None
+    if tag != _LIST and tag != _MAP:
+        return _decode_scalar(tag, data)
+    result = [None]
+    # (typed data, type tag, parent container, key in parent, depth)
+    stack = [(data, tag, result, 0, 1)]
+    decoders = DECODERS
+    while stack:
+        data, tag, parent, key, depth = stack.pop()
+        if depth > max_depth:
+            raise _too_deep(max_depth)
+        if tag == _LIST:
+            value = [None] * len(data)
+            items = enumerate(data)
+        else:
+            value = {}
+            items = data.items()
+        parent[key] = value
+        for child_key, child in items:
+            try:
+                (child_tag, child_data), = child.items()
+            except (AttributeError, ValueError):
+                raise _invalid(child) from None
+            if child_tag == _LIST or child_tag == _MAP:
+                value[child_key] = None
+                stack.append((child_data, child_tag, value, child_key,
+                              depth + 1))
+            else:
+                decoder = decoders.get(child_tag)
+                if decoder is None:
+                    raise ValueError(f"invalid type '{child_tag}' in "
+                                     "document")
+                value[child_key] = decoder(child_data)
+    return result[0]
+
+
+def _decode_scalar(tag, data):
+    decoder = DECODERS.get(tag)
+    if decoder is None:
+        raise ValueError(f"invalid type '{tag}' in document")
+    return decoder(data)
@@ -1,23 +1,20 @@
-import logging
+"""
+Table specs and clients.
+
+boto3 and botocore are only imported when a boto3 client, resource or
+session is first made, so using the in-memory engine, or just importing
+this module, doesn't pay for loading them.
+"""
+import functools
 import os
-import time
 
 import attr
 
-import botocore.config
-from botocore.exceptions import ClientError
-
-import boto3
-
-from . import converters as C, validators as V
+from . import converters as C, memory, provision, validators as V
 from .types import KeyType, StreamViewType, AttrType
 
-logging.basicConfig()
-
 # boto3.set_stream_logger(name='botocore')
 
-DYNAMODB_CONFIG = botocore.config.Config(signature_version='s3v4')
-
 
 @attr.s
 class ProvisionedThroughput:
@@ -118,7 +115,9 @@ class GSI(LSI):
                                     convert=C.provisioned_throughput)
 
     def to_boto(self):
-        return attr.asdict()
+        d = super().to_boto()
+        d['ProvisionedThroughput'] = self.ProvisionedThroughput.to_boto()
+        return d
 
 
 @attr.s
@@ -132,7 +131,7 @@ class StreamSpecification:
             'StreamEnabled': self.StreamEnabled,
         }
         if self.StreamEnabled:
-            d['StreamViewType'] = self.StreamViewType.value,
+            d['StreamViewType'] = self.StreamViewType.value
         return d
 
 
@@ -169,41 +168,86 @@ def make_table_spec(name, *, id=None, range=None, extra_attrs=None,
     return Spec(**params)
 
 
-def create_table(client, spec, wait=False):
+def create_table(client, spec, wait=False, *, delay=provision.DEFAULT_DELAY,
+                 timeout=provision.DEFAULT_TIMEOUT):
     d = dict((k, v) for k, v in spec.to_boto().items() if v not in [None, []])
     result = client.create_table(**d)
     if wait:
-        waiter = client.get_waiter('table_exists')
-        while waiter.wait(TableName=spec.TableName):
-            time.sleep(0.25)
+        provision.wait_for_status(client, spec.TableName, provision.ACTIVE,
+                                  delay=delay, timeout=timeout)
     return result['TableDescription']
 
 
+@functools.lru_cache(maxsize=None)
+def get_config():
+    """
+    Get the default botocore config for DynamoDB clients.
+    """
+    import botocore.config
+    return botocore.config.Config(signature_version='s3v4')
+
+
 def resolve(endpoint, session, config):
     if endpoint is None:
         endpoint = os.environ['DYNAMODB_ENDPOINT_URL']
     if session is None:
         session = make_session()
     if config is None:
-        config = DYNAMODB_CONFIG
+        config = get_config()
     return endpoint, session, config
 
 
-def get_client(*, endpoint=None, session=None, config=None):
+def get_client(*, endpoint=None, session=None, config=None, wire=False):
+    """
+    Get a DynamoDB client for `endpoint`, which defaults to the value of
+    the DYNAMODB_ENDPOINT_URL environment variable.
+
+    An in-memory endpoint URL (like 'memory://') gets a `memory.MemoryClient`
+    instead of a boto3 client. If `wire` is true, other endpoints get a
+    `wire.WireClient`, using the region of `session` if it's given.
+    """
+    if endpoint is None:
+        endpoint = os.environ['DYNAMODB_ENDPOINT_URL']
+    if memory.is_memory_endpoint(endpoint):
+        return memory.get_client(endpoint)
+    if wire:
+        from .wire import WireClient
+        region = session.region_name if session is not None else None
+        return WireClient(endpoint, region=region)
     endpoint, session, config = resolve(endpoint, session, config)
     return session.client('dynamodb', endpoint_url=endpoint, config=config)
 
 
+def get_streams_client(*, endpoint=None, session=None, config=None):
+    """
+    Get a DynamoDB Streams client for `endpoint`, which defaults to the
+    value of the DYNAMODB_ENDPOINT_URL environment variable.
+
+    An in-memory endpoint URL gets a `memory.MemoryStreamsClient`.
+    """
+    if endpoint is None:
+        endpoint = os.environ['DYNAMODB_ENDPOINT_URL']
+    if memory.is_memory_endpoint(endpoint):
+        return memory.get_streams_client(endpoint)
+    endpoint, session, config = resolve(endpoint, session, config)
+    return session.client('dynamodbstreams', endpoint_url=endpoint,
+                          config=config)
+
+
 def get_resource(*, endpoint=None, session=None, config=None):
     endpoint, session, config = resolve(endpoint, session, config)
     return session.resource('dynamodb', endpoint_url=endpoint, config=config)
 
 
 def make_session():
+    import boto3.session
     return boto3.session.Session()
 
 
 def main():
+    import logging
+    from botocore.exceptions import ClientError
+    logging.basicConfig()
     session = make_session()
     client = get_client(session=session)
     print(client)
@@ -0,0 +1,232 @@
+"""
+Compiled expressions.
+
+Attribute names in expressions always go through ExpressionAttributeNames
+placeholders, since any of them might be a reserved word. The expression
+text and names map depend only on the model, the operation and which
+attributes are involved, so they're compiled once per such shape and kept
+in a bounded LRU cache; a request only binds its values to the
+expression's value placeholders.
+
+Placeholders have a prefix for each kind of expression, so the names and
+values of a key condition, projection and update can be combined in one
+request.
+"""
+import collections
+import copy
+import threading
+
+import attr
+
+# default maximum number of compiled expressions kept
+DEFAULT_CACHE_SIZE = 1024
+
+# operators for key conditions on a range key, with their number of values
+RANGE_OPERATORS = {
+    '=': 1, '<': 1, '<=': 1, '>': 1, '>=': 1, 'begins_with': 1, 'between': 2,
+}
+
+
+@attr.s
+class Expression:
+    """An expression, with its names map and value placeholders."""
+    text = attr.ib()
+    # placeholder to attribute name
+    names = attr.ib()
+    # value placeholders, in the order that values are bound
+    slots = attr.ib(default=())
+
+    def bind(self, *values):
+        """
+        Get the ExpressionAttributeValues for typed `values`.
+        """
+        if len(values) != len(self.slots):
+            raise TypeError(f"expected {len(self.slots)} values, but "
+                            f"received {len(values)}")
+        return dict(zip(self.slots, values))
+
+
+@attr.s
+class CacheStats:
+    hits = attr.ib(default=0)
+    misses = attr.ib(default=0)
+    evictions = attr.ib(default=0)
+    size = attr.ib(default=0)
+    maxsize = attr.ib(default=DEFAULT_CACHE_SIZE)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ExpressionCache:
+
+    """
+    A thread-safe LRU cache of compiled expressions.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.stats = CacheStats(maxsize=maxsize)
+
+    def get(self, key, compile, *args):
+        """
+        Get the expression for `key`, calling `compile(*args)` to make it
+        if it isn't cached.
+        """
+        with self.lock:
+            expression = self.entries.get(key)
+            if expression is not None:
+                self.entries.move_to_end(key)
+                self.stats.hits += 1
+                return expression
+            self.stats.misses += 1
+        expression = compile(*args)
+        with self.lock:
+            self.entries[key] = expression
+            while len(self.entries) > self.stats.maxsize:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+            self.stats.size = len(self.entries)
+        return expression
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.stats.maxsize = maxsize
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+            self.stats.size = len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stats = CacheStats(maxsize=self.stats.maxsize)
+
+
+cache = ExpressionCache()
+
+
+def cache_stats():
+    """
+    Get a copy of the expression cache's `CacheStats`.
+    """
+    with cache.lock:
+        return copy.copy(cache.stats)
+
+
+def _ddb_name(model, name):
+    return getattr(model, name).ddb_name
+
+
+def _compile_update(model, set_names, remove_names, append_names,
+                    add_names, delete_names):
+    names = {}
+    slots = []
+    clauses = {'SET': [], 'REMOVE': [], 'ADD': [], 'DELETE': []}
+    groups = (
+        ('SET', set_names, '{0} = {1}'),
+        ('SET', append_names, '{0} = list_append({0}, {1})'),
+        ('ADD', add_names, '{0} {1}'),
+        ('DELETE', delete_names, '{0} {1}'),
+        ('REMOVE', remove_names, '{0}'),
+    )
+    i = 0
+    for clause, group, action in groups:
+        for name in group:
+            names[f'#u{i}'] = _ddb_name(model, name)
+            if clause != 'REMOVE':
+                slots.append(f':u{i}')
+            clauses[clause].append(action.format(f'#u{i}', f':u{i}'))
+            i += 1
+    text = ' '.join(f'{clause} ' + ', '.join(actions)
+                    for clause, actions in clauses.items() if actions)
+    return Expression(text, names, tuple(slots))
+
+
+def update(model, set_names, remove_names=(), *, append_names=(),
+           add_names=(), delete_names=()):
+    """
+    Get the update expression that sets the model attributes in
+    `set_names`, appends to the lists in `append_names`, adds elements to
+    and deletes elements from the sets in `add_names` and `delete_names`,
+    and removes the attributes in `remove_names`.
+
+    A value is bound for each attribute except those removed, in the order
+    set, append, add, delete.
+    """
+    shape = tuple(map(tuple, (set_names, remove_names, append_names,
+                              add_names, delete_names)))
+    return cache.get(('update', model) + shape, _compile_update, model,
+                     *shape)
+
+
+def _compile_key_condition(model, range_op):
+    names = {'#k0': model._hash_key.ddb_name}
+    slots = [':k0']
+    text = '#k0 = :k0'
+    if range_op is not None:
+        names['#k1'] = model._range_key.ddb_name
+        if range_op == 'begins_with':
+            text += ' AND begins_with(#k1, :k1)'
+            slots.append(':k1')
+        elif range_op == 'between':
+            text += ' AND #k1 BETWEEN :k1 AND :k2'
+            slots.extend((':k1', ':k2'))
+        else:
+            text += f' AND #k1 {range_op} :k1'
+            slots.append(':k1')
+    return Expression(text, names, tuple(slots))
+
+
+def key_condition(model, range_op=None):
+    """
+    Get the key condition on the model's hash key and, if `range_op` is
+    one of `RANGE_OPERATORS`, its range key. The hash key value is bound
+    first, followed by the range key values.
+    """
+    if range_op is not None:
+        if range_op not in RANGE_OPERATORS:
+            raise ValueError(f"invalid range key operator: {range_op}")
+        if model._range_key is None:
+            raise TypeError(f"model class '{model.__name__}' does not "
+                            "define a range_key attribute")
+    return cache.get(('key_condition', model, range_op),
+                     _compile_key_condition, model, range_op)
+
+
+def _compile_projection(model, names, extra):
+    ddb_names = [_ddb_name(model, name) for name in names] + list(extra)
+    names = {f'#p{i}': name for i, name in enumerate(ddb_names)}
+    return Expression(', '.join(names), names)
+
+
+def projection(model, names, extra=()):
+    """
+    Get the projection of the model attributes in `names`, and of the
+    item attributes (by DynamoDB name) in `extra`.
+    """
+    names, extra = tuple(names), tuple(extra)
+    return cache.get(('projection', model, names, extra),
+                     _compile_projection, model, names, extra)
+
+
+def params(*expressions, **kwargs):
+    """
+    Get request parameters for expressions, given as (parameter name,
+    expression, values) tuples, such as ('KeyConditionExpression', key, (h,
+    r)). Other parameters can be passed as keyword arguments.
+    """
+    names = {}
+    values = {}
+    for param, expression, bound in expressions:
+        kwargs[param] = expression.text
+        names.update(expression.names)
+        values.update(expression.bind(*bound))
+    if names:
+        kwargs['ExpressionAttributeNames'] = names
+    if values:
+        kwargs['ExpressionAttributeValues'] = values
+    return kwargs
@@ -0,0 +1,155 @@
+"""
+Filters of keys known to be missing from a table, to answer gets locally.
+
+A `NegativeCache` remembers the keys of gets that found no item, for `ttl`
+seconds. A `BloomFilter` holds the keys of all the items of a table (built
+with a keys-only scan, see `BloomFilter.from_scan`), so that a key it
+doesn't hold is definitely missing; it answers with false positives (a key
+it might hold, which is then read) at about its `error_rate`.
+
+A `table.Table` uses them when they're set as its `negative_cache` and
+`bloom` attributes, and keeps them up to date with its own writes (and
+those of its `buffer.WriteBuffer`s). Writes made any other way aren't seen,
+so a Bloom filter should only be used for tables that are written only
+through the library, and a negative cache's `ttl` bounds how long such a
+write can go unseen. Consistent gets don't use either.
+
+Keys are hashable forms of DynamoDB keys (see `util.hashable_key`).
+"""
+import hashlib
+import math
+import threading
+import time
+
+from . import util
+
+
+class NegativeCache:
+
+    """
+    Keys known to be missing, each for `ttl` seconds, up to `max_size` keys
+    (after which the oldest are dropped).
+    """
+
+    def __init__(self, ttl=60.0, *, max_size=100000, clock=time.monotonic):
+        if ttl <= 0 or max_size < 1:
+            raise ValueError("ttl must be positive and max_size at least 1")
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        # key -> expiry time, oldest first
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, key):
+        with self._lock:
+            expiry = self._expiry.get(key)
+            if expiry is None:
+                return False
+            if expiry <= self.clock():
+                del self._expiry[key]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._expiry.pop(key, None)
+            self._expiry[key] = self.clock() + self.ttl
+            while len(self._expiry) > self.max_size:
+                del self._expiry[next(iter(self._expiry))]
+
+    def discard(self, key):
+        with self._lock:
+            self._expiry.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+
+
+class BloomFilter:
+
+    """
+    A Bloom filter of keys, sized to hold `capacity` keys with a false
+    positive rate of `error_rate`.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be at least 1 and error_rate "
+                             "between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = (bits + 7) // 8 * 8
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self.rejected = 0
+        self._bits = bytearray(self.size // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(repr(key).encode('utf-8'),
+                                 digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        bits = self._bits
+        # setting a bit is a read and a write of its byte
+        with self._lock:
+            for position in positions:
+                bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                self.rejected += 1
+                return False
+        return True
+
+    @property
+    def memory(self):
+        """Size of the filter's bit array in bytes."""
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self):
+        """
+        Estimated rate of false positives, from the fraction of bits set.
+        """
+        set_bits = bin(int.from_bytes(self._bits, 'little')).count('1')
+        return (set_bits / self.size) ** self.hashes
+
+    @classmethod
+    def from_scan(cls, table, *, segments=4, error_rate=0.01, capacity=None):
+        """
+        Build a filter of the keys of all items of a `table.Table`, with a
+        keys-only parallel scan of `segments` segments.
+
+        The filter's capacity defaults to twice the number of items, to
+        leave room for the keys of items written later.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def scan(segment):
+            return [util.hashable_key(key) for key in table.scan_keys(
+                segment=segment, total_segments=segments)]
+
+        with ThreadPoolExecutor(segments) as executor:
+            keys = [key for part in executor.map(scan, range(segments))
+                    for key in part]
+        bloom = cls(capacity or max(2 * len(keys), 1000), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
@@ -0,0 +1,1750 @@
+"""
+In-memory DynamoDB engine.
+
+`MemoryClient` implements the subset of the low-level DynamoDB client API
+that this library uses (table management, single-item and batch reads and
+writes, Query and Scan, with local and global secondary indexes), entirely
+in-process. It is a deterministic stand-in for a DynamoDB endpoint in tests
+and benchmarks: tables are active as soon as they are created, and items in
+each partition are kept sorted by range key.
+
+Clients for the same `memory://name` endpoint share a `Database`, so an
+endpoint URL like that can be passed to `exp.get_client` in place of a real
+endpoint URL.
+"""
+import bisect
+import copy
+import datetime
+import decimal
+import math
+import re
+import threading
+import zlib
+
+from . import ddb
+from .ddb import item_size
+
+ENDPOINT_SCHEME = 'memory://'
+DEFAULT_ENDPOINT = ENDPOINT_SCHEME
+
+# DynamoDB service limits that the engine enforces
+MAX_ITEM_SIZE = ddb.MAX_ITEM_SIZE
+MAX_PAGE_SIZE = 1024 * 1024
+MAX_BATCH_GET = 100
+MAX_BATCH_WRITE = 25
+MAX_STREAM_RECORDS = 1000
+
+# number of shards in each table stream; as in DynamoDB, all records for
+# items with the same hash key go to the same shard
+STREAM_SHARDS = 4
+
+SCALAR_TYPES = frozenset(('S', 'N', 'B', 'BOOL', 'NULL'))
+SET_TYPES = frozenset(('SS', 'NS', 'BS'))
+VALUE_TYPES = SCALAR_TYPES | SET_TYPES | frozenset(('L', 'M'))
+
+
+def is_memory_endpoint(endpoint):
+    """
+    Answer whether `endpoint` is an in-memory endpoint URL.
+    """
+    return isinstance(endpoint, str) and endpoint.startswith(ENDPOINT_SCHEME)
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(endpoint=DEFAULT_ENDPOINT):
+    """
+    Get the shared `Database` for an in-memory endpoint URL.
+    """
+    if not is_memory_endpoint(endpoint):
+        raise ValueError(f"'{endpoint}' is not an in-memory endpoint")
+    with _databases_lock:
+        database = _databases.get(endpoint)
+        if database is None:
+            database = _databases[endpoint] = Database()
+        return database
+
+
+def get_client(endpoint=DEFAULT_ENDPOINT):
+    """
+    Get a client for the shared database of an in-memory endpoint URL.
+    """
+    return MemoryClient(get_database(endpoint))
+
+
+def get_streams_client(endpoint=DEFAULT_ENDPOINT):
+    """
+    Get a streams client for the shared database of an in-memory endpoint
+    URL.
+    """
+    return MemoryStreamsClient(get_database(endpoint))
+
+
+def reset(endpoint=None):
+    """
+    Discard the database for `endpoint`, or all databases if None.
+    """
+    with _databases_lock:
+        if endpoint is None:
+            _databases.clear()
+        else:
+            _databases.pop(endpoint, None)
+
+
+def client_error(code, message, operation, *, status=400):
+    """
+    Make a botocore ClientError like the one DynamoDB would cause.
+    """
+    from botocore.exceptions import ClientError
+    response = {
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': status},
+    }
+    return ClientError(response, operation)
+
+
+class _Error(Exception):
+    """Raised internally and converted to a ClientError by the client."""
+
+    def __init__(self, message, code='ValidationException'):
+        super().__init__(message)
+        self.code = code
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+def _number(value):
+    try:
+        return decimal.Decimal(value)
+    except (decimal.InvalidOperation, TypeError):
+        raise _Error(f"invalid number value: {value!r}")
+
+
+def _unpack(value):
+    if not isinstance(value, dict) or len(value) != 1:
+        raise _Error(f"invalid attribute value: {value!r}")
+    (type_, data), = value.items()
+    if type_ not in VALUE_TYPES:
+        raise _Error(f"invalid attribute value type: {type_}")
+    return type_, data
+
+
+def _copy(value):
+    """
+    Validate a typed attribute value, returning a normalized copy of it.
+    """
+    type_, data = _unpack(value)
+    if type_ == 'S':
+        if not isinstance(data, str):
+            raise _Error(f"invalid string value: {data!r}")
+    elif type_ == 'N':
+        _number(data)
+        data = str(data)
+    elif type_ == 'B':
+        data = _bytes(data)
+    elif type_ in SET_TYPES:
+        if not data:
+            raise _Error(f"empty set for {type_} value")
+        data = [_copy({type_[0]: elem})[type_[0]] for elem in data]
+        if len(set(map(_canonical_scalar(type_[0]), data))) != len(data):
+            raise _Error(f"duplicate elements in {type_} value")
+    elif type_ == 'L':
+        data = [_copy(elem) for elem in data]
+    elif type_ == 'M':
+        data = {k: _copy(v) for k, v in data.items()}
+    return {type_: data}
+
+
+def _copy_item(item):
+    return {name: _copy(value) for name, value in item.items()}
+
+
+def _canonical_scalar(type_):
+    if type_ == 'N':
+        return lambda data: _number(data).normalize()
+    elif type_ == 'B':
+        return _bytes
+    return lambda data: data
+
+
+def _canonical(value):
+    """
+    Get a hashable value that compares equal for equal attribute values.
+    """
+    type_, data = _unpack(value)
+    if type_ in SET_TYPES:
+        return type_, frozenset(map(_canonical_scalar(type_[0]), data))
+    elif type_ == 'L':
+        return type_, tuple(map(_canonical, data))
+    elif type_ == 'M':
+        return type_, frozenset((k, _canonical(v)) for k, v in data.items())
+    elif type_ in ('N', 'B'):
+        return type_, _canonical_scalar(type_)(data)
+    return type_, data
+
+
+def _read_units(size, consistent):
+    units = max(1, math.ceil(size / 4096))
+    return units if consistent else units / 2
+
+
+def _write_units(size):
+    return max(1, math.ceil(size / 1024))
+
+
+# Expressions
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<num>\d+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<ref>\#[A-Za-z0-9_]+)
+      | (?P<value>:[A-Za-z0-9_]+)
+      | (?P<op><>|<=|>=|[=<>(),.\[\]+-])
+    )""", re.VERBOSE)
+
+_COMPARATORS = frozenset(('=', '<>', '<', '<=', '>', '>='))
+_CONDITION_FUNCTIONS = frozenset((
+    'attribute_exists', 'attribute_not_exists', 'attribute_type',
+    'begins_with', 'contains',
+))
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise _Error(f"invalid expression syntax near: {text[pos:]!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+
+    """
+    Recursive descent parser for the DynamoDB expression languages.
+
+    Placeholders are resolved while parsing, so the resulting nodes are
+    plain tuples: paths are `('path', parts)` with str parts for map keys
+    and int parts for list indexes, and values are `('value', typed)`.
+    """
+
+    def __init__(self, text, names=None, values=None):
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.names = names or {}
+        self.values = values or {}
+        self.used_names = set()
+        self.used_values = set()
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise _Error("unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def expect(self, text):
+        kind, value = self.next()
+        if value != text:
+            raise _Error(f"expected '{text}' but found '{value}'")
+
+    def at_keyword(self, *keywords):
+        kind, value = self.peek()
+        return kind == 'name' and value.upper() in keywords
+
+    def done(self):
+        if self.pos != len(self.tokens):
+            raise _Error(f"unexpected token '{self.peek()[1]}'")
+
+    def name(self):
+        kind, value = self.next()
+        if kind == 'ref':
+            try:
+                value = self.names[value]
+            except KeyError:
+                raise _Error(f"undefined attribute name placeholder {value}")
+            self.used_names.add(self.tokens[self.pos - 1][1])
+        elif kind != 'name':
+            raise _Error(f"expected attribute name but found '{value}'")
+        return value
+
+    def path(self):
+        parts = [self.name()]
+        while True:
+            _, value = self.peek()
+            if value == '.':
+                self.next()
+                parts.append(self.name())
+            elif value == '[':
+                self.next()
+                kind, index = self.next()
+                if kind != 'num':
+                    raise _Error(f"invalid list index '{index}'")
+                parts.append(int(index))
+                self.expect(']')
+            else:
+                return ('path', tuple(parts))
+
+    def value(self):
+        kind, value = self.next()
+        if kind != 'value':
+            raise _Error(f"expected value placeholder but found '{value}'")
+        try:
+            typed = self.values[value]
+        except KeyError:
+            raise _Error(f"undefined attribute value placeholder {value}")
+        self.used_values.add(value)
+        return ('value', typed)
+
+    def operand(self):
+        kind, value = self.peek()
+        if kind == 'value':
+            return self.value()
+        if kind == 'name' and self.peek(1)[1] == '(':
+            if value != 'size':
+                raise _Error(f"invalid function in operand: {value}")
+            self.next()
+            self.expect('(')
+            path = self.path()
+            self.expect(')')
+            return ('size', path)
+        return self.path()
+
+    # Condition expressions
+
+    def condition(self):
+        node = self.conjunction()
+        while self.at_keyword('OR'):
+            self.next()
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.at_keyword('AND'):
+            self.next()
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.at_keyword('NOT'):
+            self.next()
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.peek()
+        if value == '(':
+            self.next()
+            node = self.condition()
+            self.expect(')')
+            return node
+        if (kind == 'name' and value in _CONDITION_FUNCTIONS and
+                self.peek(1)[1] == '('):
+            self.next()
+            self.expect('(')
+            args = [self.operand()]
+            while self.peek()[1] == ',':
+                self.next()
+                args.append(self.operand())
+            self.expect(')')
+            return ('func', value, tuple(args))
+        left = self.operand()
+        if self.at_keyword('BETWEEN'):
+            self.next()
+            low = self.operand()
+            if not self.at_keyword('AND'):
+                raise _Error("expected AND in BETWEEN condition")
+            self.next()
+            return ('between', left, low, self.operand())
+        if self.at_keyword('IN'):
+            self.next()
+            self.expect('(')
+            options = [self.operand()]
+            while self.peek()[1] == ',':
+                self.next()
+                options.append(self.operand())
+            self.expect(')')
+            return ('in', left, tuple(options))
+        kind, op = self.next()
+        if op not in _COMPARATORS:
+            raise _Error(f"expected comparator but found '{op}'")
+        return ('cmp', op, left, self.operand())
+
+    # Update expressions
+
+    def update(self):
+        actions = []
+        seen = set()
+        while self.peek()[0] is not None:
+            kind, clause = self.next()
+            clause = clause.upper()
+            if clause not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise _Error(f"invalid update clause '{clause}'")
+            if clause in seen:
+                raise _Error(f"duplicate {clause} clause in update")
+            seen.add(clause)
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append((clause, path, self.set_value()))
+                elif clause == 'REMOVE':
+                    actions.append((clause, path, None))
+                else:
+                    actions.append((clause, path, self.value()))
+                if self.peek()[1] != ',':
+                    break
+                self.next()
+        if not actions:
+            raise _Error("empty update expression")
+        return actions
+
+    def set_value(self):
+        node = self.set_operand()
+        _, op = self.peek()
+        if op in ('+', '-'):
+            self.next()
+            node = (op, node, self.set_operand())
+        return node
+
+    def set_operand(self):
+        kind, value = self.peek()
+        if kind == 'name' and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            if value == 'if_not_exists':
+                path = self.path()
+                self.expect(',')
+                node = ('if_not_exists', path, self.set_operand())
+            elif value == 'list_append':
+                first = self.set_operand()
+                self.expect(',')
+                node = ('list_append', first, self.set_operand())
+            else:
+                raise _Error(f"invalid function in update: {value}")
+            self.expect(')')
+            return node
+        return self.operand()
+
+    # Projection expressions
+
+    def projection(self):
+        paths = [self.path()]
+        while self.peek()[1] == ',':
+            self.next()
+            paths.append(self.path())
+        return paths
+
+
+def _check_placeholders(names, values, parsers):
+    """
+    Check that every placeholder was used by one of a request's expressions.
+    """
+    parsers = [parser for parser in parsers if parser is not None]
+    used_names = set().union(*(parser.used_names for parser in parsers))
+    used_values = set().union(*(parser.used_values for parser in parsers))
+    unused = (set(names or ()) - used_names) | \
+        (set(values or ()) - used_values)
+    if unused:
+        raise _Error("unused expression placeholders: " +
+                     ', '.join(sorted(unused)))
+
+
+def _parse(method, text, names, values):
+    parser = _Parser(text, names, values)
+    result = getattr(parser, method)()
+    parser.done()
+    return result, parser
+
+
+def _get_path(item, parts):
+    value = item.get(parts[0])
+    for part in parts[1:]:
+        if value is None:
+            return None
+        type_, data = _unpack(value)
+        if isinstance(part, int):
+            value = data[part] if type_ == 'L' and part < len(data) else None
+        else:
+            value = data.get(part) if type_ == 'M' else None
+    return value
+
+
+def _parent(item, parts):
+    if len(parts) == 1:
+        return item, parts[0]
+    parent = _get_path(item, parts[:-1])
+    if parent is None:
+        raise _Error("the document path provided in the update expression "
+                     "is invalid for update")
+    type_, data = _unpack(parent)
+    last = parts[-1]
+    if (type_ == 'L') != isinstance(last, int) or type_ not in ('L', 'M'):
+        raise _Error("the document path provided in the update expression "
+                     "is invalid for update")
+    return data, last
+
+
+def _set_path(item, parts, value):
+    container, last = _parent(item, parts)
+    if isinstance(last, int) and last >= len(container):
+        container.append(value)
+    else:
+        container[last] = value
+
+
+def _remove_path(item, parts):
+    if len(parts) > 1 and _get_path(item, parts[:-1]) is None:
+        return
+    container, last = _parent(item, parts)
+    if isinstance(last, int):
+        if last < len(container):
+            del container[last]
+    else:
+        container.pop(last, None)
+
+
+def _operand(node, item):
+    kind = node[0]
+    if kind == 'path':
+        return _get_path(item, node[1])
+    elif kind == 'value':
+        return node[1]
+    elif kind == 'size':
+        value = _get_path(item, node[1][1])
+        if value is None:
+            return None
+        type_, data = _unpack(value)
+        if type_ == 'S':
+            size = len(data.encode('utf-8'))
+        elif type_ == 'B':
+            size = len(_bytes(data))
+        elif type_ in SET_TYPES or type_ in ('L', 'M'):
+            size = len(data)
+        else:
+            raise _Error(f"invalid operand type for size function: {type_}")
+        return {'N': str(size)}
+    raise _Error(f"invalid operand: {kind}")
+
+
+def _ordering(value):
+    type_, data = _unpack(value)
+    if type_ == 'N':
+        return type_, _number(data)
+    elif type_ == 'B':
+        return type_, _bytes(data)
+    elif type_ == 'S':
+        return type_, data
+    return None
+
+
+def _compare(op, left, right):
+    if left is None or right is None:
+        return op == '<>' and (left is not None or right is not None)
+    if op == '=':
+        return _canonical(left) == _canonical(right)
+    elif op == '<>':
+        return _canonical(left) != _canonical(right)
+    left, right = _ordering(left), _ordering(right)
+    if left is None or right is None or left[0] != right[0]:
+        return False
+    left, right = left[1], right[1]
+    return {
+        '<': left < right, '<=': left <= right,
+        '>': left > right, '>=': left >= right,
+    }[op]
+
+
+def _function(name, args, item):
+    if name in ('attribute_exists', 'attribute_not_exists'):
+        if len(args) != 1 or args[0][0] != 'path':
+            raise _Error(f"{name} requires a single path argument")
+        exists = _get_path(item, args[0][1]) is not None
+        return exists if name == 'attribute_exists' else not exists
+    if len(args) != 2:
+        raise _Error(f"{name} requires two arguments")
+    value, operand = (_operand(arg, item) for arg in args)
+    if value is None or operand is None:
+        return False
+    type_, data = _unpack(value)
+    other_type, other = _unpack(operand)
+    if name == 'attribute_type':
+        return other_type == 'S' and type_ == other
+    elif name == 'begins_with':
+        if type_ != other_type or type_ not in ('S', 'B'):
+            return False
+        if type_ == 'B':
+            return _bytes(data).startswith(_bytes(other))
+        return data.startswith(other)
+    # contains
+    if type_ == 'S' and other_type == 'S':
+        return other in data
+    elif type_ == 'B' and other_type == 'B':
+        return _bytes(other) in _bytes(data)
+    elif type_ in SET_TYPES and other_type == type_[0]:
+        convert = _canonical_scalar(other_type)
+        return convert(other) in set(map(convert, data))
+    elif type_ == 'L':
+        target = _canonical(operand)
+        return any(_canonical(elem) == target for elem in data)
+    return False
+
+
+def _evaluate(node, item):
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(node[1], item) and _evaluate(node[2], item)
+    elif kind == 'or':
+        return _evaluate(node[1], item) or _evaluate(node[2], item)
+    elif kind == 'not':
+        return not _evaluate(node[1], item)
+    elif kind == 'cmp':
+        return _compare(node[1], _operand(node[2], item),
+                        _operand(node[3], item))
+    elif kind == 'between':
+        value = _operand(node[1], item)
+        return (_compare('>=', value, _operand(node[2], item)) and
+                _compare('<=', value, _operand(node[3], item)))
+    elif kind == 'in':
+        value = _operand(node[1], item)
+        return any(_compare('=', value, _operand(option, item))
+                   for option in node[2])
+    elif kind == 'func':
+        return _function(node[1], node[2], item)
+    raise _Error(f"invalid condition: {kind}")
+
+
+def _set_operand(node, item):
+    kind = node[0]
+    if kind == 'if_not_exists':
+        value = _get_path(item, node[1][1])
+        return value if value is not None else _set_operand(node[2], item)
+    elif kind == 'list_append':
+        first, second = (_set_operand(n, item) for n in node[1:])
+        if first is None or second is None:
+            raise _Error("list_append operand refers to a missing attribute")
+        (t1, d1), (t2, d2) = _unpack(first), _unpack(second)
+        if t1 != 'L' or t2 != 'L':
+            raise _Error("list_append operands must be lists")
+        return {'L': list(d1) + list(d2)}
+    elif kind in ('+', '-'):
+        first, second = (_set_operand(n, item) for n in node[1:])
+        if first is None or second is None:
+            raise _Error("arithmetic operand refers to a missing attribute")
+        (t1, d1), (t2, d2) = _unpack(first), _unpack(second)
+        if t1 != 'N' or t2 != 'N':
+            raise _Error("arithmetic operands must be numbers")
+        result = (_number(d1) + _number(d2) if kind == '+'
+                  else _number(d1) - _number(d2))
+        return {'N': str(result)}
+    value = _operand(node, item)
+    if value is None:
+        raise _Error("the provided expression refers to an attribute that "
+                     "does not exist in the item")
+    return value
+
+
+def _apply_update(actions, item):
+    """
+    Apply parsed update actions to a copy of `item`, returning the copy and
+    the set of top-level attribute names that the update touched.
+    """
+    # Like DynamoDB, evaluate all operands against the item as it was
+    # before the update.
+    original = item
+    item = _copy_item(item)
+    touched = set()
+    for clause, path, operand in actions:
+        parts = path[1]
+        touched.add(parts[0])
+        if clause == 'SET':
+            _set_path(item, parts, _copy(_set_operand(operand, original)))
+        elif clause == 'REMOVE':
+            _remove_path(item, parts)
+        else:
+            op_type, op_data = _unpack(operand[1])
+            current = _get_path(item, parts)
+            if clause == 'ADD' and op_type == 'N':
+                if current is None:
+                    current = {'N': '0'}
+                cur_type, cur_data = _unpack(current)
+                if cur_type != 'N':
+                    raise _Error("ADD operand type does not match attribute")
+                total = _number(cur_data) + _number(op_data)
+                _set_path(item, parts, {'N': str(total)})
+                continue
+            if op_type not in SET_TYPES:
+                raise _Error(f"invalid {clause} operand type: {op_type}")
+            if current is None:
+                if clause == 'ADD':
+                    _set_path(item, parts, _copy(operand[1]))
+                continue
+            cur_type, cur_data = _unpack(current)
+            if cur_type != op_type:
+                raise _Error(f"{clause} operand type does not match "
+                             "attribute")
+            convert = _canonical_scalar(op_type[0])
+            if clause == 'ADD':
+                present = set(map(convert, cur_data))
+                merged = list(cur_data) + [
+                    elem for elem in op_data if convert(elem) not in present
+                ]
+                _set_path(item, parts, _copy({op_type: merged}))
+            else:
+                removed = set(map(convert, op_data))
+                remaining = [elem for elem in cur_data
+                             if convert(elem) not in removed]
+                if remaining:
+                    _set_path(item, parts, {op_type: remaining})
+                else:
+                    _remove_path(item, parts)
+    return item, touched
+
+
+def _project(item, paths):
+    if paths is None:
+        return _copy_item(item)
+    result = {}
+    for _, parts in paths:
+        value = _get_path(item, parts)
+        if value is None:
+            continue
+        if len(parts) == 1:
+            result[parts[0]] = _copy(value)
+            continue
+        # rebuild the nested document containing just the projected path
+        target = result
+        source = item
+        for part in parts[:-1]:
+            source_value = (source.get(part) if isinstance(source, dict)
+                            else source[part])
+            type_, data = _unpack(source_value)
+            if isinstance(target, dict):
+                holder = target.setdefault(part, {type_: {} if type_ == 'M'
+                                                  else []})
+            else:
+                holder = {type_: {} if type_ == 'M' else []}
+                target.append(holder)
+            target = holder[type_]
+            source = data
+        if isinstance(target, dict):
+            target[parts[-1]] = _copy(value)
+        else:
+            target.append(_copy(value))
+    return result
+
+
+# Storage
+
+
+class _Partition:
+
+    """
+    The items sharing one hash key value, sorted by their range key.
+    """
+
+    __slots__ = ('keys', 'items')
+
+    def __init__(self):
+        self.keys = []
+        self.items = {}
+
+    def put(self, rkey, item):
+        if rkey not in self.items:
+            bisect.insort(self.keys, rkey)
+        self.items[rkey] = item
+
+    def delete(self, rkey):
+        if self.items.pop(rkey, None) is not None:
+            del self.keys[bisect.bisect_left(self.keys, rkey)]
+
+    def bounds(self, op, values):
+        """
+        Get the slice of `keys` whose first element satisfies a key
+        condition.
+        """
+        keys = self.keys
+        start, stop = 0, len(keys)
+        if op is None:
+            return start, stop
+        first = values[0]
+        if op in ('=', '>=', '>', 'between', 'begins_with'):
+            start = _bisect_first(keys, first, right=(op == '>'))
+        if op in ('=', '<=', '<'):
+            stop = _bisect_first(keys, first, right=(op != '<'))
+        elif op == 'between':
+            stop = _bisect_first(keys, values[1], right=True)
+        elif op == 'begins_with':
+            stop = start
+            while stop < len(keys) and keys[stop][0][:len(first)] == first:
+                stop += 1
+        return start, stop
+
+
+def _bisect_first(keys, value, *, right):
+    """
+    Bisect sorted tuples `keys` on their first element.
+    """
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid][0] < value or (right and keys[mid][0] == value):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _key_value(type_, value, name):
+    if value is None:
+        raise _Error(f"missing key attribute '{name}'")
+    actual, data = _unpack(value)
+    if actual != type_:
+        raise _Error(f"type mismatch for key attribute '{name}': expected "
+                     f"{type_} but found {actual}")
+    if type_ == 'N':
+        return _number(data).normalize()
+    elif type_ == 'B':
+        data = _bytes(data)
+    if not data:
+        raise _Error(f"empty value for key attribute '{name}'")
+    return data
+
+
+def _token(hvalue):
+    return zlib.crc32(repr(hvalue).encode('utf-8'))
+
+
+class _Store:
+
+    """
+    Items keyed by a hash key value, each partition sorted by range key.
+
+    The sort key of an item within its partition is a tuple of key values
+    given by `sort_names`: for the base table just the range key (if any),
+    and for an index the index range key (if any) followed by the table's
+    primary key, so that items with equal index keys stay distinct.
+    """
+
+    def __init__(self, hash_name, sort_names, types):
+        self.hash_name = hash_name
+        self.sort_names = sort_names
+        self.types = types
+        self.partitions = {}
+        # sorted (token, hash value) pairs that give the scan order
+        self.tokens = []
+
+    def hash_value(self, item):
+        name = self.hash_name
+        return _key_value(self.types[name], item.get(name), name)
+
+    def sort_value(self, item):
+        return tuple(_key_value(self.types[name], item.get(name), name)
+                     for name in self.sort_names)
+
+    def put(self, item):
+        hvalue = self.hash_value(item)
+        partition = self.partitions.get(hvalue)
+        if partition is None:
+            partition = self.partitions[hvalue] = _Partition()
+            bisect.insort(self.tokens, (_token(hvalue), hvalue))
+        partition.put(self.sort_value(item), item)
+
+    def delete(self, item):
+        hvalue = self.hash_value(item)
+        partition = self.partitions.get(hvalue)
+        if partition is not None:
+            partition.delete(self.sort_value(item))
+            if not partition.items:
+                del self.partitions[hvalue]
+                token = (_token(hvalue), hvalue)
+                del self.tokens[bisect.bisect_left(self.tokens, token)]
+
+    def get(self, key):
+        partition = self.partitions.get(self.hash_value(key))
+        if partition is None:
+            return None
+        return partition.items.get(self.sort_value(key))
+
+    def __len__(self):
+        return sum(len(p.items) for p in self.partitions.values())
+
+    def query(self, hvalue, op, values, *, forward=True, start=None):
+        partition = self.partitions.get(hvalue)
+        if partition is None:
+            return
+        lo, hi = partition.bounds(op, values)
+        keys = partition.keys
+        if start is not None:
+            if forward:
+                lo = max(lo, bisect.bisect_right(keys, start))
+            else:
+                hi = min(hi, bisect.bisect_left(keys, start))
+        indexes = range(lo, hi) if forward else range(hi - 1, lo - 1, -1)
+        for i in indexes:
+            yield partition.items[keys[i]]
+
+    def scan(self, segment=0, total_segments=1, *, start=None):
+        first = 0
+        if start is not None:
+            hvalue = self.hash_value(start)
+            first = bisect.bisect_left(self.tokens, (_token(hvalue), hvalue))
+        for token, hvalue in self.tokens[first:]:
+            if token % total_segments != segment:
+                continue
+            partition = self.partitions[hvalue]
+            keys = partition.keys
+            lo = 0
+            if start is not None and hvalue == self.hash_value(start):
+                lo = bisect.bisect_right(keys, self.sort_value(start))
+            for rkey in keys[lo:]:
+                yield partition.items[rkey]
+
+
+class Index:
+
+    """
+    A local or global secondary index of a `Table`.
+    """
+
+    def __init__(self, table, description, is_global):
+        self.table = table
+        self.name = description['IndexName']
+        self.is_global = is_global
+        self.key_schema = description['KeySchema']
+        projection = description.get('Projection') or {}
+        self.projection_type = projection.get('ProjectionType', 'ALL')
+        self.non_key_attributes = projection.get('NonKeyAttributes', [])
+        self.provisioned_throughput = description.get(
+            'ProvisionedThroughput')
+        self.hash_name, self.range_name = _key_names(self.key_schema)
+        if not is_global and self.hash_name != table.hash_name:
+            raise _Error(f"local secondary index '{self.name}' must have "
+                         "the same hash key as the table")
+        sort_names = [self.range_name] if self.range_name else []
+        sort_names += [name for name in table.key_names
+                       if name not in sort_names and name != self.hash_name]
+        self.key_names = [self.hash_name] + sort_names
+        self.store = _Store(self.hash_name, tuple(sort_names), table.types)
+
+    def indexes(self, item):
+        return all(name in item for name in self.key_names)
+
+    def put(self, item):
+        if item is not None and self.indexes(item):
+            self.store.put(item)
+
+    def delete(self, item):
+        if item is not None and self.indexes(item):
+            self.store.delete(item)
+
+    def project(self, item):
+        if self.projection_type == 'ALL':
+            return item
+        names = set(self.key_names)
+        if self.projection_type == 'INCLUDE':
+            names.update(self.non_key_attributes)
+        return {k: v for k, v in item.items() if k in names}
+
+    def describe(self):
+        description = {
+            'IndexName': self.name,
+            'KeySchema': [dict(k) for k in self.key_schema],
+            'Projection': {'ProjectionType': self.projection_type},
+            'IndexSizeBytes': sum(map(item_size, self.store.scan())),
+            'ItemCount': len(self.store),
+        }
+        if self.non_key_attributes:
+            description['Projection']['NonKeyAttributes'] = list(
+                self.non_key_attributes)
+        if self.is_global:
+            description['IndexStatus'] = 'ACTIVE'
+            if self.provisioned_throughput:
+                description['ProvisionedThroughput'] = dict(
+                    self.provisioned_throughput)
+        return description
+
+
+def _key_names(key_schema):
+    hash_name = range_name = None
+    for key in key_schema:
+        if key['KeyType'] == 'HASH':
+            hash_name = key['AttributeName']
+        elif key['KeyType'] == 'RANGE':
+            range_name = key['AttributeName']
+    if hash_name is None:
+        raise _Error("key schema requires a HASH key")
+    return hash_name, range_name
+
+
+class Stream:
+
+    """
+    The stream of an in-memory table.
+
+    Records are appended to one of a fixed number of shards, chosen by the
+    item's hash key. The shards are closed when the table is deleted.
+    """
+
+    def __init__(self, table, view_type, *, shards=STREAM_SHARDS):
+        self.table_name = table.name
+        self.key_schema = table.key_schema
+        self.hash_name = table.hash_name
+        self.view_type = view_type
+        self.created = table.created
+        self.label = self.created.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+        self.arn = ('arn:aws:dynamodb:memory:000000000000:table/'
+                    f'{table.name}/stream/{self.label}')
+        self.shard_ids = [f'shardId-{self.created:%Y%m%d%H%M%S}-{i:08d}'
+                          for i in range(shards)]
+        self.records = [[] for _ in range(shards)]
+        self.sequence_numbers = [[] for _ in range(shards)]
+        self.last_sequence = 0
+        self.enabled = True
+
+    def record(self, old, new):
+        """
+        Add the record of replacing item `old` with `new`.
+        """
+        if old is None and new is None:
+            return
+        if old is not None and new is not None:
+            if _canonical({'M': old}) == _canonical({'M': new}):
+                return
+            event = 'MODIFY'
+        else:
+            event = 'INSERT' if old is None else 'REMOVE'
+        item = new if new is not None else old
+        keys = {name['AttributeName']: _copy(item[name['AttributeName']])
+                for name in self.key_schema}
+        self.last_sequence += 1
+        sequence = f'{self.last_sequence:021d}'
+        data = {
+            'ApproximateCreationDateTime':
+                datetime.datetime.now(datetime.timezone.utc),
+            'Keys': keys,
+            'SequenceNumber': sequence,
+            'StreamViewType': self.view_type,
+        }
+        if new is not None and self.view_type in ('NEW_IMAGE',
+                                                  'NEW_AND_OLD_IMAGES'):
+            data['NewImage'] = _copy_item(new)
+        if old is not None and self.view_type in ('OLD_IMAGE',
+                                                  'NEW_AND_OLD_IMAGES'):
+            data['OldImage'] = _copy_item(old)
+        data['SizeBytes'] = sum(
+            item_size(data[name])
+            for name in ('Keys', 'NewImage', 'OldImage') if name in data
+        )
+        shard = zlib.crc32(
+            repr(_canonical(keys[self.hash_name])).encode()
+        ) % len(self.records)
+        self.records[shard].append({
+            'eventID': f'{self.last_sequence:032x}',
+            'eventName': event,
+            'eventVersion': '1.1',
+            'eventSource': 'aws:dynamodb',
+            'awsRegion': 'memory',
+            'dynamodb': data,
+        })
+        self.sequence_numbers[shard].append(sequence)
+
+    def shard(self, shard_id):
+        try:
+            return self.shard_ids.index(shard_id)
+        except ValueError:
+            raise _Error(f"Requested resource not found: Shard: {shard_id} "
+                         "not found", 'ResourceNotFoundException')
+
+    def describe_shard(self, shard):
+        numbers = {'StartingSequenceNumber': f'{1:021d}'}
+        if not self.enabled:
+            numbers['EndingSequenceNumber'] = f'{self.last_sequence:021d}'
+        return {'ShardId': self.shard_ids[shard],
+                'SequenceNumberRange': numbers}
+
+    def describe(self):
+        return {
+            'StreamArn': self.arn,
+            'StreamLabel': self.label,
+            'StreamStatus': 'ENABLED' if self.enabled else 'DISABLED',
+            'StreamViewType': self.view_type,
+            'CreationRequestDateTime': self.created,
+            'TableName': self.table_name,
+            'KeySchema': [dict(k) for k in self.key_schema],
+        }
+
+
+class Table:
+
+    """
+    An in-memory table, with its items and secondary indexes.
+    """
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.created = datetime.datetime.now(datetime.timezone.utc)
+        self.types = {
+            d['AttributeName']: d['AttributeType']
+            for d in params['AttributeDefinitions']
+        }
+        self.key_schema = params['KeySchema']
+        self.hash_name, self.range_name = _key_names(self.key_schema)
+        self.key_names = [self.hash_name]
+        if self.range_name:
+            self.key_names.append(self.range_name)
+        for name in self.key_names:
+            if name not in self.types:
+                raise _Error(f"no attribute definition for key '{name}'")
+        self.store = _Store(self.hash_name, tuple(self.key_names[1:]),
+                            self.types)
+        self.indexes = {}
+        for description in params.get('LocalSecondaryIndexes') or ():
+            index = Index(self, description, is_global=False)
+            self.indexes[index.name] = index
+        for description in params.get('GlobalSecondaryIndexes') or ():
+            index = Index(self, description, is_global=True)
+            self.indexes[index.name] = index
+        stream = params.get('StreamSpecification') or {}
+        self.stream = None
+        if stream.get('StreamEnabled'):
+            self.stream = Stream(self, stream.get('StreamViewType'))
+
+    def index(self, name):
+        if name is None:
+            return None
+        try:
+            return self.indexes[name]
+        except KeyError:
+            raise _Error(f"table '{self.name}' has no index '{name}'")
+
+    def key(self, item):
+        return {name: item[name] for name in self.key_names}
+
+    def check_key(self, key):
+        if set(key) != set(self.key_names):
+            raise _Error("the provided key element does not match the "
+                         "schema")
+        self.store.hash_value(key)
+        self.store.sort_value(key)
+
+    def get(self, key):
+        self.check_key(key)
+        return self.store.get(key)
+
+    def write(self, old, new):
+        """
+        Replace item `old` (None if absent) with `new` (None to delete).
+        """
+        if new is not None:
+            if item_size(new) > MAX_ITEM_SIZE:
+                raise _Error("Item size has exceeded the maximum allowed "
+                             "size")
+            for name, type_ in self.types.items():
+                if name in new:
+                    _key_value(type_, new[name], name)
+        for index in self.indexes.values():
+            index.delete(old)
+            index.put(new)
+        if new is None:
+            self.store.delete(old)
+        else:
+            self.store.put(new)
+        if self.stream is not None:
+            self.stream.record(old, new)
+
+    def describe(self, status='ACTIVE'):
+        throughput = dict(self.params.get('ProvisionedThroughput') or {})
+        throughput['NumberOfDecreasesToday'] = 0
+        description = {
+            'TableName': self.name,
+            'TableStatus': status,
+            'CreationDateTime': self.created,
+            'AttributeDefinitions': [
+                dict(d) for d in self.params['AttributeDefinitions']
+            ],
+            'KeySchema': [dict(k) for k in self.key_schema],
+            'ProvisionedThroughput': throughput,
+            'ItemCount': len(self.store),
+            'TableSizeBytes': sum(map(item_size, self.store.scan())),
+        }
+        for kind, is_global in (('LocalSecondaryIndexes', False),
+                                ('GlobalSecondaryIndexes', True)):
+            indexes = [index.describe() for index in self.indexes.values()
+                       if index.is_global == is_global]
+            if indexes:
+                description[kind] = indexes
+        if self.stream is not None:
+            description['StreamSpecification'] = dict(
+                self.params['StreamSpecification'])
+            description['LatestStreamArn'] = self.stream.arn
+            description['LatestStreamLabel'] = self.stream.label
+        return description
+
+
+class Database:
+
+    """
+    A set of in-memory tables, shared by all clients of one endpoint.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.streams = {}
+        self.lock = threading.RLock()
+
+    def table(self, name):
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise _Error(f"Requested resource not found: Table: {name} not "
+                         "found", 'ResourceNotFoundException')
+
+    def stream(self, arn):
+        try:
+            return self.streams[arn]
+        except KeyError:
+            raise _Error(f"Requested resource not found: Stream: {arn} not "
+                         "found", 'ResourceNotFoundException')
+
+
+def _operation(func):
+    """
+    Run a client method under the database lock, converting internal errors
+    to ClientErrors and adding response metadata.
+    """
+    operation = ''.join(part.title() for part in func.__name__.split('_'))
+
+    def wrapper(self, **kwargs):
+        try:
+            with self.database.lock:
+                response = func(self, **kwargs)
+        except _Error as e:
+            raise client_error(e.code, str(e), operation) from None
+        response['ResponseMetadata'] = {'HTTPStatusCode': 200}
+        return response
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _capacity(response, table_name, units, return_consumed):
+    if return_consumed in ('TOTAL', 'INDEXES'):
+        response['ConsumedCapacity'] = {
+            'TableName': table_name,
+            'CapacityUnits': units,
+        }
+    return response
+
+
+def _projection(expression, names):
+    if expression is None:
+        return None, None
+    paths, parser = _parse('projection', expression, names, None)
+    return paths, parser
+
+
+def _key_condition(table, index, expression, names, values):
+    node, parser = _parse('condition', expression, names, values)
+    terms = []
+    stack = [node]
+    while stack:
+        term = stack.pop()
+        if term[0] == 'and':
+            stack.extend((term[2], term[1]))
+        else:
+            terms.append(term)
+    source = index or table
+    hash_name, range_name = source.hash_name, source.range_name
+    hvalue = None
+    op, bounds = None, ()
+    for term in terms:
+        kind = term[0]
+        if kind == 'func' and term[1] == 'begins_with':
+            path, value = term[2]
+            name, term_op, term_values = path, 'begins_with', (value,)
+        elif kind == 'between':
+            name, term_op, term_values = term[1], 'between', term[2:]
+        elif kind == 'cmp' and term[1] != '<>':
+            name, term_op, term_values = term[2], term[1], (term[3],)
+        else:
+            raise _Error("invalid operator used in KeyConditionExpression")
+        if name[0] != 'path' or len(name[1]) != 1:
+            raise _Error("key conditions must be on key attributes")
+        name = name[1][0]
+        typed = []
+        for value in term_values:
+            if value[0] != 'value':
+                raise _Error("key condition operands must be values")
+            typed.append(_key_value(table.types.get(name), value[1], name))
+        if name == hash_name and term_op == '=' and hvalue is None:
+            hvalue = typed[0]
+        elif name == range_name and op is None:
+            op, bounds = term_op, tuple(typed)
+        else:
+            raise _Error(f"invalid key condition on attribute '{name}'")
+    if hvalue is None:
+        raise _Error("query key condition must include an equality "
+                     "condition on the hash key")
+    return hvalue, op, bounds, parser
+
+
+class MemoryClient:
+
+    """
+    An in-process stand-in for a boto3 DynamoDB client.
+
+    Method names, parameters and responses follow the low-level client API,
+    and errors are raised as botocore ClientErrors with the same codes that
+    DynamoDB uses.
+    """
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else Database()
+
+    # Tables
+
+    @_operation
+    def create_table(self, *, TableName, KeySchema, AttributeDefinitions,
+                     ProvisionedThroughput=None, LocalSecondaryIndexes=None,
+                     GlobalSecondaryIndexes=None, StreamSpecification=None,
+                     BillingMode=None):
+        if TableName in self.database.tables:
+            raise _Error(f"Table already exists: {TableName}",
+                         'ResourceInUseException')
+        params = {
+            'KeySchema': KeySchema,
+            'AttributeDefinitions': AttributeDefinitions,
+            'ProvisionedThroughput': ProvisionedThroughput,
+            'LocalSecondaryIndexes': LocalSecondaryIndexes,
+            'GlobalSecondaryIndexes': GlobalSecondaryIndexes,
+            'StreamSpecification': StreamSpecification,
+        }
+        table = Table(TableName, params)
+        self.database.tables[TableName] = table
+        if table.stream is not None:
+            self.database.streams[table.stream.arn] = table.stream
+        return {'TableDescription': table.describe()}
+
+    @_operation
+    def delete_table(self, *, TableName):
+        table = self.database.table(TableName)
+        del self.database.tables[TableName]
+        if table.stream is not None:
+            table.stream.enabled = False
+        return {'TableDescription': table.describe(status='DELETING')}
+
+    @_operation
+    def describe_table(self, *, TableName):
+        return {'Table': self.database.table(TableName).describe()}
+
+    @_operation
+    def list_tables(self, *, ExclusiveStartTableName=None, Limit=100):
+        names = sorted(self.database.tables)
+        if ExclusiveStartTableName is not None:
+            names = names[bisect.bisect_right(names,
+                                              ExclusiveStartTableName):]
+        response = {'TableNames': names[:Limit]}
+        if len(names) > Limit:
+            response['LastEvaluatedTableName'] = names[Limit - 1]
+        return response
+
+    # Items
+
+    def _condition(self, expression, names, values):
+        if expression is None:
+            return None, None
+        return _parse('condition', expression, names, values)
+
+    def _check_condition(self, node, item):
+        if node is not None and not _evaluate(node, item or {}):
+            raise _Error("The conditional request failed",
+                         'ConditionalCheckFailedException')
+
+    @_operation
+    def put_item(self, *, TableName, Item, ConditionExpression=None,
+                 ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, ReturnValues='NONE',
+                 ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        item = _copy_item(Item)
+        key = {name: item.get(name) for name in table.key_names}
+        table.check_key(key)
+        node, parser = self._condition(ConditionExpression,
+                                       ExpressionAttributeNames,
+                                       ExpressionAttributeValues)
+        _check_placeholders(ExpressionAttributeNames,
+                            ExpressionAttributeValues, (parser,))
+        old = table.get(key)
+        self._check_condition(node, old)
+        table.write(old, item)
+        response = {}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy_item(old)
+        size = max(item_size(item), item_size(old or {}))
+        return _capacity(response, TableName, _write_units(size),
+                         ReturnConsumedCapacity)
+
+    @_operation
+    def get_item(self, *, TableName, Key, ConsistentRead=False,
+                 ProjectionExpression=None, ExpressionAttributeNames=None,
+                 ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        paths, parser = _projection(ProjectionExpression,
+                                    ExpressionAttributeNames)
+        _check_placeholders(ExpressionAttributeNames, None, (parser,))
+        item = table.get(Key)
+        response = {}
+        if item is not None:
+            response['Item'] = _project(item, paths)
+        size = item_size(item or {})
+        return _capacity(response, TableName,
+                         _read_units(size, ConsistentRead),
+                         ReturnConsumedCapacity)
+
+    @_operation
+    def update_item(self, *, TableName, Key, UpdateExpression=None,
+                    ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        table.check_key(Key)
+        node, condition_parser = self._condition(ConditionExpression,
+                                                 ExpressionAttributeNames,
+                                                 ExpressionAttributeValues)
+        actions, update_parser = [], None
+        if UpdateExpression is not None:
+            actions, update_parser = _parse('update', UpdateExpression,
+                                            ExpressionAttributeNames,
+                                            ExpressionAttributeValues)
+        _check_placeholders(ExpressionAttributeNames,
+                            ExpressionAttributeValues,
+                            (condition_parser, update_parser))
+        for _, path, _ in actions:
+            if path[1][0] in table.key_names:
+                raise _Error(f"cannot update attribute {path[1][0]}: it is "
+                             "part of the key")
+        old = table.get(Key)
+        self._check_condition(node, old)
+        item = old if old is not None else _copy_item(Key)
+        touched = set()
+        if actions:
+            item, touched = _apply_update(actions, item)
+        table.write(old, item)
+        response = {}
+        if ReturnValues in ('ALL_OLD', 'UPDATED_OLD') and old is not None:
+            source = old
+        elif ReturnValues in ('ALL_NEW', 'UPDATED_NEW'):
+            source = item
+        else:
+            source = None
+        if source is not None:
+            if ReturnValues.startswith('UPDATED'):
+                source = {k: v for k, v in source.items() if k in touched}
+            response['Attributes'] = _copy_item(source)
+        size = max(item_size(item), item_size(old or {}))
+        return _capacity(response, TableName, _write_units(size),
+                         ReturnConsumedCapacity)
+
+    @_operation
+    def delete_item(self, *, TableName, Key, ConditionExpression=None,
+                    ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE',
+                    ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        node, parser = self._condition(ConditionExpression,
+                                       ExpressionAttributeNames,
+                                       ExpressionAttributeValues)
+        _check_placeholders(ExpressionAttributeNames,
+                            ExpressionAttributeValues, (parser,))
+        old = table.get(Key)
+        self._check_condition(node, old)
+        if old is not None:
+            table.write(old, None)
+        response = {}
+        if ReturnValues == 'ALL_OLD' and old is not None:
+            response['Attributes'] = _copy_item(old)
+        return _capacity(response, TableName,
+                         _write_units(item_size(old or {})),
+                         ReturnConsumedCapacity)
+
+    # Batches
+
+    @_operation
+    def batch_get_item(self, *, RequestItems, ReturnConsumedCapacity='NONE'):
+        total = sum(len(request['Keys']) for request in RequestItems.values())
+        if total > MAX_BATCH_GET:
+            raise _Error("Too many items requested for the BatchGetItem "
+                         "call")
+        responses = {}
+        consumed = []
+        for table_name, request in RequestItems.items():
+            table = self.database.table(table_name)
+            paths, parser = _projection(
+                request.get('ProjectionExpression'),
+                request.get('ExpressionAttributeNames'))
+            _check_placeholders(request.get('ExpressionAttributeNames'),
+                                None, (parser,))
+            consistent = request.get('ConsistentRead', False)
+            items = responses[table_name] = []
+            units = 0
+            for key in request['Keys']:
+                item = table.get(key)
+                units += _read_units(item_size(item or {}), consistent)
+                if item is not None:
+                    items.append(_project(item, paths))
+            consumed.append({'TableName': table_name, 'CapacityUnits': units})
+        response = {'Responses': responses, 'UnprocessedKeys': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            response['ConsumedCapacity'] = consumed
+        return response
+
+    @_operation
+    def batch_write_item(self, *, RequestItems,
+                         ReturnConsumedCapacity='NONE'):
+        total = sum(map(len, RequestItems.values()))
+        if total > MAX_BATCH_WRITE:
+            raise _Error("Too many items requested for the BatchWriteItem "
+                         "call")
+        # validate everything before writing anything, as DynamoDB does
+        writes = []
+        seen = set()
+        for table_name, requests in RequestItems.items():
+            table = self.database.table(table_name)
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = _copy_item(request['PutRequest']['Item'])
+                    key = {name: item.get(name) for name in table.key_names}
+                else:
+                    item = None
+                    key = request['DeleteRequest']['Key']
+                table.check_key(key)
+                identity = (table_name, _canonical({'M': key}))
+                if identity in seen:
+                    raise _Error("Provided list of item keys contains "
+                                 "duplicates")
+                seen.add(identity)
+                writes.append((table, key, item))
+        consumed = {}
+        for table, key, item in writes:
+            old = table.get(key)
+            if item is not None or old is not None:
+                table.write(old, item)
+            size = max(item_size(item or {}), item_size(old or {}))
+            consumed[table.name] = (consumed.get(table.name, 0) +
+                                    _write_units(size))
+        response = {'UnprocessedItems': {}}
+        if ReturnConsumedCapacity in ('TOTAL', 'INDEXES'):
+            response['ConsumedCapacity'] = [
+                {'TableName': name, 'CapacityUnits': units}
+                for name, units in consumed.items()
+            ]
+        return response
+
+    # Query and scan
+
+    def _page(self, table, index, items, *, limit, filter_node, paths,
+              select, consistent, return_consumed):
+        if limit is not None and limit < 1:
+            raise _Error("Limit must be greater than or equal to 1")
+        result = []
+        count = scanned = size = 0
+        previous = last = None
+        for item in items:
+            if (limit is not None and scanned >= limit) or \
+                    size >= MAX_PAGE_SIZE:
+                key_names = table.key_names + [
+                    name for name in (index.key_names if index else ())
+                    if name not in table.key_names
+                ]
+                last = {name: _copy(previous[name]) for name in key_names}
+                break
+            previous = item
+            scanned += 1
+            size += item_size(item)
+            if filter_node is not None and not _evaluate(filter_node, item):
+                continue
+            count += 1
+            if select != 'COUNT':
+                visible = index.project(item) if index else item
+                result.append(_project(visible, paths))
+        response = {'Count': count, 'ScannedCount': scanned}
+        if select != 'COUNT':
+            response['Items'] = result
+        if last is not None:
+            response['LastEvaluatedKey'] = last
+        return _capacity(response, table.name,
+                         _read_units(size, consistent), return_consumed)
+
+    def _expressions(self, filter_expression, projection_expression, names,
+                     values, key_parser=None):
+        filter_node = filter_parser = None
+        if filter_expression is not None:
+            filter_node, filter_parser = _parse('condition',
+                                                filter_expression,
+                                                names, values)
+        paths, parser = _projection(projection_expression, names)
+        _check_placeholders(names, values,
+                            (key_parser, filter_parser, parser))
+        return filter_node, paths
+
+    @_operation
+    def query(self, *, TableName, KeyConditionExpression, IndexName=None,
+              FilterExpression=None, ProjectionExpression=None,
+              ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              ScanIndexForward=True, Limit=None, ExclusiveStartKey=None,
+              Select='ALL_ATTRIBUTES', ConsistentRead=False,
+              ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        index = table.index(IndexName)
+        hvalue, op, bounds, key_parser = _key_condition(
+            table, index, KeyConditionExpression, ExpressionAttributeNames,
+            ExpressionAttributeValues)
+        filter_node, paths = self._expressions(
+            FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+            ExpressionAttributeValues, key_parser)
+        store = (index or table).store
+        start = None
+        if ExclusiveStartKey is not None:
+            start = store.sort_value(ExclusiveStartKey)
+        items = store.query(hvalue, op, bounds, forward=ScanIndexForward,
+                            start=start)
+        return self._page(table, index, items, limit=Limit,
+                          filter_node=filter_node, paths=paths,
+                          select=Select, consistent=ConsistentRead,
+                          return_consumed=ReturnConsumedCapacity)
+
+    @_operation
+    def scan(self, *, TableName, IndexName=None, FilterExpression=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None,
+             ExpressionAttributeValues=None, Limit=None,
+             ExclusiveStartKey=None, Segment=None, TotalSegments=None,
+             Select='ALL_ATTRIBUTES', ConsistentRead=False,
+             ReturnConsumedCapacity='NONE'):
+        table = self.database.table(TableName)
+        index = table.index(IndexName)
+        if (Segment is None) != (TotalSegments is None):
+            raise _Error("Segment and TotalSegments must be provided "
+                         "together")
+        if TotalSegments is not None and not 0 <= Segment < TotalSegments:
+            raise _Error("Segment must be less than TotalSegments")
+        filter_node, paths = self._expressions(
+            FilterExpression, ProjectionExpression, ExpressionAttributeNames,
+            ExpressionAttributeValues)
+        store = (index or table).store
+        items = store.scan(Segment or 0, TotalSegments or 1,
+                           start=ExclusiveStartKey)
+        return self._page(table, index, items, limit=Limit,
+                          filter_node=filter_node, paths=paths,
+                          select=Select, consistent=ConsistentRead,
+                          return_consumed=ReturnConsumedCapacity)
+
+
+class MemoryStreamsClient:
+
+    """
+    An in-process stand-in for a boto3 DynamoDB Streams client, reading the
+    streams of the tables in a `Database`.
+
+    Shard iterators don't expire, and a shard iterator for a table that
+    still exists never reaches the end of its shard.
+    """
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else Database()
+
+    @_operation
+    def list_streams(self, *, TableName=None, Limit=100,
+                     ExclusiveStartStreamArn=None):
+        streams = sorted(
+            (stream for stream in self.database.streams.values()
+             if TableName in (None, stream.table_name)),
+            key=lambda stream: stream.arn,
+        )
+        if ExclusiveStartStreamArn is not None:
+            streams = [stream for stream in streams
+                       if stream.arn > ExclusiveStartStreamArn]
+        response = {'Streams': [
+            {'StreamArn': stream.arn, 'TableName': stream.table_name,
+             'StreamLabel': stream.label}
+            for stream in streams[:Limit]
+        ]}
+        if len(streams) > Limit:
+            response['LastEvaluatedStreamArn'] = streams[Limit - 1].arn
+        return response
+
+    @_operation
+    def describe_stream(self, *, StreamArn, Limit=100,
+                        ExclusiveStartShardId=None):
+        stream = self.database.stream(StreamArn)
+        shards = range(len(stream.shard_ids))
+        if ExclusiveStartShardId is not None:
+            shards = range(stream.shard(ExclusiveStartShardId) + 1,
+                           len(stream.shard_ids))
+        description = stream.describe()
+        description['Shards'] = [stream.describe_shard(shard)
+                                 for shard in shards[:Limit]]
+        if len(shards) > Limit:
+            description['LastEvaluatedShardId'] = \
+                stream.shard_ids[shards[Limit - 1]]
+        return {'StreamDescription': description}
+
+    @_operation
+    def get_shard_iterator(self, *, StreamArn, ShardId, ShardIteratorType,
+                           SequenceNumber=None):
+        stream = self.database.stream(StreamArn)
+        shard = stream.shard(ShardId)
+        numbers = stream.sequence_numbers[shard]
+        if ShardIteratorType == 'TRIM_HORIZON':
+            position = 0
+        elif ShardIteratorType == 'LATEST':
+            position = len(numbers)
+        elif ShardIteratorType in ('AT_SEQUENCE_NUMBER',
+                                   'AFTER_SEQUENCE_NUMBER'):
+            if SequenceNumber is None:
+                raise _Error(f"SequenceNumber is required for "
+                             f"{ShardIteratorType}")
+            search = (bisect.bisect_left
+                      if ShardIteratorType == 'AT_SEQUENCE_NUMBER'
+                      else bisect.bisect_right)
+            position = search(numbers, SequenceNumber.zfill(21))
+        else:
+            raise _Error(f"invalid ShardIteratorType: {ShardIteratorType}")
+        return {'ShardIterator': f'{StreamArn}|{ShardId}|{position}'}
+
+    @_operation
+    def get_records(self, *, ShardIterator, Limit=MAX_STREAM_RECORDS):
+        try:
+            arn, shard_id, position = ShardIterator.rsplit('|', 2)
+            position = int(position)
+        except ValueError:
+            raise _Error(f"invalid ShardIterator: {ShardIterator}")
+        if not 1 <= Limit <= MAX_STREAM_RECORDS:
+            raise _Error(f"Limit must be from 1 to {MAX_STREAM_RECORDS}")
+        stream = self.database.stream(arn)
+        records = stream.records[stream.shard(shard_id)]
+        page = records[position:position + Limit]
+        position += len(page)
+        response = {'Records': copy.deepcopy(page)}
+        if stream.enabled or position < len(records):
+            response['NextShardIterator'] = f'{arn}|{shard_id}|{position}'
+        return response
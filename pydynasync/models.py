@@ -1,35 +1,85 @@
 import collections
-from weakref import WeakKeyDictionary
 
-from . import attributes, util
-from .util import NOTSET
+from . import attributes, overflow, sharding, util
+from .util import NOTFOUND, NOTSET
 
 
-class Changes:
+def _changed_values(instance, mask):
+    return {
+        name: getattr(instance, name, None)
+        for index, (name, _) in enumerate(type(instance)._attributes)
+        if mask & (1 << index)
+    } if mask else {}
 
-    def __init__(self):
-        self._changes = WeakKeyDictionary()
 
-    def _convert(self, instance, value):
-        return {
-            name: getattr(instance, name, None)
-            for index, name in enumerate(type(instance)._members)
-            if (value or 0) & (1 << index)
-        } if value else {}
+def _make_init(model):
+    """
+    Generate the __init__ of a model class, which takes its attributes as
+    keyword arguments without looking them up on the class.
+    """
+    names = [name for name, _ in model._attributes]
+    # attribute names never start with '__', so these names are free
+    namespace = {'__NOTSET': NOTSET, '__State': attributes.InstanceState}
+    lines = [
+        'def __init__(__self, *, _reset=False, ' +
+        ''.join(f'{name}=__NOTSET, ' for name in names) + '**__invalid):',
+        f'    __self._state = __State({len(names)})',
+        '    if __invalid:',
+        '        raise TypeError("invalid attributes: " + ", ".join('
+        '__invalid))',
+    ]
+    for mode, method in (('if _reset:', 'reset'), ('else:', '__set__')):
+        lines.append('    ' + mode)
+        for index, (name, attr) in enumerate(model._attributes):
+            namespace[f'__{method}{index}'] = getattr(attr, method)
+            lines.append(f'        if {name} is not __NOTSET:')
+            lines.append(f'            __{method}{index}(__self, {name})')
+        lines.append('        pass')
+    exec('\n'.join(lines), namespace)
+    init = namespace['__init__']
+    init.__qualname__ = f'{model.__qualname__}.__init__'
+    init.__module__ = model.__module__
+    init.__doc__ = Model.__init__.__doc__
+    init._generated = True
+    return init
 
-    def get(self, instance):
-        return self._convert(instance, self._changes.get(instance, 0))
 
-    def set(self, instance, index):
-        prev = self._changes.get(instance, 0)
-        self._changes[instance] = prev | (1 << index)
-
-    def unset(self, instance, index):
-        prev = self._changes.get(instance, 0)
-        self._changes[instance] = prev & ~(1 << index)
-
-    def clear(self, instance):
-        self._changes[instance] = 0
+def _make_builder(model, columns):
+    """
+    Generate a function that creates an instance of a model class from a
+    row of values of the attributes named by `columns`, as if they were
+    given as keyword arguments.
+    """
+    attrs = dict(model._attributes)
+    invalid = [name for name in columns if name not in attrs]
+    if invalid:
+        raise TypeError("invalid attributes: " + ', '.join(invalid))
+    namespace = {'__new': model.__new__, '__model': model,
+                 '__State': attributes.InstanceState}
+    lines = [
+        'def __build(__row):',
+        '    (' + ''.join(f'__v{i}, ' for i in range(len(columns))) +
+        ') = __row',
+        '    __self = __new(__model)',
+        f'    __state = __self._state = __State({len(attrs)})',
+    ]
+    changed = 0
+    for i, name in enumerate(columns):
+        attr = attrs[name]
+        if type(attr).__set__ is attributes.Attribute.__set__:
+            # a new instance's values are all changes
+            namespace[f'__check{i}'] = attr._check
+            lines.append(f'    __state.values[{attr._index}] = '
+                         f'__check{i}(__v{i})')
+            changed |= 1 << attr._index
+        else:
+            # to be tracked
+            namespace[f'__set{i}'] = attr.__set__
+            lines.append(f'    __set{i}(__self, __v{i})')
+    lines.append(f'    __state.changed |= {changed}')
+    lines.append('    return __self')
+    exec('\n'.join(lines), namespace)
+    return namespace['__build']
 
 
 class ModelMeta(type):
@@ -42,12 +92,21 @@ class ModelMeta(type):
         # print(f'__new__, name={name}, bases={bases}, namespace={namespace}, '
         #       f'kwds={kwds}')
         ddb_name = kwds.pop('ddb_name', None) or name
+        overflow_option = kwds.pop('overflow', None)
+        shards = kwds.pop('shards', None)
+        shard_mode = kwds.pop('shard_mode', None)
         if kwds:
             msg = "invalid model class parameter(s): " + ', '.join(kwds.keys())
             raise TypeError(msg)
         result = type.__new__(cls, name, bases, dict(namespace))
         result._members = tuple(x for x in namespace if not x.startswith('__'))
         result._ddb_name = ddb_name
+        result._attributes = tuple(
+            (member, namespace[member]) for member in result._members
+            if isinstance(namespace[member], attributes.Attribute)
+        )
+        result._overflow = None
+        result._sharding = None
         # assert result._ddb_name == 'ModelMeta.not_ddb_name', result._ddb_name
 
         # for user-defined models (not defined in this module),
@@ -73,19 +132,53 @@ class ModelMeta(type):
             # TODO: how best to expose these and other metadata?
             result._hash_key = hash_keys[0]
             result._range_key = range_keys[0] if range_keys else None
+            result._overflow = overflow.configure(result, overflow_option)
+            result._sharding = sharding.configure(result, shards, shard_mode)
+            # unless it has an __init__ of its own
+            init = result.__init__
+            if ((init is Model.__init__ or getattr(init, '_generated', False))
+                    and all(name != '_reset'
+                            for name, _ in result._attributes)):
+                result.__init__ = _make_init(result)
+        elif overflow_option or shards or shard_mode:
+            raise TypeError("invalid model class parameter(s): overflow, "
+                            "shards, shard_mode")
 
         return result
 
     @classmethod
     def get_changed(metacls, instance):
-        return metacls._changes.get(instance)
+        """
+        Get a dict of the changed attributes of an instance and their
+        values.
+        """
+        return _changed_values(instance,
+                               attributes.get_state(instance).changed)
 
     @classmethod
-    def clear_changed(metacls, instance):
-        metacls._changes.clear(instance)
+    def get_changed_mask(metacls, instance):
+        """
+        Get the bitmask of changed attributes of an instance, with a bit for
+        each attribute in order of definition.
+        """
+        return attributes.get_state(instance).changed
 
+    @classmethod
+    def clear_changed(metacls, instance):
+        attributes.get_state(instance).changed = 0
 
-ModelMeta._changes = Changes()
+    @classmethod
+    def set_saved(metacls, instance):
+        """
+        Use the current values of an instance as its original values for
+        change tracking, and clear its changes.
+        """
+        state = attributes.get_state(instance)
+        for index, (name, attr) in enumerate(type(instance)._attributes):
+            value = state.values[index]
+            if value is not NOTFOUND:
+                attr.reset(instance, value)
+        state.changed = 0
 
 
 class Model(metaclass=ModelMeta):
@@ -97,6 +190,15 @@ class Model(metaclass=ModelMeta):
         cls._ddb_name = ddb_name
 
     def __init__(self, *, _reset=False, **kwargs):
+        """
+        Create an instance with the attribute values given as keyword
+        arguments. If `_reset` is true, they're also its original values
+        for change tracking (as if it was loaded with them).
+        """
+        # change tracking state, kept on each instance rather than in a
+        # shared registry, so that threads using different instances don't
+        # share any state
+        self._state = attributes.InstanceState(len(type(self)._attributes))
         members = type(self)._members
         for name in members:
             descriptor = getattr(type(self), name)
@@ -110,6 +212,149 @@ class Model(metaclass=ModelMeta):
         if kwargs:
             raise TypeError("invalid attributes: " + ', '.join(kwargs.keys()))
 
+    def __getstate__(self):
+        # values, the original values that differ from them, and the
+        # changes bitmask (tracked containers are pickled as plain ones),
+        # and the item's shard if it's known
+        state = attributes.get_state(self)
+        values = list(state.values)
+        original = {
+            index: value for index, value in enumerate(state.original)
+            if value is not values[index]
+        }
+        if state.shard is not None:
+            return values, original, state.changed, state.shard
+        return values, original, state.changed
+
+    def __setstate__(self, pickled):
+        values, original, changed, *shard = pickled
+        cls = type(self)
+        if len(values) != len(cls._attributes):
+            raise ValueError(f"pickled '{cls.__name__}' instance has "
+                             f"{len(values)} attributes, but the model "
+                             f"class has {len(cls._attributes)}")
+        state = self._state = attributes.InstanceState(len(values))
+        state.changed = changed
+        state.shard = shard[0] if shard else None
+        for index, (name, attr) in enumerate(cls._attributes):
+            value = values[index]
+            attr._restore(self, value, original.get(index, value))
+
+    @classmethod
+    def bulk_create(cls, rows, *, columns=None):
+        """
+        Create a list of instances from rows of values, like instances
+        created with them as keyword arguments, but without doing for each
+        row what's the same for all of them.
+
+        Rows are tuples (or other sequences) of values of the attributes
+        named by `columns`, which default to all the attributes in order of
+        definition, or dicts of values by attribute name.
+        """
+        make = _make_builder(
+            cls, [name for name, _ in cls._attributes] if columns is None
+            else columns)
+        makers = {}
+        instances = []
+        for row in rows:
+            if isinstance(row, dict):
+                names = tuple(row)
+                maker = makers.get(names)
+                if maker is None:
+                    maker = makers[names] = _make_builder(cls, names)
+                instances.append(maker(row.values()))
+            else:
+                instances.append(make(row))
+        return instances
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        Create an instance from a DynamoDB item, using its values as the
+        original values for change tracking.
+
+        Item attributes that aren't model attributes are ignored.
+        """
+        instance = cls()
+        if cls._sharding is not None:
+            hash_name = cls._hash_key.ddb_name
+            if hash_name in item:
+                value, shard = cls._sharding.split(item[hash_name]['S'])
+                item = dict(item)
+                item[hash_name] = {'S': value}
+                instance._state.shard = shard
+        for name, attr in cls._attributes:
+            if attr.ddb_name in item:
+                attr.reset(instance, attr.deserialize(item))
+        return instance
+
+    def to_item(self):
+        """
+        Serialize to a DynamoDB item, leaving out attributes with no value.
+        """
+        item = {}
+        for name, attr in type(self)._attributes:
+            value = attr.values.get(self)
+            if value is not None and value is not NOTSET:
+                item.update(attr.serialize(value))
+        cls = type(self)
+        if (cls._sharding is not None and cls._hash_key.ddb_name in item and
+                cls._range_key.ddb_name in item):
+            item.update(self.key_item())
+        return item
+
+    @classmethod
+    def make_key(cls, hash_value, range_value=None, *, shard=None):
+        """
+        Serialize hash and range key values to a DynamoDB key.
+
+        For a model that shards its hash keys, the key is that of the item
+        in `shard`, which defaults to the item's shard in 'hash' mode (see
+        `sharding`).
+        """
+        key = cls._hash_key.serialize(hash_value)
+        if cls._range_key is not None:
+            if range_value is None:
+                raise TypeError("model class '{}' requires a range key "
+                                "value".format(cls.__name__))
+            key.update(cls._range_key.serialize(range_value))
+        elif range_value is not None:
+            raise TypeError("model class '{}' does not define a range_key "
+                            "attribute".format(cls.__name__))
+        if cls._sharding is not None:
+            if shard is None:
+                if cls._sharding.mode != 'hash':
+                    raise TypeError(f"model class '{cls.__name__}' shards "
+                                    "keys at random, so a key needs a shard")
+                (type_, data), = key[cls._range_key.ddb_name].items()
+                shard = cls._sharding.shard_of(data, type_)
+            hash_name = cls._hash_key.ddb_name
+            key[hash_name] = {
+                'S': cls._sharding.suffixed(key[hash_name]['S'], shard)}
+        elif shard is not None:
+            raise TypeError(f"model class '{cls.__name__}' does not shard "
+                            "its keys")
+        return key
+
+    def key_item(self):
+        """
+        Get the DynamoDB key of this instance.
+        """
+        cls = type(self)
+        range_key = cls._range_key
+        shard = None
+        if cls._sharding is not None and cls._sharding.mode != 'hash':
+            # a new item's shard is chosen once
+            state = attributes.get_state(self)
+            if state.shard is None:
+                state.shard = cls._sharding.choose()
+            shard = state.shard
+        return cls.make_key(
+            getattr(self, cls._hash_key.name),
+            None if range_key is None else getattr(self, range_key.name),
+            shard=shard,
+        )
+
     def _key(self):
         """
         Get instance key to be used for equality testing and hashing.
@@ -144,3 +389,53 @@ class Model(metaclass=ModelMeta):
         elif type(self) != type(other):
             return NotImplemented
         return not(self == other)
+
+
+def dump_many(instances):
+    """
+    Get a columnar payload of instances of one model class, for `load_many`.
+
+    The payload holds the values of each attribute of all the instances in
+    a list (and the changes of each instance), so it pickles smaller and
+    faster than the instances do one by one: it's the form in which to
+    send many instances to another process, such as a worker of a
+    `concurrent.futures.ProcessPoolExecutor`.
+    """
+    instances = list(instances)
+    if not instances:
+        return None, [], [], []
+    cls = type(instances[0])
+    for instance in instances:
+        if type(instance) is not cls:
+            raise TypeError(f"expected only '{cls.__name__}' instances, but "
+                            f"received a '{type(instance).__name__}' instance")
+    states = [attributes.get_state(instance) for instance in instances]
+    columns = []
+    originals = []
+    for index in range(len(cls._attributes)):
+        column = [state.values[index] for state in states]
+        columns.append(column)
+        originals.append({
+            row: state.original[index] for row, state in enumerate(states)
+            if state.original[index] is not column[row]
+        })
+    return cls, columns, originals, [state.changed for state in states]
+
+
+def load_many(payload):
+    """
+    Get the list of instances in a payload from `dump_many`, with their
+    values, original values and changes as they were when it was made.
+    """
+    cls, columns, originals, changed = payload
+    instances = []
+    for row, mask in enumerate(changed):
+        instance = cls.__new__(cls)
+        instance.__setstate__((
+            [column[row] for column in columns],
+            {index: original[row]
+             for index, original in enumerate(originals) if row in original},
+            mask,
+        ))
+        instances.append(instance)
+    return instances
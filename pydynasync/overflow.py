@@ -0,0 +1,351 @@
+"""
+Overflow of oversized attribute values into chunk items.
+
+DynamoDB items can't be larger than 400KB. A model class defined with
+`overflow=True` (or with `overflow=` a maximum item size in bytes) stores
+the largest of an item's String, Binary and List values in chunk items
+whenever the item would be larger than that. Each value is split into
+pieces that are batch-written under the item's hash key, with range keys
+derived from the item's own (String) range key:
+
+    <range key> US <generation> US <attribute name> US <chunk number>
+
+where US is the ASCII unit separator, so an item's chunks sort right after
+it. The item itself is written last, without the overflowed values and
+with a manifest naming them and the generation of their chunks. Every
+write uses a new generation, so a reader never mixes chunks of different
+writes, and the chunks of the item being replaced are only deleted once
+the new item is in place.
+
+Reads get the item and query the first page of its chunks in parallel,
+and reassemble each value from the pages of chunks as they arrive.
+"""
+import itertools
+import threading
+import uuid
+
+from . import ddb, expressions, types
+
+# maximum item size for models defined with `overflow=True`, which leaves
+# room under the service limit for the keys and manifest
+DEFAULT_MAX_SIZE = 350 * 1024
+
+# smallest maximum item size a model may use
+MIN_MAX_SIZE = 4 * 1024
+
+SEPARATOR = '\x1f'
+
+# attribute of an item that lists its overflowed values
+MANIFEST = '_overflow'
+
+# attribute of a chunk item that holds its piece of a value
+CHUNK = '_chunk'
+
+# types of attribute values that can be split into chunks
+SPLIT_TYPES = ('S', 'B', 'L')
+
+# times to read an item whose chunks are replaced while it's being read
+READ_ATTEMPTS = 3
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ChunkError(ValueError):
+
+    """
+    The chunks of an item don't match its manifest.
+    """
+
+
+def configure(model, option):
+    """
+    Get the maximum item size for the `overflow` option of a model class,
+    or None if the model doesn't overflow.
+    """
+    if option is None or option is False:
+        return None
+    max_size = DEFAULT_MAX_SIZE if option is True else option
+    if (not isinstance(max_size, int) or
+            not MIN_MAX_SIZE <= max_size <= ddb.MAX_ITEM_SIZE):
+        raise ValueError(f"overflow for model class '{model.__name__}' must "
+                         f"be True or a maximum item size from "
+                         f"{MIN_MAX_SIZE} to {ddb.MAX_ITEM_SIZE} bytes")
+    range_key = model._range_key
+    if range_key is None or range_key.type is not types.AttrType.S:
+        raise TypeError(f"model class '{model.__name__}' must define a "
+                        "String range_key attribute to use overflow")
+    return max_size
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import concurrent.futures
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                8, thread_name_prefix='pydynasync-overflow')
+        return _executor
+
+
+def is_chunk(item):
+    """
+    Answer whether an item is a chunk item.
+    """
+    return CHUNK in item
+
+
+def is_chunk_key(model, key):
+    """
+    Answer whether a key of an overflow model's table is a chunk item's,
+    for when only the key is known (as in a stream record).
+    """
+    return SEPARATOR in key[model._range_key.ddb_name]['S']
+
+
+def chunk_range_key(range_value, generation, name, index):
+    return SEPARATOR.join((range_value, generation, name, f'{index:06d}'))
+
+
+def split_value(value, size):
+    """
+    Split a typed String, Binary or List value into typed pieces of at most
+    `size` bytes.
+    """
+    (type_, data), = value.items()
+    if type_ == 'S':
+        encoded = data.encode('utf-8')
+        pieces = []
+        start = 0
+        while start < len(encoded):
+            end = min(start + size, len(encoded))
+            # back up to the start of a multi-byte character
+            while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+                end -= 1
+            pieces.append({'S': encoded[start:end].decode('utf-8')})
+            start = end
+        return pieces
+    elif type_ == 'B':
+        view = memoryview(types.binary_from_client(data)).cast('B')
+        return [{'B': view[start:start + size].tobytes()}
+                for start in range(0, len(view), size)]
+    elif type_ == 'L':
+        pieces = []
+        current, current_size = [], 3
+        for elem in data:
+            elem_size = 1 + ddb.value_size(elem)
+            if elem_size + 3 > size:
+                raise ValueError(f"list element of {elem_size} bytes is too "
+                                 f"large to fit in a chunk of {size} bytes")
+            if current and current_size + elem_size > size:
+                pieces.append({'L': current})
+                current, current_size = [], 3
+            current.append(elem)
+            current_size += elem_size
+        if current:
+            pieces.append({'L': current})
+        return pieces
+    raise ValueError(f"values of type {type_} can't be split")
+
+
+def split_item(model, item, max_size, generation):
+    """
+    Split an item larger than `max_size` bytes into the item to write, with
+    its largest values replaced by a manifest, and the chunk items holding
+    those values. An item that isn't too large is returned with no chunks.
+    """
+    size = ddb.item_size(item)
+    if size <= max_size:
+        return item, []
+    hash_name = model._hash_key.ddb_name
+    range_name = model._range_key.ddb_name
+    range_value = item[range_name]['S']
+    candidates = sorted(
+        ((ddb.value_size(value), name) for name, value in item.items()
+         if name not in (hash_name, range_name) and
+         next(iter(value)) in SPLIT_TYPES),
+        reverse=True,
+    )
+    result = dict(item)
+    counts = {}
+    chunks = []
+    for value_size, name in candidates:
+        if size <= max_size:
+            break
+        overhead = ddb.item_size({
+            hash_name: item[hash_name],
+            range_name: {'S': chunk_range_key(range_value, generation,
+                                              name, 0)},
+            CHUNK: {'NULL': True},
+        })
+        pieces = split_value(result.pop(name), max_size - overhead)
+        size -= len(name.encode('utf-8')) + value_size
+        counts[name] = {'N': str(len(pieces))}
+        chunks.extend({
+            hash_name: item[hash_name],
+            range_name: {'S': chunk_range_key(range_value, generation,
+                                              name, index)},
+            CHUNK: piece,
+        } for index, piece in enumerate(pieces))
+    result[MANIFEST] = {'M': {
+        'generation': {'S': generation},
+        'chunks': {'M': counts},
+    }}
+    if ddb.item_size(result) > ddb.MAX_ITEM_SIZE:
+        raise ValueError("item is too large to store, even with its String, "
+                         "Binary and List values overflowed")
+    return result, chunks
+
+
+def _join(pieces):
+    type_ = next(iter(pieces[0]))
+    if type_ == 'S':
+        return {'S': ''.join(piece['S'] for piece in pieces)}
+    elif type_ == 'B':
+        return {'B': b''.join(types.binary_from_client(piece['B'])
+                              for piece in pieces)}
+    return {'L': [elem for piece in pieces for elem in piece['L']]}
+
+
+def reassemble(model, item, pages):
+    """
+    Restore the overflowed values of an item from `pages` (lists of its
+    chunk items, in range key order), returning the complete item.
+
+    Raises ChunkError if the chunks don't match the item's manifest.
+    """
+    item = dict(item)
+    manifest = item.pop(MANIFEST)['M']
+    generation = manifest['generation']['S']
+    counts = {name: int(count['N'])
+              for name, count in manifest['chunks']['M'].items()}
+    parts = {name: [] for name in counts}
+    range_name = model._range_key.ddb_name
+    for page in pages:
+        for chunk in page:
+            _, chunk_generation, name, index = \
+                chunk[range_name]['S'].rsplit(SEPARATOR, 3)
+            received = parts.get(name)
+            if chunk_generation != generation or received is None:
+                continue
+            if int(index) != len(received):
+                raise ChunkError(f"missing chunk {len(received)} of "
+                                 f"attribute '{name}'")
+            received.append(chunk[CHUNK])
+    for name, count in counts.items():
+        received = parts[name]
+        if len(received) != count:
+            raise ChunkError(f"found {len(received)} of {count} chunks of "
+                             f"attribute '{name}'")
+        item[name] = _join(received)
+    return item
+
+
+def _chunk_pages(client, table_name, model, key, *, consistent=False,
+                 keys_only=False):
+    hash_name = model._hash_key.ddb_name
+    range_name = model._range_key.ddb_name
+    condition = (
+        'KeyConditionExpression',
+        expressions.key_condition(model, 'begins_with'),
+        (key[hash_name], {'S': key[range_name]['S'] + SEPARATOR}),
+    )
+    projection = ()
+    if keys_only:
+        projection = ((
+            'ProjectionExpression',
+            expressions.projection(model, (model._hash_key.name,
+                                           model._range_key.name)),
+            (),
+        ),)
+    params = expressions.params(condition, *projection,
+                                TableName=table_name,
+                                ConsistentRead=consistent)
+    while True:
+        page = client.query(**params)
+        yield page.get('Items', [])
+        if 'LastEvaluatedKey' not in page:
+            return
+        params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+def _delete_chunks(client, table_name, model, key, *, keep=None):
+    from . import provision
+    range_name = model._range_key.ddb_name
+    for page in _chunk_pages(client, table_name, model, key,
+                             keys_only=True):
+        stale = [
+            chunk for chunk in page
+            if chunk[range_name]['S'].rsplit(SEPARATOR, 3)[1] != keep
+        ]
+        provision.batch_write(client, table_name, (
+            {'DeleteRequest': {'Key': chunk}} for chunk in stale
+        ))
+
+
+def get_item(client, table_name, model, key, *, consistent=False,
+             projection=()):
+    """
+    Get the complete item of an overflow model with `key`, or None.
+
+    `projection` holds an optional ProjectionExpression for the item, as
+    for `expressions.params`.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        pages = _chunk_pages(client, table_name, model, key,
+                             consistent=consistent)
+        first_page = get_executor().submit(next, pages)
+        item = client.get_item(**expressions.params(
+            *projection, TableName=table_name, Key=key,
+            ConsistentRead=consistent,
+        )).get('Item')
+        first_page = first_page.result()
+        if item is None or MANIFEST not in item:
+            return item
+        try:
+            return reassemble(model, item,
+                              itertools.chain([first_page], pages))
+        except ChunkError:
+            # the item was replaced while its chunks were being read
+            if attempt + 1 == READ_ATTEMPTS:
+                raise
+
+
+def complete_item(client, table_name, model, item, *, consistent=False):
+    """
+    Restore the overflowed values (if any) of an item read by a query or
+    scan.
+    """
+    if MANIFEST not in item:
+        return item
+    names = model._hash_key.ddb_name, model._range_key.ddb_name
+    key = {name: item[name] for name in names}
+    try:
+        return reassemble(model, item, _chunk_pages(
+            client, table_name, model, key, consistent=consistent))
+    except ChunkError:
+        return get_item(client, table_name, model, key,
+                        consistent=consistent)
+
+
+def put_item(client, table_name, model, item):
+    """
+    Write an item of an overflow model, splitting it into chunk items if it
+    is too large, and delete the chunks of the item it replaces.
+    """
+    from . import provision
+    generation = uuid.uuid4().hex
+    item, chunks = split_item(model, item, model._overflow, generation)
+    provision.batch_write(client, table_name, (
+        {'PutRequest': {'Item': chunk}} for chunk in chunks
+    ))
+    client.put_item(TableName=table_name, Item=item)
+    _delete_chunks(client, table_name, model, item, keep=generation)
+
+
+def delete_item(client, table_name, model, key):
+    """
+    Delete an item of an overflow model and its chunks.
+    """
+    client.delete_item(TableName=table_name, Key=key)
+    _delete_chunks(client, table_name, model, key)
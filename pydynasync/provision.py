@@ -0,0 +1,291 @@
+"""
+Table provisioning helpers.
+
+The botocore `table_exists` and `table_not_exists` waiters poll every 20
+seconds, which makes provisioning against a local endpoint painfully slow.
+The functions here poll `DescribeTable` at a configurable interval, give up
+after an overall timeout, and can create or delete many tables concurrently.
+
+For tests, `TablePool` creates tables once and empties them between uses
+with `truncate_table`.
+"""
+import concurrent.futures
+import copy
+import time
+
+import attr
+
+# seconds between DescribeTable calls while waiting on a table
+DEFAULT_DELAY = 0.1
+
+# seconds after which waiting on a table (or group of tables) is abandoned
+DEFAULT_TIMEOUT = 120.0
+
+# maximum number of requests in a BatchWriteItem call
+BATCH_WRITE_SIZE = 25
+
+ACTIVE = 'ACTIVE'
+DELETED = 'DELETED'
+
+
+@attr.s
+class TableTiming:
+    """How long a table took to reach its target status."""
+    name = attr.ib()
+    status = attr.ib()
+    elapsed = attr.ib()
+    polls = attr.ib(default=0)
+
+
+def is_not_found(error):
+    """
+    Answer whether a ClientError is a ResourceNotFoundException.
+    """
+    return error.response['Error']['Code'] == 'ResourceNotFoundException'
+
+
+def table_status(client, name):
+    """
+    Get the status of table `name`, or None if it does not exist.
+
+    A table with global secondary indexes is reported as 'ACTIVE' only
+    once all of its indexes are also active.
+    """
+    from botocore.exceptions import ClientError
+    try:
+        table = client.describe_table(TableName=name)['Table']
+    except ClientError as e:
+        if is_not_found(e):
+            return None
+        raise
+    status = table['TableStatus']
+    if status == ACTIVE:
+        for index in table.get('GlobalSecondaryIndexes', ()):
+            if index.get('IndexStatus', ACTIVE) != ACTIVE:
+                return index['IndexStatus']
+    return status
+
+
+def wait_for_status(client, name, status=ACTIVE, *, delay=DEFAULT_DELAY,
+                    timeout=DEFAULT_TIMEOUT, started=None):
+    """
+    Poll until table `name` has `status`, returning a `TableTiming`.
+
+    Use the status `DELETED` to wait until the table no longer exists.
+    Raises TimeoutError if the status isn't reached within `timeout` seconds
+    of `started` (a `time.monotonic()` value that defaults to now).
+    """
+    if started is None:
+        started = time.monotonic()
+    deadline = started + timeout
+    polls = 0
+    while True:
+        polls += 1
+        current = table_status(client, name)
+        if current == status or (current is None and status == DELETED):
+            return TableTiming(name, status, time.monotonic() - started,
+                               polls)
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(
+                f"table '{name}' did not reach status {status} within "
+                f"{timeout} seconds (last status: {current})")
+        time.sleep(delay)
+
+
+def create_table(client, spec, *, wait=True, delay=DEFAULT_DELAY,
+                 timeout=DEFAULT_TIMEOUT):
+    """
+    Create the table for `spec`, returning a `TableTiming`.
+
+    If `wait` is false, the timing only covers the CreateTable call and
+    the status is the one it returned.
+    """
+    from . import exp
+    started = time.monotonic()
+    description = exp.create_table(client, spec)
+    if not wait:
+        return TableTiming(spec.TableName, description['TableStatus'],
+                           time.monotonic() - started)
+    return wait_for_status(client, spec.TableName, ACTIVE, delay=delay,
+                           timeout=timeout, started=started)
+
+
+def delete_table(client, name, *, wait=True, delay=DEFAULT_DELAY,
+                 timeout=DEFAULT_TIMEOUT):
+    """
+    Delete table `name` if it exists, returning a `TableTiming`.
+    """
+    from botocore.exceptions import ClientError
+    started = time.monotonic()
+    try:
+        client.delete_table(TableName=name)
+    except ClientError as e:
+        if not is_not_found(e):
+            raise
+        return TableTiming(name, DELETED, time.monotonic() - started)
+    if not wait:
+        return TableTiming(name, 'DELETING', time.monotonic() - started)
+    return wait_for_status(client, name, DELETED, delay=delay,
+                           timeout=timeout, started=started)
+
+
+def _run_all(func, client, items, *, max_workers, timeout, **kwargs):
+    results = {}
+    if not items:
+        return results
+    deadline = time.monotonic() + timeout
+    workers = max_workers or len(items)
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(func, client, item, timeout=timeout, **kwargs)
+            for item in items
+        ]
+        remaining = max(0.0, deadline - time.monotonic())
+        done, pending = concurrent.futures.wait(futures, timeout=remaining)
+        for future in pending:
+            future.cancel()
+        if pending:
+            raise TimeoutError(f"{len(pending)} of {len(futures)} tables "
+                               f"not ready within {timeout} seconds")
+        for future in futures:
+            timing = future.result()
+            results[timing.name] = timing
+    return results
+
+
+def create_tables(client, specs, *, delay=DEFAULT_DELAY,
+                  timeout=DEFAULT_TIMEOUT, max_workers=None):
+    """
+    Create tables for all `specs` concurrently and wait until they're active.
+
+    Returns a dict of table name to `TableTiming`. Raises TimeoutError if
+    not all tables are active within `timeout` seconds.
+    """
+    return _run_all(create_table, client, list(specs), delay=delay,
+                    timeout=timeout, max_workers=max_workers)
+
+
+def delete_tables(client, names, *, delay=DEFAULT_DELAY,
+                  timeout=DEFAULT_TIMEOUT, max_workers=None):
+    """
+    Delete all tables in `names` concurrently and wait until they're gone.
+
+    Tables that don't exist are ignored. Returns a dict of table name to
+    `TableTiming`.
+    """
+    return _run_all(delete_table, client, list(names), delay=delay,
+                    timeout=timeout, max_workers=max_workers)
+
+
+def batch_write(client, table_name, requests):
+    """
+    Write `requests` (PutRequest or DeleteRequest dicts) to a table in
+    BatchWriteItem calls, retrying any unprocessed items.
+    """
+    requests = list(requests)
+    for start in range(0, len(requests), BATCH_WRITE_SIZE):
+        pending = {table_name: requests[start:start + BATCH_WRITE_SIZE]}
+        delay = DEFAULT_DELAY / 2
+        while pending:
+            response = client.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems')
+            if pending:
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+
+
+def key_names(client, name):
+    """
+    Get the key attribute names of table `name`, hash key first.
+    """
+    table = client.describe_table(TableName=name)['Table']
+    schema = sorted(table['KeySchema'], key=lambda k: k['KeyType'] != 'HASH')
+    return [key['AttributeName'] for key in schema]
+
+
+def truncate_table(client, name, *, segments=4, max_workers=None):
+    """
+    Delete every item in table `name`, returning the number deleted.
+
+    Each of `segments` parallel scans fetches just the keys of its part of
+    the table and deletes them with batch writes, which is much faster than
+    deleting and recreating the table.
+    """
+    names = {f'#k{i}': n for i, n in enumerate(key_names(client, name))}
+
+    def truncate_segment(segment):
+        deleted = 0
+        params = dict(TableName=name, Segment=segment,
+                      TotalSegments=segments,
+                      ProjectionExpression=', '.join(names),
+                      ExpressionAttributeNames=names)
+        while True:
+            page = client.scan(**params)
+            keys = page.get('Items', ())
+            batch_write(client, name,
+                        ({'DeleteRequest': {'Key': key}} for key in keys))
+            deleted += len(keys)
+            if 'LastEvaluatedKey' not in page:
+                return deleted
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    workers = max_workers or segments
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        return sum(executor.map(truncate_segment, range(segments)))
+
+
+class TablePool:
+
+    """
+    Tables that are created once and truncated between uses.
+
+    All tables are created concurrently when the pool is created, with
+    `prefix` prepended to each spec's table name (to keep the tables of
+    concurrent users of the same endpoint apart). Tables that already exist
+    are reused. `acquire` returns the description of an empty table.
+    """
+
+    def __init__(self, client, specs, *, prefix='', segments=4):
+        self.client = client
+        self.prefix = prefix
+        self.segments = segments
+        self.specs = {}
+        for spec in specs:
+            spec = copy.copy(spec)
+            spec.TableName = prefix + spec.TableName
+            self.specs[spec.TableName] = spec
+        missing = [spec for name, spec in self.specs.items()
+                   if table_status(client, name) is None]
+        create_tables(client, missing)
+        # tables that already existed may have items in them
+        self.used = set(self.specs) - {spec.TableName for spec in missing}
+        self.descriptions = {
+            name: client.describe_table(TableName=name)['Table']
+            for name in self.specs
+        }
+
+    def table_name(self, spec):
+        """
+        Get the name of the pool table for `spec` (or its table name).
+        """
+        name = getattr(spec, 'TableName', spec)
+        return self.prefix + name
+
+    def acquire(self, spec):
+        """
+        Get the description of the empty pool table for `spec`.
+        """
+        name = self.table_name(spec)
+        if name not in self.specs:
+            raise KeyError(f"no table '{name}' in pool")
+        if name in self.used:
+            truncate_table(self.client, name, segments=self.segments)
+        self.used.add(name)
+        return self.descriptions[name]
+
+    def close(self):
+        """
+        Delete all of the pool's tables.
+        """
+        delete_tables(self.client, list(self.specs))
+        self.used.clear()
@@ -0,0 +1,203 @@
+"""
+Read-only rows of model items.
+
+A row holds the attribute values of an item in a tuple, without the change
+tracking state of a model instance, for items that are read but not
+written: `table.Table.query` and `table.Table.scan` return rows instead of
+instances with `read_only=True`. The row class of a model class (see
+`row_class`) has a read-only attribute for each model attribute, and
+`Row.to_model` gets a model instance of a row, to write it.
+
+Rows are immutable all the way down: sets are loaded as frozensets, and
+lists and maps as tuples and `FrozenMap`s. Compressed values are
+decompressed when a row is loaded.
+
+Rows are hashed and compared as tuples of their values, so only rows of
+the same model class should be compared. Rows don't cache their own
+hashes, but their strings and `FrozenMap`s do.
+"""
+import collections.abc
+import operator
+import threading
+
+from . import attributes
+
+_classes_lock = threading.Lock()
+
+
+class FrozenMap(collections.abc.Mapping):
+
+    """
+    A read-only, hashable mapping, for the Map values of rows.
+    """
+
+    __slots__ = ('_data', '_hash')
+
+    def __init__(self, mapping):
+        self._data = dict(mapping)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._data!r})'
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenMap(
+            (key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return tuple(map(_freeze, value))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, FrozenMap):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return list(map(_thaw, value))
+    if isinstance(value, frozenset):
+        return set(value)
+    return value
+
+
+def _converters(attr):
+    """
+    Get the functions that convert an attribute's loaded value to a row
+    value, a model value to a row value, and a row value to a model value
+    (each None for no conversion).
+    """
+    if isinstance(attr, attributes.CompressedAttributeMixin):
+        return (lambda compressed: compressed.value), None, None
+    if isinstance(attr, attributes.DocumentAttributeMixin):
+        return _freeze, _freeze, _thaw
+    if attr.type.is_set_type():
+        return frozenset, frozenset, set
+    return None, None, None
+
+
+def _convert(converters, values):
+    return [value if convert is None or value is None else convert(value)
+            for convert, value in zip(converters, values)]
+
+
+class Row(tuple):
+
+    """
+    Base class of the row classes of model classes.
+    """
+
+    __slots__ = ()
+
+    # the names of the model attributes, in order of definition
+    _fields = ()
+    _model = None
+    # the (ddb_name, deserialize, load) of each attribute, and its other
+    # converters (see `_converters`)
+    _loaders = ()
+    _freezes = ()
+    _thaws = ()
+
+    @classmethod
+    def from_item(cls, item):
+        """
+        Create a row from a DynamoDB item, with None for the attributes it
+        doesn't have.
+        """
+        sharding = cls._model._sharding
+        if sharding is not None:
+            hash_name = cls._model._hash_key.ddb_name
+            if hash_name in item:
+                item = dict(item)
+                item[hash_name] = {
+                    'S': sharding.split(item[hash_name]['S'])[0]}
+        values = []
+        for ddb_name, deserialize, load in cls._loaders:
+            if ddb_name not in item:
+                values.append(None)
+            elif load is None:
+                values.append(deserialize(item))
+            else:
+                values.append(load(deserialize(item)))
+        return tuple.__new__(cls, values)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def to_model(self):
+        """
+        Create a model instance with the values of this row, as its
+        original values for change tracking (as if it was loaded).
+        """
+        model = self._model
+        if model._sharding is not None and model._sharding.mode != 'hash':
+            raise TypeError(f"rows of model class '{model.__name__}' don't "
+                            "know the shards of their items; get the "
+                            "instance to write it")
+        instance = model()
+        for (name, attr), value in zip(model._attributes,
+                                       _convert(self._thaws, self)):
+            if value is not None:
+                attr.reset(instance, value)
+        return instance
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={value!r}'
+                           for name, value in zip(self._fields, self))
+        return f'{type(self).__name__}({values})'
+
+    def __reduce__(self):
+        # row classes are pickled by their model class, and frozen values
+        # as plain ones
+        return _make_row, (self._model, _convert(self._thaws, self))
+
+
+def _make_row(model, values):
+    cls = row_class(model)
+    return tuple.__new__(cls, _convert(cls._freezes, values))
+
+
+def row_class(model):
+    """
+    Get the row class of a model class.
+    """
+    # kept on the model class, which its row class refers to
+    cls = model.__dict__.get('_row_class')
+    if cls is not None:
+        return cls
+    namespace = {
+        '__slots__': (),
+        '__module__': model.__module__,
+        '__doc__': f"A read-only row of a {model.__name__} item.",
+        '_fields': tuple(name for name, _ in model._attributes),
+        '_model': model,
+        '_loaders': tuple((attr.ddb_name, attr.deserialize,
+                           _converters(attr)[0])
+                          for _, attr in model._attributes),
+        '_freezes': tuple(_converters(attr)[1]
+                          for _, attr in model._attributes),
+        '_thaws': tuple(_converters(attr)[2]
+                        for _, attr in model._attributes),
+    }
+    for index, (name, _) in enumerate(model._attributes):
+        namespace[name] = property(operator.itemgetter(index))
+    cls = type(f'{model.__name__}Row', (Row,), namespace)
+    with _classes_lock:
+        if '_row_class' not in model.__dict__:
+            model._row_class = cls
+        return model._row_class
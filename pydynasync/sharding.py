@@ -0,0 +1,138 @@
+"""
+Write sharding of hot hash keys.
+
+A model class defined with `shards=N` spreads the items of each hash key
+over N shards, by storing its (String) hash key values with a shard suffix:
+
+    <hash key value>#<shard>
+
+for shards 1 to N, so no one hash key gets all of its writes. Instances
+are unaware of it: their hash key values are the unsuffixed ones, and
+`Model.to_item`, `Model.from_item` and `Model.make_key` add and remove the
+suffix.
+
+With `shard_mode='hash'` (the default), an item's shard is derived from its
+range key value, so a get reads only that shard. With `shard_mode='random'`,
+a new item's shard is random, which spreads writes evenly whatever their
+range keys, but a get has to read every shard; as the same key may then be
+written to different shards, it's only for items that are written once,
+such as events with unique range keys.
+
+A query of a hash key reads all its shards in parallel and merges their
+instances in range key order.
+"""
+import decimal
+import random
+import threading
+import zlib
+
+from . import types
+
+SEPARATOR = '#'
+
+MODES = ('hash', 'random')
+
+# maximum number of shards of a hash key
+MAX_SHARDS = 1000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Sharding:
+
+    """
+    The sharding of a model class's hash key values over `count` shards.
+    """
+
+    def __init__(self, count, mode):
+        self.count = count
+        self.mode = mode
+
+    def suffixed(self, value, shard):
+        """
+        Get the stored form of a hash key value in a shard.
+        """
+        return f'{value}{SEPARATOR}{shard}'
+
+    def split(self, stored):
+        """
+        Get the (hash key value, shard) of a stored hash key value, with a
+        shard of None if it has no shard suffix.
+        """
+        value, separator, shard = stored.rpartition(SEPARATOR)
+        if not separator or not shard.isdigit():
+            return stored, None
+        return value, int(shard)
+
+    def shard_of(self, range_data, type_='S'):
+        """
+        Get the shard of an item for the data of its typed range key value
+        (of type `type_`), in 'hash' mode.
+
+        Numbers are hashed in canonical form, so that equal numbers are in
+        the same shard.
+        """
+        if type_ == 'N':
+            range_data = types.canonical_number(range_data)
+        if isinstance(range_data, str):
+            range_data = range_data.encode('utf-8')
+        return zlib.crc32(range_data) % self.count + 1
+
+    def choose(self):
+        """
+        Get a random shard, for a new item in 'random' mode.
+        """
+        return random.randint(1, self.count)
+
+    def shards(self):
+        return range(1, self.count + 1)
+
+
+def configure(model, count, mode):
+    """
+    Get the `Sharding` for the `shards` and `shard_mode` options of a model
+    class, or None if its hash keys aren't sharded.
+    """
+    if count is None:
+        if mode is not None:
+            raise TypeError(f"model class '{model.__name__}' defines "
+                            "shard_mode without shards")
+        return None
+    if (not isinstance(count, int) or isinstance(count, bool) or
+            not 1 < count <= MAX_SHARDS):
+        raise ValueError(f"shards for model class '{model.__name__}' must be "
+                         f"a number of shards from 2 to {MAX_SHARDS}")
+    mode = mode or 'hash'
+    if mode not in MODES:
+        raise ValueError("shard_mode must be one of: " + ', '.join(MODES))
+    if model._hash_key.type is not types.AttrType.S:
+        raise TypeError(f"model class '{model.__name__}' must define a "
+                        "String hash_key attribute to use shards")
+    if model._range_key is None:
+        raise TypeError(f"model class '{model.__name__}' must define a "
+                        "range_key attribute to use shards")
+    return Sharding(count, mode)
+
+
+def sort_key(typed):
+    """
+    Get a value that sorts like a typed (S, N or B) key value in DynamoDB.
+    """
+    (type_, data), = typed.items()
+    if type_ == 'N':
+        return decimal.Decimal(data)
+    if type_ == 'B':
+        return bytes(types.binary_from_client(data))
+    # code point order is UTF-8 byte order
+    return data
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import concurrent.futures
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                8, thread_name_prefix='pydynasync-shards')
+        return _executor
@@ -0,0 +1,93 @@
+"""
+Coalescing of concurrent calls that would get the same result.
+
+A `Group` runs a call for a key only if no call for the same key is already
+in flight; otherwise the caller waits for the call in flight, and gets its
+result (or exception) too. Calls are coalesced between threads (`Group.do`)
+and coroutines (`Group.do_async`, which runs the call in the event loop's
+default executor), and between the two.
+
+Only calls that overlap are coalesced: nothing is cached once a call is
+done, so a call that starts after another finishes doesn't get a result
+older than itself.
+"""
+import threading
+
+import attr
+
+
+@attr.s
+class GroupStats:
+    """Counts of the calls made through a group."""
+    calls = attr.ib(default=0)
+    coalesced = attr.ib(default=0)
+
+
+class Group:
+
+    """
+    Coalesces concurrent calls with the same key into one.
+    """
+
+    def __init__(self):
+        self.stats = GroupStats()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _join(self, key):
+        """
+        Get the future of the call in flight for key, and whether this
+        caller is its leader, which must run it.
+        """
+        from concurrent.futures import Future
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats.coalesced += 1
+                return future, False
+            self.stats.calls += 1
+            future = self._calls[key] = Future()
+        # a running future can't be cancelled by one of its waiters
+        future.set_running_or_notify_cancel()
+        return future, True
+
+    def _run(self, key, future, func, args):
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._done(key)
+            future.set_exception(e)
+        else:
+            self._done(key)
+            future.set_result(result)
+
+    def _done(self, key):
+        # callers from now on make a new call
+        with self._lock:
+            del self._calls[key]
+
+    def do(self, key, func, *args):
+        """
+        Get the result of `func(*args)`, or of the call with the same key
+        in flight.
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, func, args)
+        return future.result()
+
+    async def do_async(self, key, func, *args):
+        """
+        Get the result of `func(*args)` (run in the default executor), or
+        of the call with the same key in flight.
+        """
+        import asyncio
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(
+                None, self._run, key, future, func, args)
+        return await asyncio.wrap_future(future)
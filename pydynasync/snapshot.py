@@ -0,0 +1,426 @@
+"""
+Compact binary snapshots of model instances and items.
+
+A snapshot holds a sequence of DynamoDB items in a versioned binary
+encoding, a quarter or so of the size of JSON of the typed items, for
+caching query results in local files or in memory shared between
+processes. It starts with a header:
+
+    MAGIC, a VERSION byte, then the schema: the name of the model class,
+    the number of its attributes, and the DynamoDB name and type of each
+
+(the schema of a snapshot of items of no model class is empty), followed
+by records, each of which is a varint of its length and then its values.
+A model record has a value for each attribute in the schema, in order. An
+item record has its number of attributes, and the name and value of each.
+
+A value is a tag byte, followed by its data: integers are zigzag-encoded
+varints, other numbers, strings and binary values are a varint of their
+length then their bytes, and sets, lists and maps are a varint of their
+length then their elements.
+
+`Snapshot` reads a snapshot from any buffer, such as a memory-mapped file
+(see `Snapshot.open`), decoding each record only as it's iterated over,
+so reading the first few records takes no longer for a large snapshot
+than for a small one. Counting the records (`len`) skips over each one
+without decoding it, so it takes time in proportion to their number.
+"""
+import io
+import mmap
+
+from .types import binary_from_client
+
+MAGIC = b'PDSS'
+VERSION = 1
+
+# value tags
+(_ABSENT, _S, _INT, _N, _B, _TRUE, _FALSE, _NULL, _SS, _NS, _BS, _L,
+ _M) = range(13)
+
+
+def schema(model):
+    """
+    Get the schema of a model class: the DynamoDB name and type of each
+    of its attributes.
+    """
+    return [(attr.ddb_name, attr.type.value) for _, attr in model._attributes]
+
+
+def _write_varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _write_bytes(out, data):
+    _write_varint(out, len(data))
+    out += data
+
+
+def _write_str(out, s):
+    _write_bytes(out, s.encode('utf-8'))
+
+
+def _write_number(out, s):
+    try:
+        n = int(s)
+    except ValueError:
+        n = None
+    # only integers that convert back to the same string are varints
+    if n is not None and str(n) == s:
+        out.append(_INT)
+        _write_varint(out, n * 2 if n >= 0 else -n * 2 - 1)
+    else:
+        out.append(_N)
+        _write_str(out, s)
+
+
+def _write_value(out, typed):
+    try:
+        (tag, data), = typed.items()
+    except (AttributeError, ValueError):
+        raise ValueError(f"invalid typed value: {typed!r}") from None
+    if tag == 'S':
+        out.append(_S)
+        _write_str(out, data)
+    elif tag == 'N':
+        _write_number(out, data)
+    elif tag == 'B':
+        out.append(_B)
+        _write_bytes(out, binary_from_client(data))
+    elif tag == 'BOOL':
+        out.append(_TRUE if data else _FALSE)
+    elif tag == 'NULL':
+        out.append(_NULL)
+    elif tag == 'SS':
+        out.append(_SS)
+        _write_varint(out, len(data))
+        for elem in data:
+            _write_str(out, elem)
+    elif tag == 'NS':
+        out.append(_NS)
+        _write_varint(out, len(data))
+        for elem in data:
+            _write_number(out, elem)
+    elif tag == 'BS':
+        out.append(_BS)
+        _write_varint(out, len(data))
+        for elem in data:
+            _write_bytes(out, binary_from_client(elem))
+    elif tag == 'L':
+        out.append(_L)
+        _write_varint(out, len(data))
+        for elem in data:
+            _write_value(out, elem)
+    elif tag == 'M':
+        out.append(_M)
+        _write_varint(out, len(data))
+        for name, elem in data.items():
+            _write_str(out, name)
+            _write_value(out, elem)
+    else:
+        raise ValueError(f"invalid type '{tag}' in item")
+
+
+def _header(model):
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    if model is None:
+        _write_str(out, '')
+        _write_varint(out, 0)
+    else:
+        _write_str(out, model.__name__)
+        attributes = schema(model)
+        _write_varint(out, len(attributes))
+        for name, type_ in attributes:
+            _write_str(out, name)
+            _write_str(out, type_)
+    return out
+
+
+def dump(records, file, *, model=None):
+    """
+    Write a snapshot of `records` to a binary file, returning the number
+    of records written.
+
+    The records are instances of `model`, or typed items if no model class
+    is given.
+    """
+    file.write(_header(model))
+    names = None if model is None else [name for name, _ in schema(model)]
+    count = 0
+    for record in records:
+        out = bytearray()
+        if names is None:
+            _write_varint(out, len(record))
+            for name, typed in record.items():
+                _write_str(out, name)
+                _write_value(out, typed)
+        else:
+            if not isinstance(record, model):
+                raise TypeError(f"expected a '{model.__name__}' instance, "
+                                f"but received {record!r}")
+            item = record.to_item()
+            for name in names:
+                typed = item.get(name)
+                if typed is None:
+                    out.append(_ABSENT)
+                else:
+                    _write_value(out, typed)
+        length = bytearray()
+        _write_varint(length, len(out))
+        file.write(length)
+        file.write(out)
+        count += 1
+    return count
+
+
+def dumps(records, *, model=None):
+    """
+    Get a snapshot of `records` (see `dump`) as bytes.
+    """
+    file = io.BytesIO()
+    dump(records, file, model=model)
+    return file.getvalue()
+
+
+def _read_varint(buf, pos):
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    result = byte & 0x7f
+    shift = 7
+    while True:
+        pos += 1
+        byte = buf[pos]
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos + 1
+        shift += 7
+
+
+def _read_str(buf, pos):
+    n, pos = _read_varint(buf, pos)
+    end = pos + n
+    if end > len(buf):
+        raise IndexError(end)
+    return str(buf[pos:end], 'utf-8'), end
+
+
+def _read_bytes(buf, pos):
+    n, pos = _read_varint(buf, pos)
+    end = pos + n
+    if end > len(buf):
+        raise IndexError(end)
+    return bytes(buf[pos:end]), end
+
+
+def _read_int(buf, pos):
+    n, pos = _read_varint(buf, pos)
+    return str(n >> 1 if not n & 1 else -(n >> 1) - 1), pos
+
+
+def _read_number(buf, pos):
+    tag = buf[pos]
+    if tag == _INT:
+        return _read_int(buf, pos + 1)
+    elif tag == _N:
+        return _read_str(buf, pos + 1)
+    raise ValueError(f"invalid number tag {tag} in snapshot")
+
+
+def _scalar_reader(type_, read):
+    def read_scalar(buf, pos):
+        data, pos = read(buf, pos)
+        return {type_: data}, pos
+    return read_scalar
+
+
+def _constant_reader(typed):
+    def read_constant(buf, pos):
+        return dict(typed), pos
+    return read_constant
+
+
+def _list_reader(type_, read):
+    def read_list(buf, pos):
+        n, pos = _read_varint(buf, pos)
+        data = [None] * n
+        for i in range(n):
+            data[i], pos = read(buf, pos)
+        return {type_: data}, pos
+    return read_list
+
+
+def _read_map(buf, pos):
+    n, pos = _read_varint(buf, pos)
+    data = {}
+    for _ in range(n):
+        name, pos = _read_str(buf, pos)
+        data[name], pos = _read_value(buf, pos)
+    return {'M': data}, pos
+
+
+def _read_value(buf, pos):
+    return _READERS[buf[pos]](buf, pos + 1)
+
+
+def _invalid_tag(buf, pos):
+    raise ValueError(f"invalid value tag {buf[pos - 1]} in snapshot")
+
+
+# readers of typed values by tag, which take the position after the tag
+_READERS = [_invalid_tag] * 256
+_READERS[_S] = _scalar_reader('S', _read_str)
+_READERS[_INT] = _scalar_reader('N', _read_int)
+_READERS[_N] = _scalar_reader('N', _read_str)
+_READERS[_B] = _scalar_reader('B', _read_bytes)
+_READERS[_TRUE] = _constant_reader({'BOOL': True})
+_READERS[_FALSE] = _constant_reader({'BOOL': False})
+_READERS[_NULL] = _constant_reader({'NULL': True})
+_READERS[_SS] = _list_reader('SS', _read_str)
+_READERS[_NS] = _list_reader('NS', _read_number)
+_READERS[_BS] = _list_reader('BS', _read_bytes)
+_READERS[_L] = _list_reader('L', _read_value)
+_READERS[_M] = _read_map
+
+
+class Snapshot:
+
+    """
+    A snapshot (see `dump`) in a buffer, such as bytes or a memory-mapped
+    file.
+
+    Iterating over it decodes its records one at a time, as instances of
+    `model`, or as typed items if no model class is given. The model class
+    must have the same attributes as the one the snapshot was made of.
+    """
+
+    def __init__(self, buffer, *, model=None):
+        self._buffer = memoryview(buffer)
+        self._mmap = None
+        self._length = None
+        self.model = model
+        try:
+            self._read_header()
+        except Exception:
+            self._buffer.release()
+            raise
+        if model is not None and self.schema != schema(model):
+            self._buffer.release()
+            raise ValueError(f"snapshot schema {self.schema} doesn't match "
+                             f"model class '{model.__name__}'")
+
+    def _read_header(self):
+        buf = self._buffer
+        if bytes(buf[:len(MAGIC)]) != MAGIC:
+            raise ValueError("not a snapshot")
+        try:
+            self.version = buf[len(MAGIC)]
+            if self.version != VERSION:
+                raise ValueError(f"unsupported snapshot version "
+                                 f"{self.version}")
+            pos = len(MAGIC) + 1
+            self.model_name, pos = _read_str(buf, pos)
+            n, pos = _read_varint(buf, pos)
+            self.schema = []
+            for _ in range(n):
+                name, pos = _read_str(buf, pos)
+                type_, pos = _read_str(buf, pos)
+                self.schema.append((name, type_))
+        except IndexError:
+            raise ValueError("truncated snapshot header") from None
+        self._start = pos
+
+    @classmethod
+    def open(cls, path, *, model=None):
+        """
+        Memory-map a snapshot file.
+        """
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            snapshot = cls(mapped, model=model)
+        except Exception:
+            mapped.close()
+            raise
+        snapshot._mmap = mapped
+        return snapshot
+
+    def items(self):
+        """
+        Iterate over the records as typed items.
+        """
+        buf = self._buffer
+        names = [name for name, _ in self.schema] or None
+        pos = self._start
+        end = len(buf)
+        try:
+            while pos < end:
+                length, pos = _read_varint(buf, pos)
+                record_end = pos + length
+                if record_end > end:
+                    raise IndexError(record_end)
+                item = {}
+                if names is None:
+                    n, pos = _read_varint(buf, pos)
+                    for _ in range(n):
+                        name, pos = _read_str(buf, pos)
+                        item[name], pos = _read_value(buf, pos)
+                else:
+                    for name in names:
+                        if buf[pos] == _ABSENT:
+                            pos += 1
+                        else:
+                            item[name], pos = _read_value(buf, pos)
+                if pos != record_end:
+                    raise ValueError("invalid record length in snapshot")
+                yield item
+        except IndexError:
+            raise ValueError("truncated snapshot") from None
+
+    def __len__(self):
+        # counted by skipping over the records, without decoding them
+        if self._length is None:
+            buf = self._buffer
+            pos = self._start
+            count = 0
+            try:
+                while pos < len(buf):
+                    length, pos = _read_varint(buf, pos)
+                    pos += length
+                    if pos > len(buf):
+                        raise IndexError(pos)
+                    count += 1
+            except IndexError:
+                raise ValueError("truncated snapshot") from None
+            self._length = count
+        return self._length
+
+    def __iter__(self):
+        if self.model is None:
+            return self.items()
+        return map(self.model.from_item, self.items())
+
+    def close(self):
+        """
+        Release the buffer, and unmap the file of an opened snapshot.
+        """
+        self._buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def loads(data, *, model=None):
+    """
+    Get the list of records (see `Snapshot`) in a snapshot in bytes.
+    """
+    return list(Snapshot(data, model=model))
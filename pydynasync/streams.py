@@ -0,0 +1,348 @@
+"""
+DynamoDB Streams consumer.
+
+`StreamConsumer` reads the stream of a model's table with a worker thread
+per shard. It decodes the item images of each record into instances of the
+model, and passes them to a handler in batches, one batch per GetRecords
+call. After a batch is handled, the sequence number of its last record is
+saved to a `CheckpointStore`, so a restarted consumer resumes after the
+last batch it handled. Records are delivered at least once.
+
+Shards are discovered when the consumer starts and periodically while it
+runs, since DynamoDB closes shards and opens new ones. A child shard isn't
+read until its parent has been read to the end, so the records for an item
+are handled in the order they were written.
+
+The records of the chunk items of an overflow model (see `overflow`) are
+skipped. An image of an item whose values were split into chunks isn't
+decoded (its instance is None), since the image lacks those values and its
+chunks may already have been replaced or deleted; get the item from its
+table to read it whole.
+"""
+import abc
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+import attr
+
+from . import overflow
+
+# checkpoint of a shard that has been read to its end
+SHARD_END = 'SHARD_END'
+
+# maximum number of records in a GetRecords call
+MAX_BATCH_SIZE = 1000
+
+
+@attr.s
+class StreamRecord:
+    """A stream record, with its item images decoded to model instances."""
+    # 'INSERT', 'MODIFY' or 'REMOVE'
+    event_name = attr.ib()
+    # instance with only its key attributes set
+    keys = attr.ib()
+    # instances for the images in the record (depending on the stream's
+    # view type), or None (also for the images of overflowed items)
+    new = attr.ib()
+    old = attr.ib()
+    sequence_number = attr.ib()
+    shard_id = attr.ib()
+    created = attr.ib(default=None)
+
+
+def decode_record(model, record, shard_id):
+    """
+    Decode a record from GetRecords into a `StreamRecord` for `model`.
+    """
+    data = record['dynamodb']
+    images = [
+        model.from_item(data[name])
+        if name in data and overflow.MANIFEST not in data[name] else None
+        for name in ('NewImage', 'OldImage')
+    ]
+    return StreamRecord(record['eventName'], model.from_item(data['Keys']),
+                        *images, data['SequenceNumber'], shard_id,
+                        data.get('ApproximateCreationDateTime'))
+
+
+def stream_arn(client, table_name):
+    """
+    Get the ARN of the latest stream of a table, or None if it has none.
+    """
+    table = client.describe_table(TableName=table_name)['Table']
+    return table.get('LatestStreamArn')
+
+
+class CheckpointStore(metaclass=abc.ABCMeta):
+
+    """
+    Storage for the sequence number of the last record handled in each
+    shard of a stream.
+    """
+
+    @abc.abstractmethod
+    def get(self, shard_id):
+        """
+        Get the checkpoint of a shard: a sequence number, `SHARD_END`, or
+        None if there is none.
+        """
+
+    @abc.abstractmethod
+    def put(self, shard_id, checkpoint):
+        """
+        Save the checkpoint of a shard.
+        """
+
+
+class MemoryCheckpointStore(CheckpointStore):
+
+    """
+    Checkpoints that last as long as the store.
+    """
+
+    def __init__(self):
+        self.checkpoints = {}
+        self.lock = threading.Lock()
+
+    def get(self, shard_id):
+        with self.lock:
+            return self.checkpoints.get(shard_id)
+
+    def put(self, shard_id, checkpoint):
+        with self.lock:
+            self.checkpoints[shard_id] = checkpoint
+
+
+class FileCheckpointStore(MemoryCheckpointStore):
+
+    """
+    Checkpoints saved to a JSON file, which is replaced atomically on each
+    update.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.checkpoints = json.load(f)
+
+    def put(self, shard_id, checkpoint):
+        with self.lock:
+            self.checkpoints[shard_id] = checkpoint
+            tmp = f'{self.path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.checkpoints, f)
+            os.replace(tmp, self.path)
+
+
+class TableCheckpointStore(CheckpointStore):
+
+    """
+    Checkpoints saved in a DynamoDB table (see `spec`), under a consumer
+    name, so that they can be shared by consumers on different hosts.
+    """
+
+    def __init__(self, client, table_name, consumer_name):
+        self.client = client
+        self.table_name = table_name
+        self.consumer_name = consumer_name
+
+    @staticmethod
+    def spec(table_name, **kwargs):
+        """
+        Make the spec of a checkpoint table (see `exp.make_table_spec`).
+        """
+        from . import exp
+        from .types import AttrType
+        return exp.make_table_spec(table_name,
+                                   id=('ConsumerName', AttrType.S),
+                                   range=('ShardId', AttrType.S), **kwargs)
+
+    def _key(self, shard_id):
+        return {'ConsumerName': {'S': self.consumer_name},
+                'ShardId': {'S': shard_id}}
+
+    def get(self, shard_id):
+        item = self.client.get_item(TableName=self.table_name,
+                                    Key=self._key(shard_id),
+                                    ConsistentRead=True).get('Item')
+        return None if item is None else item['Checkpoint']['S']
+
+    def put(self, shard_id, checkpoint):
+        item = self._key(shard_id)
+        item['Checkpoint'] = {'S': checkpoint}
+        self.client.put_item(TableName=self.table_name, Item=item)
+
+
+class StreamConsumer:
+
+    """
+    Reads a table stream with a worker thread per shard, calling `handler`
+    with each batch of `StreamRecord`s (for one shard, in order).
+
+    `client` is a DynamoDB Streams client (see `exp.get_streams_client`).
+    Shards without a checkpoint are read from `start`, which is
+    'TRIM_HORIZON' (the oldest record) or 'LATEST' (only new records).
+    """
+
+    def __init__(self, model, client, arn, handler, *, checkpoints=None,
+                 batch_size=100, poll_interval=1.0, discover_interval=60.0,
+                 start='TRIM_HORIZON'):
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be from 1 to {MAX_BATCH_SIZE}")
+        if start not in ('TRIM_HORIZON', 'LATEST'):
+            raise ValueError("start must be 'TRIM_HORIZON' or 'LATEST'")
+        self.model = model
+        self.client = client
+        self.arn = arn
+        self.handler = handler
+        self.checkpoints = (checkpoints if checkpoints is not None
+                            else MemoryCheckpointStore())
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.discover_interval = discover_interval
+        self.start = start
+
+    def shards(self):
+        """
+        Get the descriptions of the stream's shards.
+        """
+        shards = []
+        params = dict(StreamArn=self.arn)
+        while True:
+            description = self.client.describe_stream(
+                **params)['StreamDescription']
+            shards.extend(description['Shards'])
+            if 'LastEvaluatedShardId' not in description:
+                return shards
+            params['ExclusiveStartShardId'] = \
+                description['LastEvaluatedShardId']
+
+    def _ready(self, shards, started):
+        ids = {shard['ShardId'] for shard in shards}
+        for shard in shards:
+            shard_id = shard['ShardId']
+            if (shard_id in started or
+                    self.checkpoints.get(shard_id) == SHARD_END):
+                continue
+            parent = shard.get('ParentShardId')
+            if parent in ids and self.checkpoints.get(parent) != SHARD_END:
+                continue
+            yield shard_id
+
+    def _iterator(self, shard_id):
+        checkpoint = self.checkpoints.get(shard_id)
+        params = dict(StreamArn=self.arn, ShardId=shard_id,
+                      ShardIteratorType=self.start)
+        if checkpoint is not None:
+            params.update(ShardIteratorType='AFTER_SEQUENCE_NUMBER',
+                          SequenceNumber=checkpoint)
+        return self.client.get_shard_iterator(**params)['ShardIterator']
+
+    def _is_chunk(self, record):
+        return (self.model._overflow is not None and
+                overflow.is_chunk_key(self.model, record['dynamodb']['Keys']))
+
+    def process_shard(self, shard_id, *, stop=None, caught_up=False):
+        """
+        Handle the records of a shard from its checkpoint, returning the
+        number handled.
+
+        Reading stops at the end of a closed shard, when `stop` (a
+        threading.Event) is set, or if `caught_up`, at the first empty
+        batch.
+        """
+        if stop is None:
+            stop = threading.Event()
+        handled = 0
+        iterator = self._iterator(shard_id)
+        while iterator is not None and not stop.is_set():
+            response = self.client.get_records(ShardIterator=iterator,
+                                               Limit=self.batch_size)
+            records = response['Records']
+            iterator = response.get('NextShardIterator')
+            if records:
+                batch = [decode_record(self.model, record, shard_id)
+                         for record in records
+                         if not self._is_chunk(record)]
+                if batch:
+                    self.handler(batch)
+                    handled += len(batch)
+                # a batch of only chunk records is checkpointed too
+                self.checkpoints.put(
+                    shard_id, records[-1]['dynamodb']['SequenceNumber'])
+            elif caught_up:
+                break
+            elif iterator is not None:
+                stop.wait(self.poll_interval)
+        if iterator is None:
+            self.checkpoints.put(shard_id, SHARD_END)
+        return handled
+
+    def _start(self, shard_id, **kwargs):
+        future = concurrent.futures.Future()
+
+        def work():
+            try:
+                future.set_result(self.process_shard(shard_id, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=work, name=f'pydynasync-stream-{shard_id}',
+                         daemon=True).start()
+        return future
+
+    def drain(self):
+        """
+        Handle the records that are in the stream now, reading the shards
+        in parallel, and return the number handled.
+        """
+        handled = 0
+        started = set()
+        while True:
+            ready = list(self._ready(self.shards(), started))
+            if not ready:
+                return handled
+            started.update(ready)
+            futures = [self._start(shard_id, caught_up=True)
+                       for shard_id in ready]
+            concurrent.futures.wait(futures)
+            handled += sum(future.result() for future in futures)
+
+    def run(self, stop=None):
+        """
+        Handle records as they arrive until `stop` (a threading.Event) is
+        set.
+
+        If a handler raises an exception, the other workers are stopped
+        and the exception is raised.
+        """
+        if stop is None:
+            stop = threading.Event()
+        running = {}
+        started = set()
+        discover_at = 0.0
+        try:
+            while not stop.is_set():
+                finished = [shard_id for shard_id, future in running.items()
+                            if future.done()]
+                for shard_id in finished:
+                    running.pop(shard_id).result()
+                if finished or time.monotonic() >= discover_at:
+                    for shard_id in self._ready(self.shards(), started):
+                        started.add(shard_id)
+                        running[shard_id] = self._start(shard_id, stop=stop)
+                    discover_at = time.monotonic() + self.discover_interval
+                if running:
+                    concurrent.futures.wait(
+                        list(running.values()), timeout=self.poll_interval,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                else:
+                    stop.wait(self.poll_interval)
+        finally:
+            stop.set()
+            concurrent.futures.wait(list(running.values()))
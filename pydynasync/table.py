@@ -0,0 +1,505 @@
+"""
+Reading and writing model instances.
+"""
+import heapq
+import operator
+
+from . import (
+    attributes, expressions, models, overflow, rows, sharding,
+    singleflight, tracking, util,
+)
+from .util import NOTSET
+
+# in-flight gets of all tables, for coalescing
+_gets = singleflight.Group()
+
+
+def _delta(value):
+    """
+    Get the change to write for a tracked set or list value, instead of
+    the whole value: a set's (added, removed) elements or a list's
+    appended elements. Returns None if writing the whole value is as
+    cheap, or if it was replaced.
+    """
+    if isinstance(value, tracking.TrackedSet):
+        delta = value.delta()
+        # an update can't both ADD to and DELETE from the same attribute
+        if delta is None or (delta[0] and delta[1]):
+            return None
+        if not value:
+            # an empty set can't be written, but deleting its elements
+            # removes the attribute
+            return delta
+        size = len(delta[0]) + len(delta[1])
+    elif isinstance(value, tracking.TrackedList):
+        delta = value.appended()
+        if delta is None:
+            return None
+        size = len(delta)
+    else:
+        return None
+    return delta if size < len(value) else None
+
+
+class Table:
+
+    """
+    The DynamoDB table of a model class, used through a low-level client.
+
+    The table name defaults to the model's `ddb_name`. If `coalesce` is
+    true, concurrent gets of the same item (with the same options) from
+    tables of the same name and client are coalesced into one GetItem call
+    (see `singleflight`), each getting its own instance of the item.
+
+    Gets of keys known to be missing are answered without a request if
+    the table's `negative_cache` or `bloom` is set (see `keyfilters`).
+
+    For a model that shards its hash keys (see `sharding`), a query reads
+    all the shards of its hash key in parallel, and so does a get if the
+    model's items are sharded at random.
+    """
+
+    def __init__(self, model, client, *, name=None, coalesce=False):
+        if not (isinstance(model, type) and issubclass(model, models.Model)):
+            raise TypeError(f"expected a Model subclass, not {model!r}")
+        self.model = model
+        self.client = client
+        self.name = name or model._ddb_name
+        self.coalesce = coalesce
+        self.negative_cache = None
+        self.bloom = None
+
+    def spec(self, **kwargs):
+        """
+        Make a table spec for the model's keys (see `exp.make_table_spec`,
+        which takes the same keyword arguments).
+        """
+        from . import exp
+        hash_key, range_key = self.model._hash_key, self.model._range_key
+        return exp.make_table_spec(
+            self.name,
+            id=(hash_key.ddb_name, hash_key.type),
+            range=(None if range_key is None
+                   else (range_key.ddb_name, range_key.type)),
+            **kwargs
+        )
+
+    def _check_instance(self, instance):
+        if type(instance) is not self.model:
+            raise TypeError(f"expected {self.model.__name__} instance, but "
+                            f"received {type(instance).__name__}")
+
+    def _load(self, item, consistent, read_only=False):
+        if self.model._overflow:
+            item = overflow.complete_item(self.client, self.name, self.model,
+                                          item, consistent=consistent)
+        if read_only:
+            return rows.row_class(self.model).from_item(item)
+        return self.model.from_item(item)
+
+    def _projection(self, attributes):
+        if attributes is None:
+            return ()
+        extra = ()
+        if self.model._overflow or self.model._sharding:
+            # the keys to read an item's chunks with, or to merge shards by
+            attrs = dict(self.model._attributes)
+            named = {attrs[name].ddb_name for name in attributes
+                     if name in attrs}
+            extra = tuple(
+                name for name in (self.model._hash_key.ddb_name,
+                                  self.model._range_key.ddb_name)
+                if name not in named)
+        if self.model._overflow:
+            # and the chunk marker, to tell chunk items apart from items
+            extra += (overflow.MANIFEST, overflow.CHUNK)
+        expression = expressions.projection(self.model, attributes, extra)
+        return (('ProjectionExpression', expression, ()),)
+
+    def _get_item(self, key, consistent, attributes):
+        if self.model._overflow:
+            return overflow.get_item(self.client, self.name, self.model, key,
+                                     consistent=consistent,
+                                     projection=self._projection(attributes))
+        return self.client.get_item(**expressions.params(
+            *self._projection(attributes),
+            TableName=self.name, Key=key, ConsistentRead=consistent,
+        )).get('Item')
+
+    def _get_call(self, key, consistent, attributes):
+        args = (key, consistent, attributes)
+        if not self.coalesce:
+            return None, args
+        return (id(self.client), self.name, util.hashable_key(key),
+                consistent,
+                None if attributes is None else tuple(attributes)), args
+
+    def _known_missing(self, key, consistent):
+        if consistent or (self.bloom is None and
+                          self.negative_cache is None):
+            return False
+        hashed = util.hashable_key(key)
+        return ((self.bloom is not None and hashed not in self.bloom) or
+                (self.negative_cache is not None and
+                 hashed in self.negative_cache))
+
+    def _loaded(self, key, item):
+        if item is None:
+            if self.negative_cache is not None:
+                self.negative_cache.add(util.hashable_key(key))
+            return None
+        return self.model.from_item(item)
+
+    def _writing(self, key):
+        """
+        Update the key filters for a write of `key`, before it's made (and
+        call `_written` after).
+        """
+        if self.bloom is not None:
+            self.bloom.add(util.hashable_key(key))
+        self._written(key)
+
+    def _written(self, key):
+        # also after the write, in case a get that started before it
+        # found no item since `_writing`
+        if self.negative_cache is not None:
+            self.negative_cache.discard(util.hashable_key(key))
+
+    def _scattered(self):
+        return (self.model._sharding is not None and
+                self.model._sharding.mode == 'random')
+
+    def _get_scattered(self, hash_value, range_value, consistent,
+                       attributes):
+        """
+        Get an instance of a model sharded at random, reading every shard
+        its item may be in, in parallel.
+        """
+        keys = [
+            key for key in (
+                self.model.make_key(hash_value, range_value, shard=shard)
+                for shard in self.model._sharding.shards())
+            if not self._known_missing(key, consistent)
+        ]
+        executor = sharding.get_executor()
+        futures = [executor.submit(self._get_item, key, consistent,
+                                   attributes) for key in keys]
+        found = None
+        for key, future in zip(keys, futures):
+            item = future.result()
+            if item is None:
+                self._loaded(key, None)
+            elif found is None:
+                found = self._loaded(key, item)
+        return found
+
+    def get(self, hash_value, range_value=None, *, consistent=False,
+            attributes=None):
+        """
+        Get the instance with the given key values, or None if there is no
+        such item.
+
+        If `attributes` is given, only the attributes it names are loaded.
+        """
+        if self._scattered():
+            return self._get_scattered(hash_value, range_value, consistent,
+                                       attributes)
+        key = self.model.make_key(hash_value, range_value)
+        if self._known_missing(key, consistent):
+            return None
+        flight, args = self._get_call(key, consistent, attributes)
+        if flight is None:
+            item = self._get_item(*args)
+        else:
+            item = _gets.do(flight, self._get_item, *args)
+        return self._loaded(key, item)
+
+    async def get_async(self, hash_value, range_value=None, *,
+                        consistent=False, attributes=None):
+        """
+        Get an instance like `get`, in the event loop's default executor.
+        """
+        import asyncio
+        if self._scattered():
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._get_scattered, hash_value, range_value,
+                consistent, attributes)
+        key = self.model.make_key(hash_value, range_value)
+        if self._known_missing(key, consistent):
+            return None
+        flight, args = self._get_call(key, consistent, attributes)
+        if flight is None:
+            item = await asyncio.get_running_loop().run_in_executor(
+                None, self._get_item, *args)
+        else:
+            item = await _gets.do_async(flight, self._get_item, *args)
+        return self._loaded(key, item)
+
+    def put(self, instance):
+        """
+        Write an instance, replacing any item with the same key.
+        """
+        self._check_instance(instance)
+        item = instance.to_item()
+        key = instance.key_item()
+        self._writing(key)
+        if self.model._overflow:
+            overflow.put_item(self.client, self.name, self.model, item)
+        else:
+            self.client.put_item(TableName=self.name, Item=item)
+        self._written(key)
+        models.ModelMeta.set_saved(instance)
+
+    def update(self, instance):
+        """
+        Write the changed attributes of an instance with UpdateItem, which
+        creates the item if it doesn't exist. Attributes changed to None
+        are removed.
+
+        Instances of overflow models are written with `put`, since their
+        values may need to be split.
+        """
+        self._check_instance(instance)
+        if self.model._overflow:
+            return self.put(instance)
+        mask = models.ModelMeta.get_changed_mask(instance)
+        values, deltas = {}, {}
+        for index, (name, attr) in enumerate(self.model._attributes):
+            if mask & (1 << index):
+                value = attr.values.get(instance)
+                if isinstance(attr, attributes.Counter) and value is not None:
+                    deltas[name] = attr.delta(instance)
+                    continue
+                delta = _delta(value)
+                if delta is None:
+                    values[name] = value
+                else:
+                    deltas[name] = delta
+        self.update_item(instance.key_item(), values, deltas=deltas)
+        models.ModelMeta.set_saved(instance)
+
+    def update_item(self, key, values, *, deltas=None):
+        """
+        Set attributes of the item with DynamoDB `key` from `values`, a dict
+        of attribute name to value, removing those whose value is None.
+        Key attributes in `values` are ignored.
+
+        `deltas` maps set attribute names to the (added, removed) elements
+        to ADD and DELETE, of which only one may be non-empty, List
+        attribute names to the elements to append, and Counter attribute
+        names to the increments to ADD.
+        """
+        set_names, set_values, remove_names = [], [], []
+        for name, value in values.items():
+            attr = getattr(self.model, name)
+            if attr.hash_key or attr.range_key:
+                continue
+            if value is None or value is NOTSET:
+                remove_names.append(name)
+            else:
+                set_names.append(name)
+                set_values.append(attr.serialize(value)[attr.ddb_name])
+        append_names, add_names, delete_names = [], [], []
+        append_values, add_values, delete_values = [], [], []
+        for name, delta in (deltas or {}).items():
+            attr = getattr(self.model, name)
+            if isinstance(attr, attributes.List):
+                names, bound, elements = append_names, append_values, delta
+            elif isinstance(attr, attributes.Counter):
+                if not delta:
+                    continue
+                names, bound, elements = add_names, add_values, delta
+            elif delta[0]:
+                names, bound, elements = add_names, add_values, delta[0]
+            elif delta[1]:
+                names, bound, elements = (delete_names, delete_values,
+                                          delta[1])
+            else:
+                continue
+            names.append(name)
+            bound.append(attr.serialize(elements)[attr.ddb_name])
+        self._writing(key)
+        if not (set_names or remove_names or append_names or add_names or
+                delete_names):
+            self.client.update_item(TableName=self.name, Key=key)
+        else:
+            expression = expressions.update(
+                self.model, set_names, remove_names,
+                append_names=append_names, add_names=add_names,
+                delete_names=delete_names)
+            self.client.update_item(**expressions.params(
+                ('UpdateExpression', expression,
+                 set_values + append_values + add_values + delete_values),
+                TableName=self.name, Key=key,
+            ))
+        self._written(key)
+
+    def delete(self, instance):
+        """
+        Delete the item of an instance.
+        """
+        self._check_instance(instance)
+        key = instance.key_item()
+        if self.model._overflow:
+            overflow.delete_item(self.client, self.name, self.model, key)
+        else:
+            self.client.delete_item(TableName=self.name, Key=key)
+        if self.negative_cache is not None:
+            self.negative_cache.add(util.hashable_key(key))
+
+    def _items(self, method, params, consistent, read_only):
+        while True:
+            page = method(**params)
+            for item in page.get('Items', ()):
+                if self.model._overflow and overflow.is_chunk(item):
+                    continue
+                yield self._load(item, consistent, read_only)
+            if 'LastEvaluatedKey' not in page:
+                return
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def _range_values(self, range_op, values):
+        """
+        Serialize the range key values of a key condition.
+        """
+        if range_op is None:
+            if values:
+                raise TypeError("range key values given without a range key "
+                                "operator")
+            return ()
+        count = expressions.RANGE_OPERATORS[range_op]
+        if len(values) != count:
+            raise TypeError(f"range key operator '{range_op}' takes {count} "
+                            f"value(s), but {len(values)} were given")
+        range_key = self.model._range_key
+        serialize = (range_key.serialize_prefix if range_op == 'begins_with'
+                     else range_key.serialize)
+        return tuple(serialize(value)[range_key.ddb_name]
+                     for value in values)
+
+    def query(self, hash_value, range_op=None, *range_values, forward=True,
+              consistent=False, attributes=None, read_only=False):
+        """
+        Iterate over the instances with hash key `hash_value`, in range key
+        order (or reverse order if not `forward`).
+
+        If `range_op` is given, it's one of `expressions.RANGE_OPERATORS`,
+        and only the instances whose range key values meet the condition
+        it makes with `range_values` are read, as in:
+
+            table.query(thread, 'between', start, end)
+            table.query(forum, 'begins_with', ('Amazon DynamoDB',))
+
+        The prefix of begins_with is a str (or bytes) prefix of the stored
+        range key values, or a tuple of first parts for a `CompositeKey`.
+
+        If `attributes` is given, only the attributes it names are loaded.
+        If `read_only` is true, read-only rows of the items are returned
+        instead of instances (see `rows`).
+        """
+        condition = expressions.key_condition(self.model, range_op)
+        range_typed = self._range_values(range_op, range_values)
+        hash_key = self.model._hash_key
+        typed = hash_key.serialize(hash_value)[hash_key.ddb_name]
+        if self.model._sharding is not None:
+            return self._query_shards(typed['S'], condition, range_typed,
+                                      forward, consistent, attributes,
+                                      read_only)
+        params = expressions.params(
+            ('KeyConditionExpression', condition, (typed,) + range_typed),
+            *self._projection(attributes),
+            TableName=self.name,
+            ScanIndexForward=forward,
+            ConsistentRead=consistent,
+        )
+        return self._items(self.client.query, params, consistent, read_only)
+
+    def _query_shards(self, hash_data, condition, range_typed, forward,
+                      consistent, attributes, read_only):
+        """
+        Query all the shards of a hash key, merging their instances in
+        range key order.
+        """
+        model = self.model
+        executor = sharding.get_executor()
+        shards = []
+        for shard in model._sharding.shards():
+            typed = {'S': model._sharding.suffixed(hash_data, shard)}
+            params = expressions.params(
+                ('KeyConditionExpression', condition,
+                 (typed,) + range_typed),
+                *self._projection(attributes),
+                TableName=self.name,
+                ScanIndexForward=forward,
+                ConsistentRead=consistent,
+            )
+            # the first pages of all shards are read at once
+            shards.append(self._shard_items(
+                executor.submit(self.client.query, **params), params,
+                consistent, read_only))
+        # merged in the order of the stored range key values, which is each
+        # shard's order
+        merged = heapq.merge(*shards, key=operator.itemgetter(0),
+                             reverse=not forward)
+        return map(operator.itemgetter(1), merged)
+
+    def _shard_items(self, page, params, consistent, read_only):
+        """
+        Iterate over the (range key sort key, instance) of the items of the
+        query of one shard, given the future of its first page, reading
+        each next page while the instances of the one before are consumed.
+        """
+        executor = sharding.get_executor()
+        range_name = self.model._range_key.ddb_name
+        while page is not None:
+            items = page.result()
+            if 'LastEvaluatedKey' in items:
+                params = dict(params,
+                              ExclusiveStartKey=items['LastEvaluatedKey'])
+                page = executor.submit(self.client.query, **params)
+            else:
+                page = None
+            for item in items.get('Items', ()):
+                if self.model._overflow and overflow.is_chunk(item):
+                    continue
+                yield (sharding.sort_key(item[range_name]),
+                       self._load(item, consistent, read_only))
+
+    def scan_keys(self, *, segment=None, total_segments=None):
+        """
+        Iterate over the keys of all items in the table, with a keys-only
+        scan (of one segment of a parallel scan, if `segment` and
+        `total_segments` are given).
+        """
+        names = [self.model._hash_key.ddb_name]
+        if self.model._range_key is not None:
+            names.append(self.model._range_key.ddb_name)
+        extra = (overflow.CHUNK,) if self.model._overflow else ()
+        params = expressions.params(
+            ('ProjectionExpression',
+             expressions.projection(self.model, (), names + list(extra)), ()),
+            TableName=self.name,
+        )
+        if segment is not None:
+            params.update(Segment=segment, TotalSegments=total_segments)
+        while True:
+            page = self.client.scan(**params)
+            for item in page.get('Items', ()):
+                if not (extra and overflow.is_chunk(item)):
+                    yield {name: item[name] for name in names}
+            if 'LastEvaluatedKey' not in page:
+                return
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def scan(self, *, consistent=False, attributes=None, read_only=False):
+        """
+        Iterate over all instances in the table.
+
+        If `attributes` is given, only the attributes it names are loaded.
+        If `read_only` is true, read-only rows of the items are returned
+        instead of instances (see `rows`).
+        """
+        params = expressions.params(*self._projection(attributes),
+                                    TableName=self.name,
+                                    ConsistentRead=consistent)
+        return self._items(self.client.scan, params, consistent, read_only)
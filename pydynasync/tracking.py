@@ -0,0 +1,234 @@
+"""
+Containers that track their own changes.
+
+Set, List and Map attribute values are held in these containers, which
+record their mutations and mark the attribute changed on the instance that
+owns them (an O(1) update of its changes bitmask). No copy of the value
+as it was loaded is kept, and no deep comparison is done to find changes.
+
+Sets record the elements added and removed since the value was loaded or
+saved, and lists the elements appended. Any other mutation, or assigning
+a new value, marks the whole value as replaced. Only the container's own
+mutations are tracked, not those of values nested in it.
+"""
+import weakref
+
+
+class Tracked:
+
+    """
+    Mixin for containers that report their changes to an owning instance.
+    """
+
+    __slots__ = ()
+
+    def _bind(self, owner, attribute):
+        self._owner = weakref.ref(owner)
+        self._attribute = attribute
+        self.replaced = False
+
+    def owned_by(self, owner, attribute):
+        return self._owner() is owner and self._attribute is attribute
+
+    def _changed(self):
+        owner = self._owner()
+        if owner is not None:
+            self._attribute._mark_changed(owner)
+
+    def _replace(self):
+        self.replaced = True
+        self._changed()
+
+    def saved(self):
+        """
+        Forget the changes recorded so far.
+        """
+        self.replaced = False
+
+
+class TrackedSet(Tracked, set):
+
+    """
+    A set that records the elements added to and removed from it.
+    """
+
+    __slots__ = ('_owner', '_attribute', 'replaced', 'added', 'removed')
+
+    def __init__(self, iterable, owner, attribute):
+        super().__init__(iterable)
+        self._bind(owner, attribute)
+        self.added = set()
+        self.removed = set()
+
+    def __reduce__(self):
+        return set, (list(self),)
+
+    def saved(self):
+        super().saved()
+        self.added = set()
+        self.removed = set()
+
+    def delta(self):
+        """
+        Get the (added, removed) elements, or None if the set was replaced.
+        """
+        return None if self.replaced else (self.added, self.removed)
+
+    def add(self, elem):
+        if elem in self:
+            return
+        self._attribute._check((elem,))
+        super().add(elem)
+        if elem in self.removed:
+            self.removed.discard(elem)
+        else:
+            self.added.add(elem)
+        self._changed()
+
+    def discard(self, elem):
+        if elem not in self:
+            return
+        super().discard(elem)
+        if elem in self.added:
+            self.added.discard(elem)
+        else:
+            self.removed.add(elem)
+        self._changed()
+
+    def remove(self, elem):
+        if elem not in self:
+            raise KeyError(elem)
+        self.discard(elem)
+
+    def pop(self):
+        try:
+            elem = next(iter(self))
+        except StopIteration:
+            raise KeyError('pop from an empty set') from None
+        self.discard(elem)
+        return elem
+
+    def update(self, *others):
+        for other in others:
+            for elem in other:
+                self.add(elem)
+
+    def difference_update(self, *others):
+        for other in others:
+            for elem in other:
+                self.discard(elem)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self._replace()
+
+    def intersection_update(self, *others):
+        super().intersection_update(*others)
+        self._replace()
+
+    def symmetric_difference_update(self, other):
+        super().symmetric_difference_update(other)
+        self._replace()
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+class TrackedList(Tracked, list):
+
+    """
+    A list that records the elements appended to it.
+    """
+
+    __slots__ = ('_owner', '_attribute', 'replaced', 'saved_length')
+
+    def __init__(self, iterable, owner, attribute):
+        super().__init__(iterable)
+        self._bind(owner, attribute)
+        self.saved_length = len(self)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def saved(self):
+        super().saved()
+        self.saved_length = len(self)
+
+    def appended(self):
+        """
+        Get the elements appended, or None if the list was replaced.
+        """
+        return None if self.replaced else self[self.saved_length:]
+
+    def append(self, elem):
+        super().append(elem)
+        self._changed()
+
+    def extend(self, iterable):
+        super().extend(iterable)
+        self._changed()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+
+def _replacing(name):
+    method = getattr(list, name)
+
+    def replacing(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._replace()
+        return self if name.startswith('__i') else result
+
+    replacing.__name__ = name
+    return replacing
+
+
+for _name in ('insert', 'remove', 'pop', 'clear', 'sort', 'reverse',
+              '__setitem__', '__delitem__', '__imul__'):
+    setattr(TrackedList, _name, _replacing(_name))
+
+
+class TrackedDict(Tracked, dict):
+
+    """
+    A dict that records that it was changed.
+    """
+
+    __slots__ = ('_owner', '_attribute', 'replaced')
+
+    def __init__(self, mapping, owner, attribute):
+        super().__init__(mapping)
+        self._bind(owner, attribute)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+for _name in ('__setitem__', '__delitem__', 'pop', 'popitem', 'clear',
+              'update', 'setdefault', '__ior__'):
+    _method = getattr(dict, _name)
+
+    def _replacing_dict(self, *args, _method=_method, **kwargs):
+        result = _method(self, *args, **kwargs)
+        self._replace()
+        return result
+
+    _replacing_dict.__name__ = _name
+    setattr(TrackedDict, _name, _replacing_dict)
+
+del _name
@@ -84,8 +84,70 @@ class AttrType(EnumBase, enum.Enum):
         raise NotImplementedError()
 
 
+# Python types allowed for binary values
+BINARY_TYPES = (bytes, bytearray, memoryview)
+
+
+def binary_value(value):
+    """
+    Get a binary value in a form that boto3 accepts, avoiding a copy where
+    possible.
+
+    bytes and bytearray values are returned as is, and so is the object
+    underlying a memoryview that covers all of it. Only a partial view is
+    copied.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value
+    elif isinstance(value, memoryview):
+        obj = value.obj
+        if (isinstance(obj, (bytes, bytearray)) and value.contiguous and
+                value.nbytes == len(obj)):
+            return obj
+        return value.tobytes()
+    raise TypeError("expected type [{}] but found type [{}] for value "
+                    "{}".format(', '.join(t.__name__ for t in BINARY_TYPES),
+                                type(value).__name__, value))
+
+
+def binary_from_client(value):
+    """
+    Get a binary value from a client response without copying it.
+
+    A str value is taken to be in base64 wire form and is decoded.
+    """
+    if isinstance(value, str):
+        return base64.b64decode(value)
+    return value
+
+
+def number_from_str(s):
+    """
+    Get an int, or a decimal.Decimal if it has a decimal point, from the
+    str form of a number.
+    """
+    return decimal.Decimal(s) if '.' in s else int(s)
+
+
+# DynamoDB numbers have up to 38 significant digits
+_NUMBER_CONTEXT = decimal.Context(prec=38)
+
+
+def canonical_number(s):
+    """
+    Get the canonical str form of the str form of a number, as DynamoDB
+    returns it: without trailing zeros or an exponent (so '1.50' and
+    '15E-1' are both '1.5', and '1E+2' is '100').
+    """
+    value = decimal.Decimal(s)
+    if not value:
+        return '0'
+    return format(value.normalize(_NUMBER_CONTEXT), 'f')
+
+
 # Register convert function for each type
-AttrType.B.convert = make_scalar_converter(str, {bytes: base64.b64encode})
+AttrType.B.convert = make_scalar_converter(
+    str, dict.fromkeys(BINARY_TYPES, base64.b64encode))
 AttrType.N.convert = make_scalar_converter(
     str,
     {str: lambda s: str(decimal.Decimal(s)),
@@ -110,7 +172,7 @@ AttrType.B.serialize, AttrType.B.deserialize = make_serialization_helpers(
 AttrType.N.serialize, AttrType.N.deserialize = make_serialization_helpers(
     AttrType.N,
     AttrType.N.convert,
-    lambda s: decimal.Decimal(s) if '.' in s else int(s),
+    number_from_str,
 )
 AttrType.S.serialize, AttrType.S.deserialize = make_serialization_helpers(
     AttrType.S,
@@ -137,12 +199,27 @@ AttrType.SS.serialize, AttrType.SS.deserialize = make_serialization_helpers(
 AttrType.NS.serialize, AttrType.NS.deserialize = make_serialization_helpers(
     AttrType.NS,
     make_set_converter(AttrType.N.convert),
-    lambda value: set(map(AttrType.N.deserialize, value)),
+    lambda value: set(map(number_from_str, value)),
 )
 AttrType.BS.serialize, AttrType.BS.deserialize = make_serialization_helpers(
     AttrType.BS,
     make_set_converter(AttrType.B.convert),
-    lambda value: set(map(AttrType.B.deserialize, value)),
+    lambda value: set(map(base64.b64decode, value)),
+)
+
+# The serialize/deserialize functions above produce DynamoDB's JSON wire
+# format, in which binary values are base64-encoded, but boto3 clients
+# base64-encode binary values themselves, so binary attributes use these
+# instead to pass their values to (and take them from) a client as is.
+AttrType.B.to_client, AttrType.B.from_client = make_serialization_helpers(
+    AttrType.B,
+    binary_value,
+    binary_from_client,
+)
+AttrType.BS.to_client, AttrType.BS.from_client = make_serialization_helpers(
+    AttrType.BS,
+    make_set_converter(binary_value),
+    lambda value: set(map(binary_from_client, value)),
 )
 
 
@@ -1,17 +1,42 @@
 """
 Miscellaneous utilities.
 """
-import inspect
 import sys
 import traceback
+import types
 import weakref
 
-NOTFOUND = object()
-NOTSET = object()
+from .types import binary_from_client, canonical_number
 
+
+class _Sentinel:
+
+    """
+    A unique marker value, which is pickled (and copied) by reference so
+    that it stays unique.
+    """
+
+    __slots__ = ('_name',)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return self._name
+
+    def __reduce__(self):
+        return self._name
+
+
+NOTFOUND = _Sentinel('NOTFOUND')
+NOTSET = _Sentinel('NOTSET')
+
+# (without inspect.getmembers, since importing inspect is slow)
 _weakkeydict_codes = tuple(
-    func.__code__ for _, func in
-    inspect.getmembers(weakref.WeakKeyDictionary, inspect.isfunction)
+    func.__code__ for func in (
+        getattr(weakref.WeakKeyDictionary, name)
+        for name in dir(weakref.WeakKeyDictionary)
+    ) if isinstance(func, types.FunctionType)
 )
 
 
@@ -30,3 +55,25 @@ def is_weakref_call(*, framenum=2):
         except AttributeError:
             pass
     return False
+
+
+def hashable_key(key):
+    """
+    Get a hashable form of a DynamoDB key (or other item).
+
+    Binary values are the same whether they're bytes or in base64 wire form
+    (as returned by a `wire.WireClient`), and numbers are the same whatever
+    their str form (as DynamoDB returns them in canonical form).
+    """
+    return tuple(sorted(
+        (name, type_, _hashable_data(type_, data))
+        for name, value in key.items() for type_, data in value.items()
+    ))
+
+
+def _hashable_data(type_, data):
+    if type_ == 'B':
+        return bytes(binary_from_client(data))
+    if type_ == 'N':
+        return canonical_number(data)
+    return data
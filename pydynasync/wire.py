@@ -0,0 +1,247 @@
+"""
+Raw wire transport for the DynamoDB JSON protocol.
+
+`WireClient` is a low-level DynamoDB client that sends request parameters
+as the JSON body of a DynamoDB JSON protocol request, signed with AWS
+Signature Version 4, without botocore's request serialization or response
+parsing. Typed items made by this library are already in the protocol's
+form, apart from binary values, which are base64-encoded as the body is
+written. Response bodies are parsed with `json.loads` alone, so binary
+values in them are left as base64 strings, which the library's decoders
+accept (see `types.binary_from_client`).
+
+`WireClient.send` returns a response body as bytes, for callers that
+decode pages themselves.
+"""
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+TARGET_PREFIX = 'DynamoDB_20120810'
+CONTENT_TYPE = 'application/x-amz-json-1.0'
+SERVICE = 'dynamodb'
+
+DEFAULT_REGION = 'us-east-1'
+
+# attempts made of a request that fails with a retryable error
+DEFAULT_MAX_ATTEMPTS = 3
+
+# error codes (and HTTP statuses) of requests that are retried, with
+# exponential backoff starting at RETRY_DELAY seconds
+RETRYABLE_ERRORS = frozenset({
+    'ProvisionedThroughputExceededException', 'ThrottlingException',
+    'RequestLimitExceeded', 'InternalServerError', 'ServiceUnavailable',
+})
+RETRYABLE_STATUSES = frozenset({500, 502, 503, 504})
+RETRY_DELAY = 0.05
+
+
+def _default(obj):
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode('ascii')
+    raise TypeError(f"object of type {type(obj).__name__} is not JSON "
+                    "serializable")
+
+
+_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+
+def encode_body(params):
+    """
+    Get the JSON body for request parameters, base64-encoding binary
+    values.
+    """
+    return _encoder.encode(params).encode('utf-8')
+
+
+def operation_name(method_name):
+    """
+    Get the operation name, like 'GetItem', for a client method name, like
+    'get_item'.
+    """
+    return ''.join(part.title() for part in method_name.split('_'))
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+
+def sign(headers, body, *, host, region, credentials, now=None):
+    """
+    Add the SigV4 signature headers for a POST to '/' of `host` to
+    `headers`, given (access key, secret key, session token or None)
+    `credentials`. `now` is a UTC time.struct_time, which defaults to the
+    current time.
+    """
+    access_key, secret_key, token = credentials
+    amz_date = time.strftime('%Y%m%dT%H%M%SZ', now or time.gmtime())
+    date = amz_date[:8]
+    headers['Host'] = host
+    headers['X-Amz-Date'] = amz_date
+    if token:
+        headers['X-Amz-Security-Token'] = token
+    canonical_headers = sorted(
+        (name.lower(), ' '.join(str(value).split()))
+        for name, value in headers.items()
+    )
+    signed_headers = ';'.join(name for name, _ in canonical_headers)
+    canonical_request = '\n'.join([
+        'POST', '/', '',
+        ''.join(f'{name}:{value}\n' for name, value in canonical_headers),
+        signed_headers,
+        hashlib.sha256(body).hexdigest(),
+    ])
+    scope = f'{date}/{region}/{SERVICE}/aws4_request'
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+    ])
+    key = ('AWS4' + secret_key).encode('utf-8')
+    for part in (date, region, SERVICE, 'aws4_request'):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode('utf-8'),
+                         hashlib.sha256).hexdigest()
+    headers['Authorization'] = (
+        f'AWS4-HMAC-SHA256 Credential={access_key}/{scope}, '
+        f'SignedHeaders={signed_headers}, Signature={signature}')
+    return headers
+
+
+def _environment_credentials():
+    access_key = os.environ.get('AWS_ACCESS_KEY_ID')
+    if not access_key:
+        return None
+    return (access_key, os.environ['AWS_SECRET_ACCESS_KEY'],
+            os.environ.get('AWS_SESSION_TOKEN'))
+
+
+def _botocore_credentials():
+    import botocore.session
+    credentials = botocore.session.get_session().get_credentials()
+    if credentials is None:
+        raise ValueError("no AWS credentials found")
+
+    def get():
+        frozen = credentials.get_frozen_credentials()
+        return frozen.access_key, frozen.secret_key, frozen.token
+
+    return get
+
+
+class WireClient:
+
+    """
+    A DynamoDB client for `endpoint` (an http or https URL) that sends the
+    JSON protocol directly.
+
+    Client methods like `get_item` take the same parameters as those of a
+    boto3 client, and return the parsed response body. `credentials` is an
+    (access key, secret key[, session token]) tuple, which defaults to the
+    one in the AWS_* environment variables, or else botocore's.
+
+    Errors are raised as botocore ClientErrors, like a boto3 client's.
+    """
+
+    def __init__(self, endpoint, *, region=None, credentials=None,
+                 timeout=60.0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        url = urllib.parse.urlsplit(endpoint)
+        if url.scheme not in ('http', 'https'):
+            raise ValueError(f"expected an http or https endpoint URL, not "
+                             f"'{endpoint}'")
+        self.endpoint = endpoint
+        self.host = url.netloc
+        self.region = (region or os.environ.get('AWS_REGION') or
+                       os.environ.get('AWS_DEFAULT_REGION') or DEFAULT_REGION)
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self._connection_class = (http.client.HTTPSConnection
+                                  if url.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        if credentials is None:
+            credentials = _environment_credentials()
+        if credentials is None:
+            self._credentials = _botocore_credentials()
+        else:
+            credentials = tuple(credentials) + (None,) * (3 - len(credentials))
+            self._credentials = lambda: credentials
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connection_class(self.host,
+                                                timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _post(self, operation, body):
+        headers = sign({
+            'Content-Type': CONTENT_TYPE,
+            'X-Amz-Target': f'{TARGET_PREFIX}.{operation}',
+        }, body, host=self.host, region=self.region,
+            credentials=self._credentials())
+        for reconnect in (False, True):
+            connection = self._connection()
+            try:
+                connection.request('POST', '/', body, headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # the kept-alive connection may have been closed
+                connection.close()
+                self._local.connection = None
+                if reconnect:
+                    raise
+
+    def send(self, operation, params):
+        """
+        Send an operation's request with `params`, returning the response
+        body as bytes.
+        """
+        from .memory import client_error
+        body = encode_body(params)
+        for attempt in range(1, self.max_attempts + 1):
+            status, data = self._post(operation, body)
+            if status == 200:
+                return data
+            try:
+                error = json.loads(data)
+            except ValueError:
+                error = {}
+            code = error.get('__type', '').rpartition('#')[2] or str(status)
+            message = error.get('message') or error.get('Message') or ''
+            if (attempt < self.max_attempts and
+                    (code in RETRYABLE_ERRORS or
+                     status in RETRYABLE_STATUSES)):
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+                continue
+            raise client_error(code, message, operation, status=status)
+
+    def call(self, operation, **params):
+        """
+        Send an operation's request, returning the parsed response.
+        """
+        return json.loads(self.send(operation, params))
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        operation = operation_name(name)
+
+        def method(**params):
+            return self.call(operation, **params)
+
+        method.__name__ = name
+        return method
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -1,8 +1,9 @@
+import os
 import types
 
 import pytest
 
-from pydynasync import devguide, exp
+from pydynasync import devguide, exp, memory, provision
 from pydynasync import models as M
 
 from test import StringTest, IntegerTest, Person
@@ -80,47 +81,103 @@ def test1_spec():
     return devguide.specs['Test1']
 
 
-@pytest.fixture
-def product_catalog_table(product_catalog_spec, client):
-    yield exp.create_table(client, product_catalog_spec)
-    client.delete_table(TableName=product_catalog_spec.TableName)
+@pytest.fixture(scope='session')
+def table_prefix():
+    """
+    Prefix for pool table names, which is unique to each pytest-xdist
+    worker so that workers sharing an endpoint don't share tables.
+    """
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    return f'{worker}-' if worker else ''
+
+
+@pytest.fixture(scope='session')
+def table_pool(pool_client, table_prefix):
+    pool = provision.TablePool(pool_client, devguide.specs.values(),
+                               prefix=table_prefix)
+    yield pool
+    pool.close()
 
 
 @pytest.fixture
-def forum_table(forum_spec, client):
-    yield exp.create_table(client, forum_spec)
-    client.delete_table(TableName=forum_spec.TableName)
+def product_catalog_table(product_catalog_spec, table_pool):
+    return table_pool.acquire(product_catalog_spec)
 
 
 @pytest.fixture
-def thread_table(thread_spec, client):
-    yield exp.create_table(client, thread_spec)
-    client.delete_table(TableName=thread_spec.TableName)
+def forum_table(forum_spec, table_pool):
+    return table_pool.acquire(forum_spec)
 
 
 @pytest.fixture
-def reply_table(reply_spec, client):
-    yield exp.create_table(client, reply_spec)
-    client.delete_table(TableName=reply_spec.TableName)
+def thread_table(thread_spec, table_pool):
+    return table_pool.acquire(thread_spec)
 
 
 @pytest.fixture
-def test_table(test_spec, client):
-    yield exp.create_table(client, test_spec)
-    client.delete_table(TableName=test_spec.TableName)
+def reply_table(reply_spec, table_pool):
+    return table_pool.acquire(reply_spec)
 
 
 @pytest.fixture
-def test1_table(test1_spec, client):
-    yield exp.create_table(client, test1_spec)
-    client.delete_table(TableName=test1_spec.TableName)
+def test_table(test_spec, table_pool):
+    return table_pool.acquire(test_spec)
 
 
 @pytest.fixture
+def test1_table(test1_spec, table_pool):
+    return table_pool.acquire(test1_spec)
+
+
+@pytest.fixture(scope='session')
 def session():
     return exp.make_session()
 
 
-@pytest.fixture
-def client(session):
-    return exp.get_client(session=session)
+@pytest.fixture(scope='session')
+def endpoint():
+    """
+    The DynamoDB endpoint URL, which is the in-memory engine unless the
+    DYNAMODB_ENDPOINT_URL environment variable is set.
+    """
+    return os.environ.get('DYNAMODB_ENDPOINT_URL', memory.DEFAULT_ENDPOINT)
+
+
+@pytest.fixture(scope='session')
+def pool_client(endpoint, request):
+    """
+    The client of the session-scoped `table_pool`.
+    """
+    if memory.is_memory_endpoint(endpoint):
+        yield exp.get_client(endpoint=endpoint)
+        memory.reset(endpoint)
+    else:
+        session = request.getfixturevalue('session')
+        yield exp.get_client(endpoint=endpoint, session=session)
+
+
+@pytest.fixture
+def client(endpoint, table_prefix, request):
+    """
+    A client for each test. With the in-memory engine, any tables a test
+    leaves behind besides the pool's are deleted after it, so that only
+    the pool tables are shared between tests.
+    """
+    if not memory.is_memory_endpoint(endpoint):
+        yield request.getfixturevalue('pool_client')
+        return
+    client = exp.get_client(endpoint=endpoint)
+    yield client
+    pool_names = {table_prefix + spec.TableName
+                  for spec in devguide.specs.values()}
+    names = client.list_tables()['TableNames']
+    provision.delete_tables(
+        client, [name for name in names if name not in pool_names])
+
+
+@pytest.fixture(scope='session')
+def streams_client(endpoint, request):
+    if memory.is_memory_endpoint(endpoint):
+        return exp.get_streams_client(endpoint=endpoint)
+    session = request.getfixturevalue('session')
+    return exp.get_streams_client(endpoint=endpoint, session=session)
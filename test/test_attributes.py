@@ -1,13 +1,15 @@
 import base64
+import datetime
 import decimal
 
 import pytest
 
-from pydynasync import attributes as A, ddb, models as M
+from pydynasync import attributes as A, ddb, models as M, tracking
 from pydynasync import types as T
 
 SCALAR_ATTRIBUTE_TYPES = (
     A.String, A.Binary, A.Number, A.Integer, A.Decimal, A.Null, A.Boolean,
+    A.CompressedString, A.CompressedBinary,
 )
 SET_ATTRIBUTE_TYPES = (
     A.StringSet, A.BinarySet, A.NumberSet, A.IntegerSet, A.DecimalSet,
@@ -22,7 +24,7 @@ ATTRIBUTE_TYPES = (SCALAR_ATTRIBUTE_TYPES + SET_ATTRIBUTE_TYPES +
 
 valid_attr_values = {
     A.String: ('the', 'quick'),
-    A.Binary: (b'foo', b'bar'),
+    A.Binary: (b'foo', b'bar', memoryview(b'baz')),
     A.Number: (0, 1.1, -2, decimal.Decimal('1.1')),
     A.Integer: (0, 1, -3189, 86500),
     A.Decimal: (decimal.Decimal('0'), decimal.Decimal('1234.56')),
@@ -31,6 +33,8 @@ valid_attr_values = {
     A.List: (["1", 2, decimal.Decimal('3.3')], ),
     A.Map: ({'foo': 'bar', 'baz': 'qux'}, )
 }
+valid_attr_values[A.CompressedString] = valid_attr_values[A.String]
+valid_attr_values[A.CompressedBinary] = valid_attr_values[A.Binary]
 valid_attr_values[A.StringSet] = (set(valid_attr_values[A.String]), )
 valid_attr_values[A.BinarySet] = (set(valid_attr_values[A.Binary]), )
 valid_attr_values[A.NumberSet] = (set(valid_attr_values[A.Number]), )
@@ -47,6 +51,8 @@ invalid_attr_values = {
     A.Null: (True, False, 'None'),
     A.Boolean: (0, 1, 'true'),
 }
+invalid_attr_values[A.CompressedString] = invalid_attr_values[A.String]
+invalid_attr_values[A.CompressedBinary] = invalid_attr_values[A.Binary]
 invalid_attr_values[A.StringSet] = (set(invalid_attr_values[A.String]), )
 invalid_attr_values[A.BinarySet] = (set(invalid_attr_values[A.Binary]), )
 invalid_attr_values[A.NumberSet] = (set(invalid_attr_values[A.Number]), )
@@ -172,11 +178,19 @@ def test_attribute_del_nullable(ModelAttr):
     Model, Attr = ModelAttr
     value = valid_attr_values[Attr][0]
 
+    # set and document values are held in a tracked copy
+    if issubclass(Attr, A.TrackedAttributeMixin):
+        def same(a, b):
+            return a == b and isinstance(a, tracking.Tracked)
+    else:
+        def same(a, b):
+            return a is b
+
     instance = Model()
     instance.required = value
     instance.optional = value
-    assert instance.required is value
-    assert instance.optional is value
+    assert same(instance.required, value)
+    assert same(instance.optional, value)
 
     del instance.optional
     assert instance.optional is None
@@ -186,7 +200,7 @@ def test_attribute_del_nullable(ModelAttr):
     expected = "{} attribute 'required' is not nullable and may not be deleted"
     expected = expected.format(Attr.__name__)
     assert str(e.value) == expected
-    assert instance.required is value
+    assert same(instance.required, value)
 
 
 def test_attribute_name_not_reserved_word():
@@ -262,3 +276,179 @@ def test_stringset_serialization():
 
     result2 = T.AttrType.SS.deserialize('foo', result)
     assert result2 == {'a', 'b'}
+
+
+def test_binary_serialize_without_copy():
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        payload = A.Binary()
+        payloads = A.BinarySet(nullable=True)
+
+    blob = b'x' * 1024
+    assert P.payload.serialize(blob)['payload']['B'] is blob
+    assert P.payload.serialize(memoryview(blob))['payload']['B'] is blob
+    expected = {'payload': {'B': b'xxxx'}}
+    assert P.payload.serialize(memoryview(blob)[:4]) == expected
+    buf = bytearray(blob)
+    assert P.payload.serialize(buf)['payload']['B'] is buf
+
+    serialized = {'payload': {'B': blob}}
+    assert P.payload.deserialize(serialized) is blob
+    # str values are in base64 wire form
+    assert P.payload.deserialize({'payload': {'B': 'eHh4'}}) == b'xxx'
+
+    serialized = P.payloads.serialize({b'a', memoryview(b'b')})
+    assert sorted(serialized['payloads']['BS']) == [b'a', b'b']
+    assert P.payloads.deserialize(serialized) == {b'a', b'b'}
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_compressed_string(codec):
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        message = A.CompressedString(codec=codec, threshold=64)
+
+    short = 'short message'
+    serialized = P.message.serialize(short)
+    # stored uncompressed, after the two-byte header
+    assert serialized['message']['B'] == b'\xc5\x00' + short.encode()
+    assert P.message.deserialize(serialized).value == short
+
+    long = 'DynamoDB Thread 1 Reply 1 text ' * 100
+    serialized = P.message.serialize(long)
+    stored = serialized['message']['B']
+    assert stored[:1] == b'\xc5'
+    assert stored[1] == A.COMPRESSION_CODECS[codec][0]
+    assert len(stored) < len(long) / 10
+    assert P.message.deserialize(serialized).value == long
+
+
+def test_compressed_incompressible():
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        payload = A.CompressedBinary(threshold=0)
+
+    data = bytes(range(256))
+    stored = P.payload.serialize(data)['payload']['B']
+    assert stored == b'\xc5\x00' + data
+
+
+def test_compressed_lazy_decompression():
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        payload = A.CompressedBinary(threshold=16)
+
+    data = b'0123456789' * 100
+    loaded = P.payload.deserialize(P.payload.serialize(data))
+    assert isinstance(loaded, A.Compressed)
+    # a value that was never decompressed is stored as it was
+    assert P.payload.serialize(loaded) == P.payload.serialize(data)
+
+    p = P()
+    P.payload.reset(p, loaded)
+    assert P.payload.values[p] is loaded
+    assert p.payload == data
+    assert P.payload.values[p] == data
+    # decompressing is not a change
+    assert not M.ModelMeta.get_changed(p)
+
+    p.payload = data + b'X'
+    assert M.ModelMeta.get_changed(p) == {'payload': data + b'X'}
+    p.payload = data
+    assert not M.ModelMeta.get_changed(p)
+
+
+def test_compressed_invalid():
+
+    with pytest.raises(ValueError):
+        A.CompressedString(codec='bz2')
+
+    with pytest.raises(TypeError):
+        A.CompressedString(hash_key=True)
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        message = A.CompressedString()
+
+    with pytest.raises(ValueError) as e:
+        P.message.decompress(b'no header')
+    assert 'does not have a compression header' in str(e.value)
+
+    class CompressedNumber(A.CompressedAttributeMixin, A.Number):
+        pass
+
+    with pytest.raises(TypeError):
+        CompressedNumber()
+
+
+def test_datetime():
+    utc = datetime.timezone.utc
+    tz = datetime.timezone(datetime.timedelta(hours=-7))
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        created = A.DateTime()
+        stamp = A.DateTime(encoding='epoch', nullable=True)
+
+    when = datetime.datetime(2015, 9, 22, 12, 58, 22, 947000, tzinfo=tz)
+    p = P(id=1, created=when, stamp=when)
+    assert p.created == when
+    assert p.created.tzinfo is utc
+    assert P.created.serialize(when) == {
+        'created': {'S': '2015-09-22T19:58:22.947000Z'}}
+    assert P.stamp.serialize(when) == {'stamp': {'N': '1442951902.947000'}}
+    assert P.from_item(p.to_item()) == p
+
+    early = datetime.datetime(999, 1, 2, tzinfo=utc)
+    assert P.created.serialize(early)['created']['S'] < (
+        P.created.serialize(when)['created']['S'])
+    assert P.stamp.deserialize(P.stamp.serialize(early)) == early
+    assert P.stamp.serialize(datetime.datetime(1970, 1, 1, tzinfo=utc)) == {
+        'stamp': {'N': '0'}}
+    # strings without a timezone are UTC
+    assert P.created.deserialize({'created': {'S': '2015-09-22T19:58'}}) == (
+        datetime.datetime(2015, 9, 22, 19, 58, tzinfo=utc))
+
+    with pytest.raises(ValueError):
+        p.created = datetime.datetime(2015, 9, 22)
+    with pytest.raises(TypeError):
+        p.created = '2015-09-22'
+    with pytest.raises(ValueError):
+        A.DateTime(encoding='unix')
+
+
+def test_composite_key():
+
+    class P(M.Model):
+        id = A.CompositeKey(2, hash_key=True)
+        path_parts = A.CompositeKey(3, separator='/', nullable=True)
+
+    p = P(id=('Amazon DynamoDB', 'DynamoDB Thread 1'))
+    assert p.to_item() == {'id': {'S': 'Amazon DynamoDB#DynamoDB Thread 1'}}
+    assert P.from_item(p.to_item()) == p
+    # only the last part may contain the separator
+    p.path_parts = ('a', 'b', 'c/d')
+    assert P.path_parts.deserialize(P.path_parts.serialize(p.path_parts)) == (
+        'a', 'b', 'c/d')
+    with pytest.raises(ValueError):
+        p.path_parts = ('a/b', 'c', 'd')
+    with pytest.raises(TypeError):
+        p.path_parts = ('a', 'b')
+    with pytest.raises(TypeError):
+        p.path_parts = ['a', 'b', 'c']
+    with pytest.raises(ValueError):
+        P.id.deserialize({'id': {'S': 'no separator'}})
+
+    assert P.path_parts.serialize_prefix(('a',)) == {'path_parts': {'S': 'a/'}}
+    assert P.path_parts.serialize_prefix(('a', 'b', 'c')) == {
+        'path_parts': {'S': 'a/b/c'}}
+    assert P.path_parts.serialize_prefix('a/b') == {
+        'path_parts': {'S': 'a/b'}}
+    with pytest.raises(TypeError):
+        P.path_parts.serialize_prefix(1)
+    with pytest.raises(ValueError):
+        A.CompositeKey(1)
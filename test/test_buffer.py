@@ -0,0 +1,226 @@
+import time
+
+import pytest
+
+from pydynasync import attributes as A, buffer, models as M, provision
+from pydynasync.table import Table
+
+
+class Status(M.Model):
+
+    device = A.String(hash_key=True)
+    phase = A.String(nullable=True)
+    seen = A.Integer(nullable=True)
+    note = A.String(nullable=True)
+
+
+@pytest.fixture
+def statuses(client, table_prefix):
+    table = Table(Status, client, name=table_prefix + 'BufferStatus')
+    provision.create_table(client, table.spec())
+    yield table
+    provision.delete_table(client, table.name)
+
+
+class FailingClient:
+
+    def __init__(self, client, failures):
+        self.client = client
+        self.failures = failures
+
+    def update_item(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('update failed')
+        return self.client.update_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def test_updates_coalesce(statuses):
+    with buffer.WriteBuffer(statuses, max_delay=60) as buf:
+        for i in range(100):
+            status = Status(device=f'd{i % 3}')
+            status.seen = i
+            if i % 10 == 0:
+                status.phase = f'phase {i}'
+            buf.update(status)
+            assert M.ModelMeta.get_changed(status) == {}
+        assert len(buf) == 3
+        assert statuses.get('d0') is None
+    assert buf.stats.writes == 100
+    assert buf.stats.update_requests == 3
+    assert buf.stats.coalesced == 97
+
+    loaded = {s.device: s for s in statuses.scan()}
+    assert {d: s.seen for d, s in loaded.items()} == {
+        'd0': 99, 'd1': 97, 'd2': 98}
+    assert {d: s.phase for d, s in loaded.items()} == {
+        'd0': 'phase 90', 'd1': 'phase 70', 'd2': 'phase 80'}
+
+
+def test_update_leaves_unchanged_attributes(statuses):
+    statuses.put(Status(device='d', phase='on', note='keep'))
+    with buffer.WriteBuffer(statuses, max_delay=60) as buf:
+        status = statuses.get('d')
+        status.seen = 1
+        buf.update(status)
+        status.phase = None
+        buf.update(status)
+    loaded = statuses.get('d')
+    assert (loaded.phase, loaded.seen, loaded.note) == (None, 1, 'keep')
+
+
+def test_put_then_update(statuses):
+    statuses.put(Status(device='d', note='replaced'))
+    with buffer.WriteBuffer(statuses, max_delay=60) as buf:
+        buf.put(Status(device='d', phase='off', seen=1))
+        status = Status(device='d')
+        status.seen = 2
+        buf.update(status)
+        buf.put(Status(device='e', phase='on'))
+    assert buf.stats.batch_requests == 1
+    assert buf.stats.update_requests == 0
+    loaded = statuses.get('d')
+    assert (loaded.phase, loaded.seen, loaded.note) == ('off', 2, None)
+    assert statuses.get('e').phase == 'on'
+
+
+def test_max_keys_flushes(statuses):
+    buf = buffer.WriteBuffer(statuses, max_delay=60, max_keys=5)
+    for i in range(12):
+        buf.put(Status(device=f'd{i}'))
+    assert len(buf) == 2
+    assert buf.stats.flushes == 2
+    buf.close()
+    assert len(list(statuses.scan())) == 12
+    with pytest.raises(ValueError):
+        buf.put(Status(device='late'))
+
+
+def test_max_delay_flushes(statuses):
+    buf = buffer.WriteBuffer(statuses, max_delay=0.02)
+    buf.put(Status(device='d', phase='on'))
+    deadline = time.monotonic() + 5
+    while len(buf) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert statuses.get('d', consistent=True).phase == 'on'
+    buf.close()
+
+
+def test_failed_flush_keeps_writes(statuses):
+    failing = Table(Status, FailingClient(statuses.client, 1),
+                    name=statuses.name)
+    buf = buffer.WriteBuffer(failing, max_delay=60)
+    status = Status(device='d')
+    status.seen = 1
+    buf.update(status)
+    with pytest.raises(RuntimeError):
+        buf.flush()
+    assert len(buf) == 1
+    status.seen = 2
+    buf.update(status)
+    buf.close()
+    assert statuses.get('d').seen == 2
+    assert buf.stats.update_requests == 1
+
+
+class Report(M.Model, overflow=8 * 1024):
+
+    folder = A.String(hash_key=True)
+    filename = A.String(range_key=True)
+    body = A.String(nullable=True)
+
+
+def test_update_overflow_model(client, table_prefix):
+    reports = Table(Report, client, name=table_prefix + 'BufferReport')
+    provision.create_table(client, reports.spec())
+    try:
+        reports.put(Report(folder='f', filename='a', body='x' * 20000))
+        report = reports.get('f', 'a')
+        report.body = 'short'
+        with buffer.WriteBuffer(reports, max_delay=60) as buf:
+            buf.update(report)
+        assert M.ModelMeta.get_changed(report) == {}
+        assert reports.get('f', 'a').body == 'short'
+
+        report.body = 'y' * 20000
+        with buffer.WriteBuffer(reports, max_delay=60) as buf:
+            buf.update(report)
+        assert reports.get('f', 'a').body == 'y' * 20000
+    finally:
+        provision.delete_table(client, reports.name)
+
+
+class Topic(M.Model):
+
+    subject = A.String(hash_key=True)
+    visits = A.Counter()
+    replies = A.Counter(nullable=True)
+    note = A.String(nullable=True)
+
+
+@pytest.fixture
+def topics(client, table_prefix):
+    table = Table(Topic, client, name=table_prefix + 'BufferTopic')
+    provision.create_table(client, table.spec())
+    yield table
+    provision.delete_table(client, table.name)
+
+
+def test_counter_attribute(topics):
+    topic = Topic(subject='s')
+    assert topic.visits == 0
+    topic.visits += 2
+    topics.update(topic)
+    assert topics.get('s').visits == 2
+
+    # increments made elsewhere aren't lost
+    other = topics.get('s')
+    other.visits += 5
+    topic.visits += 1
+    assert Topic.visits.delta(topic) == 1
+    topics.update(other)
+    topics.update(topic)
+    assert topics.get('s').visits == 8
+    assert topic.visits == 3
+
+    with pytest.raises(TypeError):
+        A.Counter(hash_key=True)
+
+
+def test_increments_aggregate(topics):
+    with buffer.WriteBuffer(topics, max_delay=60) as buf:
+        for i in range(300):
+            buf.increment(f's{i % 3}', visits=1, replies=i % 2)
+        assert buf.pending_deltas == {'visits': 300, 'replies': 150}
+        assert len(buf) == 3
+        # an instance's changes are increments too
+        topic = Topic(subject='s1', replies=10)
+        buf.update(topic)
+        assert buf.pending_deltas == {'visits': 300, 'replies': 160}
+        # a removal replaces the increments before it, and those after it
+        # are added to 0
+        topic = Topic(subject='s0')
+        topic.replies = None
+        buf.update(topic)
+        buf.increment('s0', replies=2)
+        assert buf.pending_deltas == {'visits': 300, 'replies': 110}
+
+        with pytest.raises(TypeError):
+            buf.increment('s0', note=1)
+    assert buf.stats.increments == 301
+    assert buf.stats.writes == 303
+    assert buf.stats.update_requests == 3
+    assert buf.pending_deltas == {}
+    loaded = {t.subject: (t.visits, t.replies) for t in topics.scan()}
+    assert loaded == {'s0': (100, 2), 's1': (100, 60), 's2': (100, 50)}
+
+    # increments of a pending put are added to its item
+    with buffer.WriteBuffer(topics, max_delay=60) as buf:
+        buf.put(Topic(subject='s1', visits=1))
+        buf.increment('s1', visits=2)
+        buf.increment('s1', replies=3)
+    assert topics.get('s1').visits == 3
+    assert topics.get('s1').replies == 3
@@ -0,0 +1,104 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from pydynasync.cmd import export, load
+
+
+def put_items(client, name, count):
+    for i in range(count):
+        client.put_item(TableName=name, Item={
+            'Id': {'N': str(i)},
+            'Title': {'S': f'Book {i}'},
+            'Cover': {'B': bytes([i % 256]) * 3},
+        })
+
+
+def test_export_table(client, product_catalog_table):
+    name = product_catalog_table['TableName']
+    put_items(client, name, 50)
+
+    out = io.StringIO()
+    stats = export.export_table(client, name, out, segments=3, page_size=7)
+    assert stats.items == 50
+    assert stats.pages >= 50 // 7
+    assert stats.bytes == len(out.getvalue())
+    assert 'exported 50 items' in str(stats)
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 50
+    elems = [json.loads(line) for line in lines]
+    items = [export.decode_item(e['PutRequest']['Item']) for e in elems]
+    assert sorted(int(item['Id']['N']) for item in items) == list(range(50))
+    item = next(item for item in items if item['Id']['N'] == '3')
+    assert item['Cover'] == {'B': b'\x03\x03\x03'}
+
+
+class FailingOutput(io.StringIO):
+
+    def write(self, text):
+        raise OSError('disk full')
+
+
+class CountingScans:
+
+    def __init__(self, client):
+        self.client = client
+        self.scans = 0
+
+    def scan(self, **params):
+        self.scans += 1
+        return self.client.scan(**params)
+
+
+def test_export_error_stops_scanners(client, product_catalog_table):
+    name = product_catalog_table['TableName']
+    put_items(client, name, 200)
+    scans = CountingScans(client)
+    with pytest.raises(OSError):
+        export.export_table(scans, name, FailingOutput(), segments=2,
+                            page_size=1)
+    # the scanners stop soon after the error instead of scanning everything
+    assert scans.scans < 100
+
+
+def test_export_resume(client, product_catalog_table, tmpdir):
+    name = product_catalog_table['TableName']
+    put_items(client, name, 30)
+    path = str(tmpdir.join('checkpoint.json'))
+
+    # finish segment 0 and leave segment 1 untouched
+    checkpoint = export.Checkpoint(path, name, 2)
+    checkpoint.update(0, None)
+    out = io.StringIO()
+    stats = export.export_table(client, name, out, segments=2,
+                                checkpoint=export.Checkpoint(path, name, 2))
+    assert 0 < stats.items < 30
+
+    everything = io.StringIO()
+    export.export_table(client, name, everything, segments=2)
+    assert set(out.getvalue().splitlines()) < set(
+        everything.getvalue().splitlines())
+
+    # a finished export has nothing left to do
+    stats = export.export_table(client, name, io.StringIO(), segments=2,
+                                checkpoint=export.Checkpoint(path, name, 2))
+    assert stats.items == 0
+
+
+def test_export_load_round_trip(client, product_catalog_table, tmpdir):
+    name = product_catalog_table['TableName']
+    put_items(client, name, 10)
+    path = str(tmpdir.join('export.jsonl.gz'))
+    with export.open_output(path, compress=True) as out:
+        export.export_table(client, name, out)
+    with gzip.open(path, 'rt') as f:
+        assert len(f.readlines()) == 10
+
+    data = load.read_jsonl(path, name)
+    items = [e['PutRequest']['Item'] for e in data[name]]
+    assert sorted(item['Id']['N'] for item in items) == sorted(
+        str(i) for i in range(10))
+    assert all(isinstance(item['Cover']['B'], bytes) for item in items)
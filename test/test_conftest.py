@@ -82,10 +82,11 @@ def test_reply_table(reply_table, client):
 def test_test_table(test_table, client):
     t = test_table
     assert client.describe_table(TableName=t['TableName'])
+    name = t['TableName']
     import pprint
 
     result = client.put_item(
-        TableName='Test',
+        TableName=name,
         Item={
             'Id': {'N': '1'},
             'Handiness': {'S': 'most decent'},
@@ -97,7 +98,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.get_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '1'},
             'Handiness': {'S': 'most decent'},
@@ -109,7 +110,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.get_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '1'},
             'Handiness': {'S': 'most decent'},
@@ -122,7 +123,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.delete_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '1'},
             'Handiness': {'S': 'most decent'},
@@ -134,7 +135,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.put_item(
-        TableName='Test',
+        TableName=name,
         Item={
             'Id': {'N': '2'},
             'Handiness': {'S': '2'},
@@ -147,7 +148,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.get_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '2'},
             'Handiness': {'S': '2'},
@@ -159,7 +160,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.get_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '1'},
             'Handiness': {'S': '2'},
@@ -172,7 +173,7 @@ def test_test_table(test_table, client):
     print()
 
     result = client.delete_item(
-        TableName='Test',
+        TableName=name,
         Key={
             'Id': {'N': '2'},
             'Handiness': {'S': '2'},
@@ -0,0 +1,122 @@
+import collections
+import decimal
+
+import pytest
+
+from pydynasync import attributes as A, documents as D, models as M
+
+
+def nested(depth, leaf='x'):
+    value = leaf
+    for i in range(depth):
+        value = [value] if i % 2 else {'k': value}
+    return value
+
+
+def test_round_trip():
+    value = {
+        'name': 'x',
+        'count': 3,
+        'price': decimal.Decimal('1.25'),
+        'ratio': 0.5,
+        'flag': False,
+        'nothing': None,
+        'payload': b'\x00\x01',
+        'tags': {'a', 'b'},
+        'sizes': {1, 2},
+        'items': [1, 'two', [3], {'four': 4}],
+        'empty': {},
+        'none': [],
+    }
+    typed = D.encode(value)
+    assert typed['M']['price'] == {'N': '1.25'}
+    assert typed['M']['ratio'] == {'N': '0.5'}
+    assert typed['M']['nothing'] == {'NULL': True}
+    assert typed['M']['items'] == {'L': [
+        {'N': '1'}, {'S': 'two'}, {'L': [{'N': '3'}]},
+        {'M': {'four': {'N': '4'}}},
+    ]}
+    assert sorted(typed['M']['tags']['SS']) == ['a', 'b']
+    decoded = D.decode(typed)
+    assert decoded == dict(value, ratio=decimal.Decimal('0.5'))
+    assert list(decoded) == list(value)
+
+
+def test_scalars_and_subclasses():
+    assert D.encode('x') == {'S': 'x'}
+    assert D.encode(True) == {'BOOL': True}
+    assert D.decode({'N': '7'}) == 7
+    assert D.encode(collections.OrderedDict(a=(1,))) == {
+        'M': {'a': {'L': [{'N': '1'}]}}}
+    assert D.encode({'s': frozenset(['x'])}) == {'M': {'s': {'SS': ['x']}}}
+
+
+@pytest.mark.parametrize('value,error', [
+    ({1: 'x'}, TypeError),
+    ({'s': set()}, ValueError),
+    ({'s': {'a', 1}}, TypeError),
+    ([object()], TypeError),
+    ([10 ** 200], ValueError),
+])
+def test_encode_invalid(value, error):
+    with pytest.raises(error):
+        D.encode(value)
+
+
+@pytest.mark.parametrize('typed', [
+    {'X': 'x'},
+    {'L': [{'X': 'x'}]},
+    {'M': {'a': {'S': 'x', 'N': '1'}}},
+    {'L': ['x']},
+])
+def test_decode_invalid(typed):
+    with pytest.raises(ValueError):
+        D.decode(typed)
+
+
+def test_depth_limit():
+    value = nested(D.DEFAULT_MAX_DEPTH)
+    assert D.decode(D.encode(value)) == value
+    with pytest.raises(ValueError) as e:
+        D.encode(nested(D.DEFAULT_MAX_DEPTH + 1))
+    assert 'nested more than 32 levels' in str(e.value)
+    with pytest.raises(ValueError):
+        D.decode(D.encode(value), max_depth=10)
+
+    # no recursion, so depth is only limited by max_depth
+    decoded = D.decode(D.encode(nested(5000), max_depth=5000),
+                       max_depth=5000)
+    for i in reversed(range(5000)):
+        decoded = decoded[0] if i % 2 else decoded['k']
+    assert decoded == 'x'
+
+    cycle = []
+    cycle.append(cycle)
+    with pytest.raises(ValueError):
+        D.encode(cycle)
+
+
+def test_wide_document():
+    value = {f'k{i}': [i, {'v': str(i)}] for i in range(20000)}
+    assert D.decode(D.encode(value)) == value
+
+
+def test_document_attributes():
+
+    class P(M.Model):
+        id = A.Integer(hash_key=True)
+        extra = A.Map(nullable=True, max_depth=3)
+        replies = A.List(nullable=True)
+
+    assert P.replies.serialize(['a', {'b': 1}]) == {'replies': {'L': [
+        {'S': 'a'}, {'M': {'b': {'N': '1'}}}]}}
+    p = P.from_item({'id': {'N': '1'},
+                     'extra': {'M': {'a': {'L': [{'S': 'x'}]}}}})
+    assert p.extra == {'a': ['x']}
+    assert P.from_item(p.to_item()) == p
+    assert P.extra.max_depth == 3
+    p.extra = {'a': [{'b': [1]}]}
+    with pytest.raises(ValueError):
+        p.to_item()
+    p.extra = None
+    assert 'extra' not in p.to_item()
@@ -0,0 +1,98 @@
+import pytest
+
+from pydynasync import attributes as A, expressions as E, models as M
+
+
+class Reading(M.Model):
+
+    sensor = A.String(hash_key=True)
+    taken = A.String(range_key=True, ddb_name='TakenAt')
+    celsius = A.Decimal(nullable=True)
+    note = A.String(nullable=True)
+
+
+@pytest.fixture
+def cache():
+    saved = E.cache
+    E.cache = E.ExpressionCache(maxsize=4)
+    yield E.cache
+    E.cache = saved
+
+
+def test_update(cache):
+    expression = E.update(Reading, ['celsius', 'taken'], ['note'])
+    assert expression.text == 'SET #u0 = :u0, #u1 = :u1 REMOVE #u2'
+    assert expression.names == {'#u0': 'celsius', '#u1': 'TakenAt',
+                                '#u2': 'note'}
+    assert expression.bind({'N': '1'}, {'S': 'x'}) == {
+        ':u0': {'N': '1'}, ':u1': {'S': 'x'}}
+    with pytest.raises(TypeError):
+        expression.bind({'N': '1'})
+    assert E.update(Reading, [], ['note']).text == 'REMOVE #u0'
+
+    expression = E.update(Reading, ['celsius'], ['note'],
+                          append_names=['taken'], add_names=['sensor'],
+                          delete_names=['celsius'])
+    assert expression.text == (
+        'SET #u0 = :u0, #u1 = list_append(#u1, :u1) REMOVE #u4 '
+        'ADD #u2 :u2 DELETE #u3 :u3')
+    assert expression.slots == (':u0', ':u1', ':u2', ':u3')
+
+
+@pytest.mark.parametrize('op,text', [
+    (None, '#k0 = :k0'),
+    ('<=', '#k0 = :k0 AND #k1 <= :k1'),
+    ('begins_with', '#k0 = :k0 AND begins_with(#k1, :k1)'),
+    ('between', '#k0 = :k0 AND #k1 BETWEEN :k1 AND :k2'),
+])
+def test_key_condition(cache, op, text):
+    expression = E.key_condition(Reading, op)
+    assert expression.text == text
+    assert len(expression.slots) == 1 + E.RANGE_OPERATORS.get(op, 0)
+    assert expression.names['#k0'] == 'sensor'
+
+
+def test_key_condition_errors(cache):
+    with pytest.raises(ValueError):
+        E.key_condition(Reading, '<>')
+
+
+def test_projection_and_params(cache):
+    projection = E.projection(Reading, ['taken', 'celsius'], ['_extra'])
+    assert projection.text == '#p0, #p1, #p2'
+    assert list(projection.names.values()) == ['TakenAt', 'celsius',
+                                               '_extra']
+    params = E.params(
+        ('KeyConditionExpression', E.key_condition(Reading),
+         ({'S': 's1'},)),
+        ('ProjectionExpression', projection, ()),
+        TableName='Readings',
+    )
+    assert params == {
+        'TableName': 'Readings',
+        'KeyConditionExpression': '#k0 = :k0',
+        'ProjectionExpression': '#p0, #p1, #p2',
+        'ExpressionAttributeNames': {'#k0': 'sensor', '#p0': 'TakenAt',
+                                     '#p1': 'celsius', '#p2': '_extra'},
+        'ExpressionAttributeValues': {':k0': {'S': 's1'}},
+    }
+
+
+def test_cache_stats(cache):
+    first = E.update(Reading, ['celsius'])
+    assert E.update(Reading, ['celsius']) is first
+    assert E.update(Reading, ('celsius',)) is first
+    stats = E.cache_stats()
+    assert (stats.hits, stats.misses, stats.size) == (2, 1, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+    for op in ('<', '>', '=', 'between'):
+        E.key_condition(Reading, op)
+    stats = E.cache_stats()
+    assert (stats.size, stats.evictions) == (4, 1)
+    assert E.update(Reading, ['celsius']) is not first
+
+    cache.resize(2)
+    assert E.cache_stats().size == 2
+    cache.clear()
+    assert E.cache_stats() == E.CacheStats(maxsize=2)
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize('module', [
+    'pydynasync.types', 'pydynasync.attributes', 'pydynasync.models',
+    'pydynasync.table', 'pydynasync.exp', 'pydynasync.devguide',
+])
+def test_import_does_not_load_boto(module):
+    code = (f'import sys, {module}; '
+            'print(sorted(m for m in sys.modules '
+            'if m.split(".")[0] in ("boto3", "botocore")))')
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     universal_newlines=True)
+    assert output.strip() == '[]'
+
+
+def test_devguide_specs_are_lazy():
+    from pydynasync import devguide
+    specs = devguide.LazySpecs({'T': lambda: object()})
+    assert len(specs) == 1 and list(specs) == ['T']
+    assert specs['T'] is specs['T']
+    assert devguide.specs['Forum'].TableName == 'Forum'
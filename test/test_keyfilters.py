@@ -0,0 +1,197 @@
+import base64
+import decimal
+
+import pytest
+
+from pydynasync import attributes as A, buffer, memory, models as M
+from pydynasync import keyfilters, provision, types, util
+from pydynasync.table import Table
+
+
+class Account(M.Model):
+    folder = A.String(hash_key=True)
+    filename = A.String(range_key=True)
+    note = A.String(nullable=True)
+
+
+class CountingClient:
+
+    def __init__(self):
+        self.client = memory.MemoryClient()
+        self.gets = 0
+
+    def get_item(self, **params):
+        self.gets += 1
+        return self.client.get_item(**params)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class Blob(M.Model):
+    digest = A.Binary(hash_key=True)
+    note = A.String(nullable=True)
+
+
+class WireScanClient(CountingClient):
+
+    """
+    A CountingClient whose scans return binary values in base64 wire form,
+    as a `wire.WireClient`'s do.
+    """
+
+    def scan(self, **params):
+        page = self.client.scan(**params)
+        for item in page.get('Items', ()):
+            for value in item.values():
+                if 'B' in value:
+                    value['B'] = base64.b64encode(value['B']).decode('ascii')
+        return page
+
+
+class Price(M.Model):
+    amount = A.Decimal(hash_key=True)
+    note = A.String(nullable=True)
+
+
+class CanonicalScanClient(CountingClient):
+
+    """
+    A CountingClient whose scans return numbers in canonical form, as
+    DynamoDB's do.
+    """
+
+    def scan(self, **params):
+        page = self.client.scan(**params)
+        for item in page.get('Items', ()):
+            for value in item.values():
+                if 'N' in value:
+                    value['N'] = types.canonical_number(value['N'])
+        return page
+
+
+@pytest.fixture
+def accounts():
+    client = CountingClient()
+    table = Table(Account, client)
+    provision.create_table(client, table.spec())
+    for i in range(50):
+        table.put(Account(folder=f'f{i % 5}', filename=f'n{i}'))
+    return table
+
+
+def test_negative_cache():
+    now = [0.0]
+    cache = keyfilters.NegativeCache(10, max_size=2, clock=lambda: now[0])
+    cache.add('a')
+    assert 'a' in cache
+    assert 'b' not in cache
+    now[0] = 10
+    assert 'a' not in cache
+    assert len(cache) == 0
+
+    for key in 'abc':
+        cache.add(key)
+    assert len(cache) == 2
+    assert 'a' not in cache
+    cache.discard('b')
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert cache.hits == 2
+    with pytest.raises(ValueError):
+        keyfilters.NegativeCache(0)
+
+
+def test_bloom_filter():
+    bloom = keyfilters.BloomFilter(1000, 0.01)
+    keys = [('k', i) for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(('other', i) in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.rejected == 10000 - false_positives
+    assert 0.001 < bloom.false_positive_rate < 0.03
+    assert bloom.memory == bloom.size // 8
+    assert 1000 < bloom.memory < 1500
+    assert bloom.hashes == 7
+    with pytest.raises(ValueError):
+        keyfilters.BloomFilter(10, 1.5)
+
+
+def test_scan_keys(accounts):
+    keys = list(accounts.scan_keys())
+    assert len(keys) == 50
+    assert all(set(key) == {'folder', 'filename'} for key in keys)
+    segments = [list(accounts.scan_keys(segment=i, total_segments=3))
+                for i in range(3)]
+    assert sorted(map(util.hashable_key, sum(segments, []))) == sorted(
+        map(util.hashable_key, keys))
+
+
+def test_get_with_bloom(accounts):
+    client = accounts.client
+    accounts.bloom = keyfilters.BloomFilter.from_scan(accounts, segments=3)
+    assert accounts.bloom.count == 50
+    assert accounts.bloom.capacity == 1000
+    assert accounts.get('f0', 'n0').filename == 'n0'
+    assert client.gets == 1
+    assert accounts.get('f0', 'missing') is None
+    assert client.gets == 1
+    # consistent gets always read
+    assert accounts.get('f0', 'missing', consistent=True) is None
+    assert client.gets == 2
+
+    # the table's writes are added to the filter
+    accounts.put(Account(folder='f0', filename='new'))
+    accounts.update_item(Account.make_key('f1', 'updated'), {'note': 'x'})
+    with buffer.WriteBuffer(accounts) as writes:
+        writes.put(Account(folder='f2', filename='buffered'))
+    assert accounts.get('f0', 'new') is not None
+    assert accounts.get('f1', 'updated').note == 'x'
+    assert accounts.get('f2', 'buffered') is not None
+
+
+def test_get_with_negative_cache(accounts):
+    client = accounts.client
+    accounts.negative_cache = keyfilters.NegativeCache(60)
+    assert accounts.get('f0', 'missing') is None
+    assert accounts.get('f0', 'missing') is None
+    assert client.gets == 1
+    assert accounts.negative_cache.hits == 1
+
+    accounts.put(Account(folder='f0', filename='missing'))
+    assert accounts.get('f0', 'missing') is not None
+    assert client.gets == 2
+
+    accounts.delete(accounts.get('f0', 'n0'))
+    gets = client.gets
+    assert accounts.get('f0', 'n0') is None
+    assert client.gets == gets
+
+
+def test_bloom_filter_binary_keys():
+    assert util.hashable_key({'k': {'B': 'AAE='}}) == util.hashable_key(
+        {'k': {'B': b'\x00\x01'}})
+    client = WireScanClient()
+    blobs = Table(Blob, client)
+    provision.create_table(client, blobs.spec())
+    for i in range(10):
+        blobs.put(Blob(digest=bytes([i]) * 8))
+    blobs.bloom = keyfilters.BloomFilter.from_scan(blobs, segments=2)
+    assert blobs.get(bytes([3]) * 8) is not None
+    assert client.gets == 1
+
+
+def test_bloom_filter_number_keys():
+    assert util.hashable_key({'k': {'N': '1.50'}}) == util.hashable_key(
+        {'k': {'N': '15E-1'}})
+    client = CanonicalScanClient()
+    prices = Table(Price, client)
+    provision.create_table(client, prices.spec())
+    amounts = [decimal.Decimal(f'{i}.50') for i in range(10)]
+    for amount in amounts:
+        prices.put(Price(amount=amount))
+    prices.bloom = keyfilters.BloomFilter.from_scan(prices, segments=2)
+    assert prices.get(amounts[3]) is not None
+    assert client.gets == 1
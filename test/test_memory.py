@@ -0,0 +1,388 @@
+from botocore.exceptions import ClientError
+
+import pytest
+
+from pydynasync import devguide, exp, memory
+from pydynasync.types import (
+    AttrType, KeyType, ProjectionType, StreamViewType
+)
+
+
+@pytest.fixture
+def mclient():
+    return memory.MemoryClient()
+
+
+@pytest.fixture
+def reply(mclient):
+    exp.create_table(mclient, devguide.specs['Reply'])
+    for i, (posted_by, when) in enumerate([
+        ('User B', '2015-09-22T19:58:22.514Z'),
+        ('User A', '2015-09-15T19:58:22.947Z'),
+        ('User A', '2015-09-29T19:58:22.514Z'),
+        ('User C', '2015-10-05T19:58:22.514Z'),
+    ]):
+        mclient.put_item(TableName='Reply', Item={
+            'Id': {'S': 'Amazon DynamoDB#DynamoDB Thread 1'},
+            'ReplyDateTime': {'S': when},
+            'PostedBy': {'S': posted_by},
+            'Message': {'S': f'reply {i}'},
+        })
+    mclient.put_item(TableName='Reply', Item={
+        'Id': {'S': 'Amazon DynamoDB#DynamoDB Thread 2'},
+        'ReplyDateTime': {'S': '2015-09-15T19:58:22.947Z'},
+        'PostedBy': {'S': 'User A'},
+    })
+    return mclient
+
+
+def reply_dates(response):
+    return [item['ReplyDateTime']['S'] for item in response['Items']]
+
+
+def test_get_client_shares_database():
+    try:
+        client1 = exp.get_client(endpoint='memory://shared')
+        client2 = exp.get_client(endpoint='memory://shared')
+        other = exp.get_client(endpoint='memory://other')
+        assert isinstance(client1, memory.MemoryClient)
+        exp.create_table(client1, exp.make_table_spec('Shared'))
+        assert client2.describe_table(TableName='Shared')
+        assert client2.list_tables()['TableNames'] == ['Shared']
+        assert other.list_tables()['TableNames'] == []
+    finally:
+        memory.reset('memory://shared')
+        memory.reset('memory://other')
+
+
+def test_create_describe_delete_table(mclient):
+    spec = devguide.specs['Reply']
+    resp = exp.create_table(mclient, spec)
+    assert resp['TableStatus'] == 'ACTIVE'
+    table = mclient.describe_table(TableName='Reply')['Table']
+    assert table['KeySchema'] == [
+        {'AttributeName': 'Id', 'KeyType': 'HASH'},
+        {'AttributeName': 'ReplyDateTime', 'KeyType': 'RANGE'},
+    ]
+    assert table['ItemCount'] == 0
+    assert table['LocalSecondaryIndexes'][0]['IndexName'] == 'PostedByIndex'
+
+    with pytest.raises(ClientError) as e:
+        exp.create_table(mclient, spec)
+    assert e.value.response['Error']['Code'] == 'ResourceInUseException'
+
+    resp = mclient.delete_table(TableName='Reply')
+    assert resp['TableDescription']['TableStatus'] == 'DELETING'
+    with pytest.raises(ClientError) as e:
+        mclient.describe_table(TableName='Reply')
+    assert e.value.response['Error']['Code'] == 'ResourceNotFoundException'
+
+
+def test_put_get_delete_item(mclient):
+    exp.create_table(mclient, devguide.specs['Test'])
+    key = {'Id': {'N': '1'}, 'Handiness': {'S': 'most decent'}}
+    item = dict(key, Adhoc={'S': 'and another'}, Data={'B': b'\x00\x01'})
+    resp = mclient.put_item(TableName='Test', Item=item)
+    assert resp['ResponseMetadata']['HTTPStatusCode'] == 200
+
+    assert mclient.get_item(TableName='Test', Key=key)['Item'] == item
+    # numbers are keyed by value, not by their string representation
+    other = {'Id': {'N': '1.0'}, 'Handiness': {'S': 'most decent'}}
+    assert mclient.get_item(TableName='Test', Key=other)['Item'] == item
+
+    resp = mclient.get_item(TableName='Test', Key=key,
+                            ProjectionExpression='Id, #a',
+                            ExpressionAttributeNames={'#a': 'Adhoc'})
+    assert resp['Item'] == {'Id': {'N': '1'}, 'Adhoc': {'S': 'and another'}}
+
+    resp = mclient.delete_item(TableName='Test', Key=key,
+                               ReturnValues='ALL_OLD')
+    assert resp['Attributes'] == item
+    assert 'Item' not in mclient.get_item(TableName='Test', Key=key)
+
+
+def test_put_item_condition(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    item = {'Id': {'N': '1'}}
+    condition = 'attribute_not_exists(Id)'
+    mclient.put_item(TableName='Test1', Item=item,
+                     ConditionExpression=condition)
+    with pytest.raises(ClientError) as e:
+        mclient.put_item(TableName='Test1', Item=item,
+                         ConditionExpression=condition)
+    code = e.value.response['Error']['Code']
+    assert code == 'ConditionalCheckFailedException'
+
+
+def test_item_size_limit(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    item = {'Id': {'N': '1'}, 'Blob': {'B': b'x' * memory.MAX_ITEM_SIZE}}
+    with pytest.raises(ClientError) as e:
+        mclient.put_item(TableName='Test1', Item=item)
+    assert e.value.response['Error']['Code'] == 'ValidationException'
+
+
+def test_update_item(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    key = {'Id': {'N': '7'}}
+    resp = mclient.update_item(
+        TableName='Test1', Key=key,
+        UpdateExpression=('SET Title = :t, Tags = :tags, Views = '
+                          'if_not_exists(Views, :zero) + :one, '
+                          'Doc = :doc'),
+        ExpressionAttributeValues={
+            ':t': {'S': 'title'}, ':tags': {'SS': ['a', 'b']},
+            ':zero': {'N': '0'}, ':one': {'N': '1'},
+            ':doc': {'M': {'list': {'L': [{'N': '1'}]}}},
+        },
+        ReturnValues='ALL_NEW',
+    )
+    assert resp['Attributes']['Views'] == {'N': '1'}
+
+    resp = mclient.update_item(
+        TableName='Test1', Key=key,
+        UpdateExpression=('SET Doc.#l = list_append(Doc.#l, :more) '
+                          'ADD Views :one, Tags :add '
+                          'DELETE Tags :del REMOVE Title'),
+        ExpressionAttributeNames={'#l': 'list'},
+        ExpressionAttributeValues={
+            ':more': {'L': [{'N': '2'}]}, ':one': {'N': '1'},
+            ':add': {'SS': ['c']}, ':del': {'SS': ['a']},
+        },
+        ReturnValues='UPDATED_NEW',
+    )
+    attrs = resp['Attributes']
+    assert set(attrs) == {'Doc', 'Views', 'Tags'}
+    assert attrs['Views'] == {'N': '2'}
+    assert sorted(attrs['Tags']['SS']) == ['b', 'c']
+    assert attrs['Doc'] == {'M': {'list': {'L': [{'N': '1'}, {'N': '2'}]}}}
+
+    item = mclient.get_item(TableName='Test1', Key=key)['Item']
+    assert 'Title' not in item
+
+
+def test_update_item_key_attribute(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    with pytest.raises(ClientError) as e:
+        mclient.update_item(TableName='Test1', Key={'Id': {'N': '1'}},
+                            UpdateExpression='SET Id = :v',
+                            ExpressionAttributeValues={':v': {'N': '2'}})
+    assert e.value.response['Error']['Code'] == 'ValidationException'
+
+
+def test_query_range_conditions(reply):
+    values = {':id': {'S': 'Amazon DynamoDB#DynamoDB Thread 1'}}
+    resp = reply.query(TableName='Reply', KeyConditionExpression='Id = :id',
+                       ExpressionAttributeValues=values)
+    dates = reply_dates(resp)
+    assert dates == sorted(dates)
+    assert resp['Count'] == 4
+
+    resp = reply.query(TableName='Reply', KeyConditionExpression='Id = :id',
+                       ExpressionAttributeValues=values,
+                       ScanIndexForward=False)
+    assert reply_dates(resp) == sorted(dates, reverse=True)
+
+    resp = reply.query(
+        TableName='Reply',
+        KeyConditionExpression='Id = :id AND ReplyDateTime BETWEEN :a AND :b',
+        ExpressionAttributeValues=dict(values, **{
+            ':a': {'S': '2015-09-20'}, ':b': {'S': '2015-09-30'},
+        }),
+    )
+    assert reply_dates(resp) == dates[1:3]
+
+    resp = reply.query(
+        TableName='Reply',
+        KeyConditionExpression='Id = :id AND begins_with(ReplyDateTime, :p)',
+        FilterExpression='PostedBy <> :b',
+        ExpressionAttributeValues=dict(values, **{
+            ':p': {'S': '2015-09'}, ':b': {'S': 'User B'},
+        }),
+    )
+    assert reply_dates(resp) == [dates[0], dates[2]]
+    assert resp['ScannedCount'] == 3
+
+
+def test_query_pagination(reply):
+    params = dict(
+        TableName='Reply', KeyConditionExpression='Id = :id', Limit=3,
+        ExpressionAttributeValues={
+            ':id': {'S': 'Amazon DynamoDB#DynamoDB Thread 1'},
+        },
+    )
+    first = reply.query(**params)
+    assert len(first['Items']) == 3
+    assert set(first['LastEvaluatedKey']) == {'Id', 'ReplyDateTime'}
+    second = reply.query(ExclusiveStartKey=first['LastEvaluatedKey'],
+                         **params)
+    assert len(second['Items']) == 1
+    assert 'LastEvaluatedKey' not in second
+    assert reply_dates(first) + reply_dates(second) == sorted(
+        reply_dates(first) + reply_dates(second))
+
+
+def test_query_local_secondary_index(reply):
+    resp = reply.query(
+        TableName='Reply', IndexName='PostedByIndex',
+        KeyConditionExpression='Id = :id AND PostedBy = :by',
+        ExpressionAttributeValues={
+            ':id': {'S': 'Amazon DynamoDB#DynamoDB Thread 1'},
+            ':by': {'S': 'User A'},
+        },
+    )
+    assert resp['Count'] == 2
+    for item in resp['Items']:
+        # KEYS_ONLY projection
+        assert set(item) == {'Id', 'ReplyDateTime', 'PostedBy'}
+
+
+def test_query_global_secondary_index(mclient):
+    spec = exp.make_table_spec(
+        'GSITest', id=('Id', AttrType.N), range=('Name', AttrType.S),
+        extra_attrs=[{'AttributeName': 'Group', 'AttributeType': AttrType.S}],
+        global_secondary_indexes=[{
+            'IndexName': 'GroupIndex',
+            'KeySchema': [{'AttributeName': 'Group', 'KeyType': KeyType.HASH}],
+            'Projection': {'ProjectionType': ProjectionType.ALL},
+        }],
+    )
+    exp.create_table(mclient, spec)
+    for i in range(5):
+        item = {'Id': {'N': str(i)}, 'Name': {'S': f'n{i}'}}
+        if i % 2:
+            item['Group'] = {'S': 'odd'}
+        mclient.put_item(TableName='GSITest', Item=item)
+    resp = mclient.query(TableName='GSITest', IndexName='GroupIndex',
+                         KeyConditionExpression='#g = :g',
+                         ExpressionAttributeNames={'#g': 'Group'},
+                         ExpressionAttributeValues={':g': {'S': 'odd'}})
+    assert sorted(item['Id']['N'] for item in resp['Items']) == ['1', '3']
+    resp = mclient.scan(TableName='GSITest', IndexName='GroupIndex')
+    assert resp['Count'] == 2
+
+
+def test_scan_segments(reply):
+    everything = reply.scan(TableName='Reply')
+    assert everything['Count'] == 5
+    segmented = []
+    for segment in range(3):
+        resp = reply.scan(TableName='Reply', Segment=segment,
+                          TotalSegments=3)
+        segmented.extend(resp['Items'])
+    key = lambda item: (item['Id']['S'], item['ReplyDateTime']['S'])  # noqa
+    assert sorted(segmented, key=key) == sorted(everything['Items'], key=key)
+
+    # paging through a scan visits every item once
+    items, start = [], None
+    while True:
+        params = {'ExclusiveStartKey': start} if start else {}
+        resp = reply.scan(TableName='Reply', Limit=2, **params)
+        items.extend(resp['Items'])
+        start = resp.get('LastEvaluatedKey')
+        if not start:
+            break
+    assert items == everything['Items']
+
+
+def test_scan_count(reply):
+    resp = reply.scan(TableName='Reply', Select='COUNT',
+                      FilterExpression='PostedBy IN (:a, :b)',
+                      ExpressionAttributeValues={
+                          ':a': {'S': 'User A'}, ':b': {'S': 'User C'},
+                      })
+    assert resp['Count'] == 4
+    assert 'Items' not in resp
+
+
+def test_batch_write_get(mclient):
+    exp.create_table(mclient, devguide.specs['Forum'])
+    names = [f'Forum {i}' for i in range(10)]
+    mclient.batch_write_item(RequestItems={'Forum': [
+        {'PutRequest': {'Item': {'Name': {'S': name}}}} for name in names
+    ]})
+    mclient.batch_write_item(RequestItems={'Forum': [
+        {'DeleteRequest': {'Key': {'Name': {'S': names[0]}}}},
+    ]})
+    resp = mclient.batch_get_item(RequestItems={'Forum': {
+        'Keys': [{'Name': {'S': name}} for name in names],
+    }})
+    found = sorted(item['Name']['S'] for item in resp['Responses']['Forum'])
+    assert found == names[1:]
+    assert resp['UnprocessedKeys'] == {}
+
+    with pytest.raises(ClientError):
+        mclient.batch_write_item(RequestItems={'Forum': [
+            {'PutRequest': {'Item': {'Name': {'S': str(i)}}}}
+            for i in range(memory.MAX_BATCH_WRITE + 1)
+        ]})
+
+
+def test_consumed_capacity(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    item = {'Id': {'N': '1'}, 'Text': {'S': 'x' * 3000}}
+    resp = mclient.put_item(TableName='Test1', Item=item,
+                            ReturnConsumedCapacity='TOTAL')
+    assert resp['ConsumedCapacity'] == {'TableName': 'Test1',
+                                        'CapacityUnits': 3}
+    resp = mclient.get_item(TableName='Test1', Key={'Id': {'N': '1'}},
+                            ConsistentRead=True,
+                            ReturnConsumedCapacity='TOTAL')
+    assert resp['ConsumedCapacity']['CapacityUnits'] == 1
+
+
+def test_unused_placeholder(mclient):
+    exp.create_table(mclient, devguide.specs['Test1'])
+    with pytest.raises(ClientError) as e:
+        mclient.get_item(TableName='Test1', Key={'Id': {'N': '1'}},
+                         ProjectionExpression='Id',
+                         ExpressionAttributeNames={'#unused': 'Foo'})
+    assert 'unused expression placeholders' in str(e.value)
+
+
+def test_stream_shard_iterators(mclient):
+    spec = exp.make_table_spec('Streamed', stream_specification=(
+        True, StreamViewType.KEYS_ONLY))
+    exp.create_table(mclient, spec)
+    arn = mclient.describe_table(TableName='Streamed')['Table'][
+        'LatestStreamArn']
+    streams = memory.MemoryStreamsClient(mclient.database)
+    assert streams.list_streams(TableName='Streamed')['Streams'][0][
+        'StreamArn'] == arn
+    shards = streams.describe_stream(StreamArn=arn, Limit=2)[
+        'StreamDescription']
+    assert len(shards['Shards']) == 2
+    assert 'LastEvaluatedShardId' in shards
+
+    for i in range(3):
+        mclient.put_item(TableName='Streamed', Item={'id': {'N': '1'},
+                                                     'n': {'N': str(i)}})
+    shard_id = next(
+        shard['ShardId']
+        for shard in streams.describe_stream(StreamArn=arn)[
+            'StreamDescription']['Shards']
+        if streams.get_records(ShardIterator=streams.get_shard_iterator(
+            StreamArn=arn, ShardId=shard['ShardId'],
+            ShardIteratorType='TRIM_HORIZON')['ShardIterator'])['Records']
+    )
+
+    def records(iterator_type, sequence_number=None):
+        params = dict(StreamArn=arn, ShardId=shard_id,
+                      ShardIteratorType=iterator_type)
+        if sequence_number is not None:
+            params['SequenceNumber'] = sequence_number
+        iterator = streams.get_shard_iterator(**params)['ShardIterator']
+        return streams.get_records(ShardIterator=iterator)['Records']
+
+    everything = records('TRIM_HORIZON')
+    assert [r['eventName'] for r in everything] == ['INSERT', 'MODIFY',
+                                                    'MODIFY']
+    assert 'NewImage' not in everything[0]['dynamodb']
+    second = everything[1]['dynamodb']['SequenceNumber']
+    assert records('AT_SEQUENCE_NUMBER', second) == everything[1:]
+    assert records('AFTER_SEQUENCE_NUMBER', second) == everything[2:]
+    assert records('LATEST') == []
+
+    with pytest.raises(ClientError) as e:
+        streams.describe_stream(StreamArn=arn + 'x')
+    assert e.value.response['Error']['Code'] == 'ResourceNotFoundException'
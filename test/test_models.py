@@ -1,4 +1,6 @@
+import concurrent.futures
 import gc
+import pickle
 from unittest.mock import patch
 import weakref
 
@@ -10,47 +12,53 @@ import pydynasync.attributes as A
 from test import StringTest, IntegerTest, Person
 
 
+class Album(M.Model):
+    id = A.Integer(hash_key=True)
+    title = A.String(nullable=True)
+    tags = A.StringSet(nullable=True)
+    extra = A.Map(nullable=True)
+    note = A.CompressedString(nullable=True, threshold=16)
+
+
+def title_lengths(payload):
+    albums = M.load_many(payload)
+    for album in albums:
+        album.title = str(len(album.title))
+    return M.dump_many(albums)
+
+
 def test_changes_none(person1):
     p = person1.person
-    changes = M.Changes()
-    assert changes.get(p) == {}
+    assert M.ModelMeta.get_changed(p) == {}
+    assert M.ModelMeta.get_changed_mask(p) == 0
 
 
 def test_changes_update_hash_key(person1):
     p = person1.person
-    changes = M.Changes()
-    assert not changes.get(p)
+    assert not M.ModelMeta.get_changed(p)
 
     new_value = 2345
     assert p.id != new_value
     p.id = new_value
-    changes.set(p, person1.members.index('id'))
-    assert changes.get(p) == {'id': new_value}
+    assert M.ModelMeta.get_changed(p) == {'id': new_value}
+    assert M.ModelMeta.get_changed_mask(p) == 1 << person1.members.index('id')
 
 
 def test_changes_update(person1):
     p = person1.person
-    changes = M.Changes()
-    assert not changes.get(p)
+    assert not M.ModelMeta.get_changed(p)
 
     new_name = p.name_ + 'X'
     p.name_ = new_name
-    changes.set(p, person1.members.index('name_'))
-    assert changes.get(p) == {'name_': new_name}
+    assert M.ModelMeta.get_changed(p) == {'name_': new_name}
 
     new_nickname = (p.nickname or '') + 'X'
     p.nickname = new_nickname
-    changes.set(p, person1.members.index('nickname'))
-    assert changes.get(p) == {
+    assert M.ModelMeta.get_changed(p) == {
         'name_': new_name,
         'nickname': new_nickname,
     }
 
-    changes.unset(p, person1.members.index('nickname'))
-    assert changes.get(p) == {
-        'name_': new_name,
-    }
-
 
 def test_clear_changed(person1):
     p = person1.person
@@ -327,3 +335,210 @@ def test_model_more_than_one_range_key():
 
     assert str(e.value) == ("model class 'MyModel' defines more "
                             "than one range_key attribute")
+
+
+def test_to_item_from_item(person1):
+    p = person1.person
+    item = p.to_item()
+    assert item == {
+        'id': {'N': '1234'},
+        'name_': {'S': 'Job Bluth'},
+        'age': {'N': '35'},
+    }
+    loaded = Person.from_item(dict(item, ignored={'S': 'x'}))
+    assert loaded == p
+    assert loaded.nickname is None
+    assert M.ModelMeta.get_changed(loaded) == {}
+    loaded.age = 36
+    assert M.ModelMeta.get_changed(loaded) == {'age': 36}
+
+
+def test_make_key(person1):
+    assert Person.make_key(1) == {'id': {'N': '1'}}
+    assert person1.person.key_item() == {'id': {'N': '1234'}}
+    with pytest.raises(TypeError):
+        Person.make_key(1, 'range')
+
+
+def test_set_saved(person1):
+    p = person1.person
+    p.age = 40
+    M.ModelMeta.set_saved(p)
+    assert M.ModelMeta.get_changed(p) == {}
+    p.age = 35
+    assert M.ModelMeta.get_changed(p) == {'age': 35}
+
+
+def test_instance_state(person1):
+    p = person1.person
+    assert not hasattr(M.ModelMeta, '_changes')
+    assert not isinstance(Person.age.values, weakref.WeakKeyDictionary)
+    state = A.get_state(p)
+    assert state is p._state
+    assert state.values[person1.members.index('age')] == 35
+    p.age = 36
+    assert state.changed == 1 << person1.members.index('age')
+
+    # an instance made without calling __init__ gets its state when needed
+    q = Person.__new__(Person)
+    assert q.age is None
+    q.age = 1
+    assert M.ModelMeta.get_changed(q) == {'age': 1}
+    assert A.get_state(q) is not state
+
+
+def test_instances_in_threads():
+    n, count = 8, 500
+
+    def work(start):
+        people = [Person(id=start + i, name_='x', age=0)
+                  for i in range(count)]
+        for person in people:
+            M.ModelMeta.set_saved(person)
+            person.age += 1
+            person.name_ += 'y'
+        return people
+
+    with concurrent.futures.ThreadPoolExecutor(n) as executor:
+        results = list(executor.map(work, range(0, n * count, count)))
+    for start, people in zip(range(0, n * count, count), results):
+        for i, person in enumerate(people):
+            assert person.id == start + i
+            assert M.ModelMeta.get_changed(person) == {
+                'name_': 'xy', 'age': 1}
+
+
+def test_invalid_overflow_option():
+    with pytest.raises(TypeError):
+        class NoRangeKey(M.Model, overflow=True):
+            id = A.Integer(hash_key=True)
+
+    with pytest.raises(ValueError):
+        class TooSmall(M.Model, overflow=100):
+            id = A.Integer(hash_key=True)
+            posted = A.String(range_key=True)
+
+
+def load_album():
+    album = Album.from_item(Album(
+        id=1, title='first', tags={'a', 'b'}, extra={'n': 1},
+        note='x' * 100).to_item())
+    assert isinstance(Album.note.values[album], A.Compressed)
+    return album
+
+
+def test_pickle():
+    album = load_album()
+    album.title = 'second'
+    copied = pickle.loads(pickle.dumps(album))
+    # still compressed, and its tracked containers belong to the copy
+    assert isinstance(Album.note.values[copied], A.Compressed)
+    assert copied == album
+    assert M.ModelMeta.get_changed(copied) == {'title': 'second'}
+    assert Album.title.original[copied] == 'first'
+    copied.tags.add('c')
+    assert copied.tags.delta() == ({'c'}, set())
+    assert album.tags == {'a', 'b'}
+    assert set(M.ModelMeta.get_changed(copied)) == {'title', 'tags'}
+    assert M.ModelMeta.get_changed(album) == {'title': 'second'}
+
+    # changes made to a container before pickling are written whole
+    copied = pickle.loads(pickle.dumps(copied))
+    assert copied.tags.delta() is None
+    M.ModelMeta.set_saved(copied)
+    assert copied.tags.delta() == (set(), set())
+
+    person = Person(id=1, name_='x')
+    del person.nickname
+    copied = pickle.loads(pickle.dumps(person))
+    assert copied == person
+    assert M.ModelMeta.get_changed(copied) == {'id': 1, 'name_': 'x'}
+    assert copied not in Person.age.values
+
+    with pytest.raises(TypeError):
+        pickle.dumps(A.String())
+
+
+def test_dump_many_load_many():
+    albums = [load_album() for _ in range(3)]
+    albums[1].title = 'changed'
+    albums[2].extra = None
+    payload = M.dump_many(albums)
+    loaded = M.load_many(pickle.loads(pickle.dumps(payload)))
+    assert loaded == albums
+    assert [M.ModelMeta.get_changed(a) for a in loaded] == [
+        {}, {'title': 'changed'}, {'extra': None}]
+    assert Album.title.original[loaded[1]] == 'first'
+
+    people = [Person.from_item(Person(id=i, name_='x', age=i).to_item())
+              for i in range(100)]
+    payload = pickle.dumps(M.dump_many(people))
+    assert len(payload) < len(pickle.dumps(people))
+    assert M.load_many(pickle.loads(payload)) == people
+
+    assert M.load_many(M.dump_many([])) == []
+    with pytest.raises(TypeError):
+        M.dump_many([albums[0], Person(id=1)])
+
+
+def test_process_pool():
+    albums = [load_album() for _ in range(4)]
+    with concurrent.futures.ProcessPoolExecutor(1) as executor:
+        results = M.load_many(
+            executor.submit(title_lengths, M.dump_many(albums)).result())
+    assert [album.title for album in results] == ['5'] * 4
+    assert all(M.ModelMeta.get_changed(album) == {'title': '5'}
+               for album in results)
+
+
+def test_generated_init():
+    assert Album.__init__ is not M.Model.__init__
+    assert Album.__init__.__qualname__ == 'Album.__init__'
+    album = Album(id=1, title='first', tags={'a'})
+    assert M.ModelMeta.get_changed(album) == {
+        'id': 1, 'title': 'first', 'tags': {'a'}}
+    loaded = Album(id=1, title='first', _reset=True)
+    assert not M.ModelMeta.get_changed(loaded)
+    with pytest.raises(TypeError) as e:
+        Album(id=1, other=2)
+    assert 'invalid attributes: other' in str(e.value)
+    with pytest.raises(TypeError):
+        Album(id='1')
+
+    class Custom(M.Model):
+        id = A.Integer(hash_key=True)
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.created = True
+
+    assert Custom(id=1).created
+
+
+def test_bulk_create():
+    rows = [(i, f'title {i}', {'a'}, None, None) for i in range(3)]
+    albums = Album.bulk_create(rows)
+    expected = [Album(id=i, title=f'title {i}', tags={'a'}, extra=None,
+                      note=None) for i in range(3)]
+    assert albums == expected
+    assert ([M.ModelMeta.get_changed(a) for a in albums] ==
+            [M.ModelMeta.get_changed(a) for a in expected])
+    # containers are tracked
+    albums[0].tags.add('b')
+    assert albums[0].tags == {'a', 'b'}
+
+    albums = Album.bulk_create([('t', 1), ('u', 2)], columns=['title', 'id'])
+    assert [(a.id, a.title, a.tags) for a in albums] == [
+        (1, 't', None), (2, 'u', None)]
+    assert M.ModelMeta.get_changed(albums[0]) == {'id': 1, 'title': 't'}
+
+    albums = Album.bulk_create([{'id': 1}, {'id': 2, 'note': 'x' * 20}])
+    assert albums[1].note == 'x' * 20
+    assert M.ModelMeta.get_changed(albums[0]) == {'id': 1}
+
+    with pytest.raises(TypeError):
+        Album.bulk_create([{'id': 1, 'other': 2}])
+    with pytest.raises(TypeError):
+        Album.bulk_create([('1', None, None, None, None)])
+    with pytest.raises(ValueError):
+        Album.bulk_create([(1, 'short')])
@@ -0,0 +1,136 @@
+import pytest
+
+from pydynasync import attributes as A, ddb, models as M, overflow, provision
+from pydynasync.table import Table
+
+
+class Document(M.Model, overflow=True):
+
+    folder = A.String(hash_key=True)
+    filename = A.String(range_key=True)
+    content = A.Binary(nullable=True)
+    body = A.String(nullable=True)
+    paragraphs = A.List(nullable=True)
+    extra = A.Map(nullable=True)
+
+
+@pytest.fixture
+def documents(client, table_prefix):
+    table = Table(Document, client, name=table_prefix + 'OverflowDocument')
+    provision.create_table(client, table.spec())
+    yield table
+    provision.delete_table(client, table.name)
+
+
+def raw_items(table):
+    return table.client.scan(TableName=table.name)['Items']
+
+
+def test_split_string_keeps_characters():
+    text = 'aé€\U0001f600' * 1000
+    pieces = overflow.split_value({'S': text}, 1001)
+    assert all(len(p['S'].encode('utf-8')) <= 1001 for p in pieces)
+    assert ''.join(p['S'] for p in pieces) == text
+
+
+def test_split_binary():
+    data = bytes(range(256)) * 10
+    pieces = overflow.split_value({'B': data}, 1000)
+    assert [len(p['B']) for p in pieces] == [1000, 1000, 560]
+    assert b''.join(p['B'] for p in pieces) == data
+
+
+def test_split_list():
+    elems = [{'S': 'x' * 100}] * 25
+    pieces = overflow.split_value({'L': elems}, 1000)
+    assert all(ddb.value_size(p) <= 1000 for p in pieces)
+    assert [e for p in pieces for e in p['L']] == elems
+    with pytest.raises(ValueError):
+        overflow.split_value({'L': [{'S': 'x' * 2000}]}, 1000)
+
+
+def test_small_item_not_split(documents):
+    doc = Document(folder='f', filename='small.txt', body='hello')
+    documents.put(doc)
+    items = raw_items(documents)
+    assert len(items) == 1
+    assert overflow.MANIFEST not in items[0]
+    assert documents.get('f', 'small.txt') == doc
+
+
+def test_large_values_round_trip(documents):
+    content = bytes(range(256)) * 4096             # 1MB
+    body = 'été ' * 100000                # 600KB of UTF-8
+    paragraphs = [f'line {i} ' * 10 for i in range(10000)]
+    doc = Document(folder='f', filename='big.bin', content=content, body=body,
+                   paragraphs=paragraphs)
+    documents.put(doc)
+
+    items = raw_items(documents)
+    chunks = [item for item in items if overflow.is_chunk(item)]
+    assert len(chunks) > 3
+    assert all(ddb.item_size(item) <= ddb.MAX_ITEM_SIZE for item in items)
+
+    loaded = documents.get('f', 'big.bin')
+    assert loaded.content == content
+    assert loaded.body == body
+    assert loaded.paragraphs == paragraphs
+    assert [d.filename for d in documents.query('f')] == ['big.bin']
+    assert [d.body for d in documents.scan()] == [body]
+
+
+def test_overwrite_and_delete_remove_chunks(documents):
+    documents.put(Document(folder='f', filename='a', content=b'x' * 1000000))
+    documents.put(Document(folder='f', filename='b', body='neighbour'))
+    first = len(raw_items(documents))
+
+    documents.put(Document(folder='f', filename='a', content=b'y' * 500000))
+    assert len(raw_items(documents)) < first
+    assert documents.get('f', 'a').content == b'y' * 500000
+
+    documents.put(Document(folder='f', filename='a', body='small'))
+    assert len(raw_items(documents)) == 2
+
+    documents.put(Document(folder='f', filename='a', content=b'z' * 1000000))
+    documents.delete(documents.get('f', 'a'))
+    assert [item['filename'] for item in raw_items(documents)] == [{'S': 'b'}]
+
+
+def test_missing_chunk(documents):
+    documents.put(Document(folder='f', filename='a', content=b'x' * 1000000))
+    chunk = next(item for item in raw_items(documents)
+                 if overflow.is_chunk(item))
+    documents.client.delete_item(
+        TableName=documents.name,
+        Key={'folder': chunk['folder'], 'filename': chunk['filename']})
+    with pytest.raises(overflow.ChunkError):
+        documents.get('f', 'a')
+
+
+def test_too_large_to_overflow(documents):
+    extra = {'notes': 'x' * ddb.MAX_ITEM_SIZE}
+    with pytest.raises(ValueError):
+        documents.put(Document(folder='f', filename='a', extra=extra))
+
+
+def test_projection(documents):
+    content = b'x' * 1000000
+    documents.put(Document(folder='f', filename='a', content=content,
+                           body='small'))
+    loaded = documents.get('f', 'a', attributes=['content'])
+    assert (loaded.content, loaded.body) == (content, None)
+
+
+def test_projected_query_and_scan(documents):
+    content = b'x' * 1000000
+    documents.put(Document(folder='f', filename='a', content=content,
+                           body='small'))
+    documents.put(Document(folder='f', filename='b', body='other'))
+    loaded = list(documents.query('f', attributes=['content']))
+    assert [(d.filename, d.content, d.body) for d in loaded] == [
+        ('a', content, None), ('b', None, None)]
+    loaded = sorted(documents.scan(attributes=['filename', 'body']),
+                    key=lambda d: d.filename)
+    # no chunk items are loaded as instances
+    assert [(d.filename, d.body) for d in loaded] == [
+        ('a', 'small'), ('b', 'other')]
@@ -0,0 +1,84 @@
+import pytest
+
+from pydynasync import exp, provision
+
+
+def test_create_delete_tables(client):
+    names = ['ProvisionTest1', 'ProvisionTest2', 'ProvisionTest3']
+    specs = [exp.make_table_spec(name) for name in names]
+
+    timings = provision.create_tables(client, specs, delay=0.01, timeout=30)
+    try:
+        assert sorted(timings) == names
+        for name, timing in timings.items():
+            assert timing.name == name
+            assert timing.status == provision.ACTIVE
+            assert timing.elapsed >= 0
+            assert timing.polls >= 1
+            assert provision.table_status(client, name) == provision.ACTIVE
+    finally:
+        timings = provision.delete_tables(client, names, delay=0.01,
+                                          timeout=30)
+
+    assert sorted(timings) == names
+    for name in names:
+        assert timings[name].status == provision.DELETED
+        assert provision.table_status(client, name) is None
+
+
+def test_delete_missing_table(client):
+    timing = provision.delete_table(client, 'ProvisionMissing')
+    assert timing.status == provision.DELETED
+    assert timing.polls == 0
+
+
+def test_wait_for_status_timeout(client):
+    with pytest.raises(TimeoutError) as e:
+        provision.wait_for_status(client, 'ProvisionMissing', delay=0.01,
+                                  timeout=0.05)
+    assert str(e.value).startswith("table 'ProvisionMissing' did not reach "
+                                   "status ACTIVE within")
+
+
+def test_create_table_wait(client):
+    spec = exp.make_table_spec('ProvisionWaitTest')
+    resp = exp.create_table(client, spec, wait=True, delay=0.01)
+    try:
+        assert resp['TableName'] == 'ProvisionWaitTest'
+        assert provision.table_status(client, spec.TableName) == 'ACTIVE'
+    finally:
+        provision.delete_table(client, spec.TableName)
+
+
+def test_truncate_table(client, reply_table):
+    name = reply_table['TableName']
+    provision.batch_write(client, name, (
+        {'PutRequest': {'Item': {
+            'Id': {'S': f'Thread {i % 7}'},
+            'ReplyDateTime': {'S': f'2015-09-{i:02}'},
+            'PostedBy': {'S': 'User A'},
+        }}} for i in range(60)
+    ))
+    assert client.scan(TableName=name, Select='COUNT')['Count'] == 60
+
+    assert provision.truncate_table(client, name, segments=3) == 60
+    assert client.scan(TableName=name, Select='COUNT')['Count'] == 0
+
+
+def test_table_pool(client):
+    specs = [exp.make_table_spec('PoolTest')]
+    pool = provision.TablePool(client, specs, prefix='gw9-')
+    try:
+        description = pool.acquire(specs[0])
+        name = description['TableName']
+        assert name == 'gw9-PoolTest'
+        assert pool.table_name('PoolTest') == name
+        client.put_item(TableName=name, Item={'id': {'N': '1'}})
+
+        assert pool.acquire(specs[0]) is description
+        assert client.scan(TableName=name)['Count'] == 0
+        # the spec given to the pool is not renamed
+        assert specs[0].TableName == 'PoolTest'
+    finally:
+        pool.close()
+    assert provision.table_status(client, 'gw9-PoolTest') is None
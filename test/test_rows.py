@@ -0,0 +1,95 @@
+import pickle
+
+import pytest
+
+from pydynasync import attributes as A, memory, models as M, provision, rows
+from pydynasync.table import Table
+
+
+class Post(M.Model):
+    folder = A.String(hash_key=True)
+    posted = A.Integer(range_key=True)
+    subject = A.String(nullable=True)
+    tags = A.StringSet(nullable=True)
+    extra = A.Map(nullable=True)
+    note = A.CompressedString(nullable=True, threshold=16)
+
+
+class Event(M.Model, shards=2, shard_mode='random'):
+    device = A.String(hash_key=True)
+    subject = A.String(range_key=True)
+
+
+@pytest.fixture
+def posts():
+    client = memory.MemoryClient()
+    table = Table(Post, client)
+    provision.create_table(client, table.spec())
+    for i in range(3):
+        table.put(Post(folder='f', posted=i, subject=f's{i}', tags={'a'},
+                       extra={'list': [1, {'x': 2}]}, note='n' * 20))
+    table.put(Post(folder='g', posted=0))
+    return table
+
+
+def test_row_class():
+    cls = rows.row_class(Post)
+    assert rows.row_class(Post) is cls
+    assert cls.__name__ == 'PostRow'
+    assert cls._fields == ('folder', 'posted', 'subject', 'tags', 'extra',
+                           'note')
+    row = cls.from_item(Post(folder='f', posted=1).to_item())
+    assert tuple(row) == ('f', 1, None, None, None, None)
+    assert not hasattr(row, '__dict__')
+    with pytest.raises(AttributeError):
+        row.subject = 'x'
+    assert repr(row) == ("PostRow(folder='f', posted=1, subject=None, "
+                         "tags=None, extra=None, note=None)")
+
+
+def test_query_rows(posts):
+    loaded = list(posts.query('f', read_only=True))
+    assert [row.posted for row in loaded] == [0, 1, 2]
+    row = loaded[1]
+    assert isinstance(row, rows.Row)
+    assert row._asdict() == {
+        'folder': 'f', 'posted': 1, 'subject': 's1', 'tags': {'a'},
+        'extra': {'list': (1, {'x': 2})}, 'note': 'n' * 20,
+    }
+    assert isinstance(row.tags, frozenset)
+    assert isinstance(row.extra, rows.FrozenMap)
+    assert isinstance(row.extra['list'][1], rows.FrozenMap)
+    with pytest.raises(TypeError):
+        row.extra['other'] = 1
+
+    # rows of the same item are equal
+    again = next(posts.query('f', '=', 1, read_only=True))
+    assert again == row
+    # rows with maps, also nested in lists, are hashed by value
+    assert hash(again) == hash(row)
+    assert len({row, again}) == 1
+    assert pickle.loads(pickle.dumps(row)) == row
+    assert len(list(posts.scan(read_only=True))) == 4
+    assert list(posts.scan(read_only=True, attributes=['folder'])
+                )[0].subject is None
+
+
+def test_to_model(posts):
+    row = next(posts.query('f', read_only=True))
+    post = row.to_model()
+    assert post == posts.get('f', 0)
+    assert not M.ModelMeta.get_changed(post)
+    post.tags.add('b')
+    post.extra['other'] = 3
+    assert M.ModelMeta.get_changed(post) == {
+        'tags': {'a', 'b'}, 'extra': {'list': [1, {'x': 2}], 'other': 3}}
+    posts.update(post)
+    assert posts.get('f', 0).tags == {'a', 'b'}
+    # the row is unchanged
+    assert row.tags == {'a'}
+
+    row = rows.row_class(Event).from_item({'device': {'S': 'd#2'},
+                                           'subject': {'S': 'e'}})
+    assert row.device == 'd'
+    with pytest.raises(TypeError):
+        row.to_model()
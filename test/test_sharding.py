@@ -0,0 +1,220 @@
+import decimal
+import pickle
+
+import pytest
+
+from pydynasync import attributes as A, buffer, memory, models as M
+from pydynasync import keyfilters, provision, sharding
+from pydynasync.table import Table
+
+
+class Reading(M.Model, shards=4):
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Number(nullable=True)
+
+
+class Event(M.Model, shards=3, shard_mode='random'):
+    device = A.String(hash_key=True)
+    subject = A.String(range_key=True)
+    payload = A.String(nullable=True)
+
+
+class Path(M.Model, shards=3):
+    root = A.String(hash_key=True)
+    parts = A.CompositeKey(2, range_key=True)
+    bytes_ = A.Integer(nullable=True)
+
+
+class Quote(M.Model, shards=4):
+    symbol = A.String(hash_key=True)
+    price = A.Decimal(range_key=True)
+    note = A.String(nullable=True)
+
+
+class PagingClient:
+
+    """
+    A MemoryClient whose queries return pages of at most two items.
+    """
+
+    def __init__(self):
+        self.client = memory.MemoryClient()
+        self.queries = 0
+
+    def query(self, **params):
+        self.queries += 1
+        return self.client.query(Limit=2, **params)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def readings():
+    client = PagingClient()
+    table = Table(Reading, client)
+    provision.create_table(client, table.spec())
+    for i in range(20):
+        table.put(Reading(sensor='s1', taken=i, celsius=i / 2))
+    table.put(Reading(sensor='s2', taken=0))
+    return table
+
+
+@pytest.fixture
+def events():
+    client = memory.MemoryClient()
+    table = Table(Event, client)
+    provision.create_table(client, table.spec())
+    return table
+
+
+def raw_items(table):
+    return table.client.scan(TableName=table.name)['Items']
+
+
+def test_stored_keys_are_suffixed(readings):
+    hash_values = {item['sensor']['S'] for item in raw_items(readings)}
+    assert hash_values == {'s1#1', 's1#2', 's1#3', 's1#4',
+                           f"s2#{Reading._sharding.shard_of('0')}"}
+    reading = readings.get('s1', 7)
+    assert reading.sensor == 's1'
+    assert reading.celsius == 3.5
+    # an item's shard is derived from its range key
+    shard = Reading._sharding.shard_of('7')
+    assert Reading.make_key('s1', 7) == {
+        'sensor': {'S': f's1#{shard}'}, 'taken': {'N': '7'}}
+    assert reading.key_item() == Reading.make_key('s1', 7)
+    assert Reading.make_key('s1', 7, shard=2)['sensor'] == {'S': 's1#2'}
+    assert Reading.from_item(reading.to_item()) == reading
+
+
+def test_query_merges_shards(readings):
+    assert [r.taken for r in readings.query('s1')] == list(range(20))
+    assert [r.taken for r in readings.query('s1', forward=False)] == list(
+        range(19, -1, -1))
+    assert [r.taken for r in readings.query('s2')] == [0]
+    assert list(readings.query('s3')) == []
+
+    readings.client.queries = 0
+    assert [r.taken for r in readings.query('s1', attributes=['taken'])
+            ] == list(range(20))
+    # each shard holds about 5 items, in pages of 2
+    assert readings.client.queries > 4
+
+
+def test_query_merges_in_stored_order():
+    client = memory.MemoryClient()
+    paths = Table(Path, client)
+    provision.create_table(client, paths.spec())
+    parts = [('a', 'z'), ('a b', 'c'), ('a', 'b'), ('b', 'a'), ('a!', 'x')]
+    for i, value in enumerate(parts):
+        paths.put(Path(root='r', parts=value, bytes_=i))
+    stored = sorted('#'.join(value) for value in parts)
+    # the joined strings' order, not the tuples'
+    assert ['#'.join(p.parts) for p in paths.query('r')] == stored
+    assert ['#'.join(p.parts) for p in paths.query('r', forward=False)
+            ] == stored[::-1]
+    projected = paths.query('r', attributes=['bytes_'], read_only=True)
+    assert [p.bytes_ for p in projected] == [
+        parts.index(tuple(value.split('#'))) for value in stored]
+
+
+def test_update_and_delete(readings):
+    reading = readings.get('s1', 3)
+    reading.celsius = 30
+    readings.update(reading)
+    assert readings.get('s1', 3).celsius == 30
+    readings.delete(reading)
+    assert readings.get('s1', 3) is None
+    assert len(raw_items(readings)) == 20
+
+    with buffer.WriteBuffer(readings) as writes:
+        writes.put(Reading(sensor='s9', taken=1, celsius=1))
+    assert readings.get('s9', 1).celsius == 1
+
+
+def test_random_shards(events):
+    events.negative_cache = keyfilters.NegativeCache(60)
+    for i in range(30):
+        events.put(Event(device='d', subject=f'e{i:02}', payload=str(i)))
+    shards = {int(item['device']['S'].rpartition('#')[2])
+              for item in raw_items(events)}
+    assert shards == {1, 2, 3}
+
+    event = events.get('d', 'e05')
+    assert event.payload == '5'
+    # a loaded instance is written back to its own shard
+    event.payload = 'five'
+    events.put(event)
+    assert len(raw_items(events)) == 30
+    assert pickle.loads(pickle.dumps(event)).key_item() == event.key_item()
+    assert events.get('d', 'e05').payload == 'five'
+
+    events.negative_cache.clear()
+    assert events.get('d', 'missing') is None
+    assert len(events.negative_cache) == 3
+    assert [e.subject for e in events.query('d')] == [
+        f'e{i:02}' for i in range(30)]
+
+    async def get():
+        return await events.get_async('d', 'e07')
+
+    import asyncio
+    assert asyncio.run(get()).payload == '7'
+
+    with pytest.raises(TypeError):
+        Event.make_key('d', 'e05')
+
+
+def test_configure_errors():
+    with pytest.raises(ValueError):
+        class TooFew(M.Model, shards=1):
+            sensor = A.String(hash_key=True)
+            taken = A.Integer(range_key=True)
+    with pytest.raises(ValueError):
+        class BadMode(M.Model, shards=2, shard_mode='round'):
+            sensor = A.String(hash_key=True)
+            taken = A.Integer(range_key=True)
+    with pytest.raises(TypeError):
+        class ModeOnly(M.Model, shard_mode='hash'):
+            sensor = A.String(hash_key=True)
+            taken = A.Integer(range_key=True)
+    with pytest.raises(TypeError):
+        class NoRange(M.Model, shards=2):
+            sensor = A.String(hash_key=True)
+    with pytest.raises(TypeError):
+        class NumberHash(M.Model, shards=2):
+            sensor = A.Integer(hash_key=True)
+            taken = A.Integer(range_key=True)
+
+    class Plain(M.Model):
+        sensor = A.String(hash_key=True)
+        taken = A.Integer(range_key=True)
+
+    assert Plain._sharding is None
+    with pytest.raises(TypeError):
+        Plain.make_key('x', 1, shard=1)
+
+
+def test_equal_numbers_share_a_shard():
+    shards = sharding.Sharding(1000, 'hash')
+    assert len({shards.shard_of(data, 'N')
+                for data in ('1.5', '1.50', '15E-1', '1.500')}) == 1
+    assert shards.shard_of('100', 'N') == shards.shard_of('1E+2', 'N')
+
+    client = memory.MemoryClient()
+    quotes = Table(Quote, client)
+    provision.create_table(client, quotes.spec())
+    quotes.put(Quote(symbol='q', price=decimal.Decimal('1.50'), note='a'))
+    quotes.put(Quote(symbol='q', price=decimal.Decimal('1.5'), note='b'))
+    assert len(raw_items(quotes)) == 1
+    assert quotes.get('q', decimal.Decimal('1.500')).note == 'b'
+
+
+def test_split():
+    shards = sharding.Sharding(4, 'hash')
+    assert shards.split('a#b#3') == ('a#b', 3)
+    assert shards.split('plain') == ('plain', None)
+    assert shards.split('a#b') == ('a#b', None)
+    assert all(1 <= shards.shard_of(str(i)) <= 4 for i in range(100))
@@ -0,0 +1,138 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from pydynasync import attributes as A, memory, models as M, provision
+from pydynasync import singleflight, table as T
+from pydynasync.table import Table
+
+
+class Device(M.Model):
+    device = A.String(hash_key=True)
+    note = A.String(nullable=True)
+
+
+class GatedClient:
+
+    """
+    A MemoryClient whose get_item calls wait for the gate to open.
+    """
+
+    def __init__(self):
+        self.client = memory.MemoryClient()
+        self.gate = threading.Event()
+        self.gets = 0
+
+    def get_item(self, **params):
+        self.gets += 1
+        self.gate.wait(5)
+        return self.client.get_item(**params)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("timed out")
+
+
+@pytest.fixture
+def devices():
+    client = GatedClient()
+    table = Table(Device, client, coalesce=True)
+    provision.create_table(client, table.spec())
+    table.put(Device(device='d1', note='hot'))
+    return table
+
+
+def test_group_threads():
+    group = singleflight.Group()
+    gate = threading.Event()
+    calls = []
+
+    def call(value):
+        calls.append(value)
+        gate.wait(5)
+        return value * 2
+
+    with concurrent.futures.ThreadPoolExecutor(8) as executor:
+        futures = [executor.submit(group.do, 'k', call, 21)
+                   for _ in range(8)]
+        wait_for(lambda: group.stats.coalesced == 7)
+        gate.set()
+        assert [f.result() for f in futures] == [42] * 8
+    assert calls == [21]
+    assert len(group) == 0
+
+    # a call after the last one finished is made again
+    assert group.do('k', call, 1) == 2
+    assert group.stats == singleflight.GroupStats(calls=2, coalesced=7)
+
+
+def test_group_exception():
+    group = singleflight.Group()
+    gate = threading.Event()
+
+    def fail():
+        gate.wait(5)
+        raise KeyError('x')
+
+    with concurrent.futures.ThreadPoolExecutor(3) as executor:
+        futures = [executor.submit(group.do, 'k', fail) for _ in range(3)]
+        wait_for(lambda: group.stats.coalesced == 2)
+        gate.set()
+        for future in futures:
+            with pytest.raises(KeyError):
+                future.result()
+    assert len(group) == 0
+
+
+def test_get_coalesced(devices):
+    client = devices.client
+    coalesced = T._gets.stats.coalesced
+    with concurrent.futures.ThreadPoolExecutor(11) as executor:
+        futures = [executor.submit(devices.get, 'd1') for _ in range(10)]
+        # a get with other options isn't coalesced with them
+        futures.append(executor.submit(devices.get, 'd1', consistent=True))
+        wait_for(lambda: T._gets.stats.coalesced == coalesced + 9)
+        client.gate.set()
+        loaded = [f.result() for f in futures]
+    assert client.gets == 2
+    assert all(device == Device(device='d1', note='hot') for device in loaded)
+    # each caller gets its own instance
+    assert len({id(device) for device in loaded}) == len(loaded)
+
+    devices.coalesce = False
+    devices.get('d1')
+    devices.get('d1')
+    assert client.gets == 4
+
+
+def test_get_async_coalesced(devices):
+    client = devices.client
+    coalesced = T._gets.stats.coalesced
+
+    async def main():
+        tasks = [asyncio.ensure_future(devices.get_async('d1'))
+                 for _ in range(5)]
+        tasks.append(asyncio.ensure_future(devices.get_async('missing')))
+        # a thread's get joins the coroutines' call
+        thread = asyncio.get_running_loop().run_in_executor(
+            None, devices.get, 'd1')
+        while T._gets.stats.coalesced < coalesced + 5:
+            await asyncio.sleep(0.01)
+        tasks[0].cancel()
+        client.gate.set()
+        return await asyncio.gather(*tasks[1:], thread)
+
+    results = asyncio.run(main())
+    assert client.gets == 2
+    assert results[:4] == [Device(device='d1', note='hot')] * 4
+    assert results[4] is None
+    assert results[5] == Device(device='d1', note='hot')
@@ -0,0 +1,103 @@
+import decimal
+import json
+
+import pytest
+
+from pydynasync import attributes as A, models as M, snapshot as S
+
+
+class Reading(M.Model):
+    sensor = A.String(hash_key=True)
+    taken = A.Integer(range_key=True)
+    celsius = A.Decimal(nullable=True)
+    flagged = A.Boolean(nullable=True)
+    payload = A.Binary(nullable=True)
+    tags = A.StringSet(nullable=True)
+    sizes = A.NumberSet(nullable=True)
+    extra = A.Map(nullable=True)
+
+
+def readings(count=3):
+    return [
+        Reading(sensor='s1', taken=i, celsius=decimal.Decimal('-1.5') * i,
+                flagged=bool(i % 2), payload=bytes([i]), tags={'a', 'b'},
+                sizes={i, -i - 1, 10 ** 30},
+                extra={'n': None, 'list': [1, 'x', b'y', {'z': True}]})
+        for i in range(count)
+    ] + [Reading(sensor='s2', taken=-2 ** 40)]
+
+
+def test_model_round_trip(tmp_path):
+    values = readings()
+    data = S.dumps(values, model=Reading)
+    assert data.startswith(S.MAGIC + bytes([S.VERSION]))
+    assert S.loads(data, model=Reading) == values
+    assert all(not M.ModelMeta.get_changed(r)
+               for r in S.loads(data, model=Reading))
+
+    path = tmp_path / 'readings.snapshot'
+    with open(path, 'wb') as file:
+        assert S.dump(values, file, model=Reading) == 4
+    with S.Snapshot.open(path, model=Reading) as snapshot:
+        assert snapshot.model_name == 'Reading'
+        assert snapshot.schema == S.schema(Reading)
+        assert len(snapshot) == 4
+        assert next(iter(snapshot)) == values[0]
+        assert list(snapshot) == values
+        # with no model class, records are typed items
+        snapshot.model = None
+        assert list(snapshot) == [r.to_item() for r in values]
+
+
+def test_items_round_trip():
+    items = [
+        {'id': {'S': 'x'}, 'n': {'N': '12.50'}, 'big': {'N': '-1e30'},
+         'i': {'N': '007'}, 'b': {'B': b'\x00'}, 'null': {'NULL': True}},
+        {},
+        {'l': {'L': [{'NS': ['1', '2.5']}, {'BS': [b'a']},
+                     {'M': {'t': {'BOOL': False}}}]}},
+    ]
+    data = S.dumps(items)
+    assert S.loads(data) == items
+    assert len(data) < len(json.dumps(
+        items, default=lambda b: b.decode()).encode()) / 2
+    with S.Snapshot(data) as snapshot:
+        assert snapshot.schema == []
+        assert len(snapshot) == 3
+
+
+def test_schema_mismatch():
+
+    class Other(M.Model):
+        sensor = A.String(hash_key=True)
+        taken = A.String(range_key=True)
+
+    data = S.dumps(readings(), model=Reading)
+    with pytest.raises(ValueError):
+        S.Snapshot(data, model=Other)
+    with pytest.raises(TypeError):
+        S.dumps([Other(sensor='s', taken='t')], model=Reading)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'JSON',
+    S.MAGIC + bytes([S.VERSION + 1]),
+    S.MAGIC + bytes([S.VERSION, 5]),
+])
+def test_invalid_header(data):
+    with pytest.raises(ValueError):
+        S.Snapshot(data)
+
+
+def test_invalid_records():
+    data = S.dumps([{'id': {'S': 'x' * 100}}])
+    with pytest.raises(ValueError):
+        S.loads(data[:-1])
+    with pytest.raises(ValueError):
+        len(S.Snapshot(data[:-1]))
+    with pytest.raises(ValueError):
+        # an invalid value tag
+        S.loads(data[:-102] + bytes([200]) + data[-101:])
+    with pytest.raises(ValueError):
+        S.dumps([{'id': {'X': 'x'}}])
@@ -0,0 +1,224 @@
+import threading
+
+import pytest
+
+from pydynasync import attributes as A, exp, models as M, provision, streams
+from pydynasync.table import Table
+from pydynasync.types import StreamViewType
+
+
+class Account(M.Model):
+
+    owner_id = A.String(hash_key=True)
+    balance = A.Integer()
+
+
+class Attachment(M.Model, overflow=True):
+
+    folder = A.String(hash_key=True)
+    filename = A.String(range_key=True)
+    content = A.Binary(nullable=True)
+
+
+@pytest.fixture
+def accounts(client, table_prefix):
+    table = Table(Account, client, name=table_prefix + 'StreamAccount')
+    spec = table.spec(stream_specification=(
+        True, StreamViewType.NEW_AND_OLD_IMAGES))
+    provision.create_table(client, spec)
+    yield table
+    provision.delete_table(client, table.name)
+
+
+@pytest.fixture
+def arn(accounts):
+    return streams.stream_arn(accounts.client, accounts.name)
+
+
+class Collector:
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            self.batches.append(batch)
+
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+
+def write_accounts(accounts, count=20):
+    for i in range(count):
+        accounts.put(Account(owner_id=f'a{i}', balance=i))
+    for i in range(0, count, 2):
+        account = accounts.get(f'a{i}')
+        account.balance += 100
+        accounts.put(account)
+    accounts.delete(accounts.get('a1'))
+
+
+def test_stream_specification_to_boto():
+    spec = exp.StreamSpecification(True, StreamViewType.NEW_IMAGE)
+    assert spec.to_boto() == {'StreamEnabled': True,
+                              'StreamViewType': 'NEW_IMAGE'}
+
+
+def test_stream_records(accounts, arn, streams_client):
+    assert arn is not None
+    accounts.put(Account(owner_id='a', balance=1))
+    accounts.put(Account(owner_id='a', balance=1))   # unchanged: no record
+    accounts.put(Account(owner_id='a', balance=2))
+    accounts.delete(Account(owner_id='a', balance=2))
+
+    description = streams_client.describe_stream(
+        StreamArn=arn)['StreamDescription']
+    assert description['StreamViewType'] == 'NEW_AND_OLD_IMAGES'
+    records = []
+    for shard in description['Shards']:
+        iterator = streams_client.get_shard_iterator(
+            StreamArn=arn, ShardId=shard['ShardId'],
+            ShardIteratorType='TRIM_HORIZON')['ShardIterator']
+        records.extend(streams_client.get_records(
+            ShardIterator=iterator)['Records'])
+    assert [r['eventName'] for r in records] == ['INSERT', 'MODIFY',
+                                                 'REMOVE']
+    modify = records[1]['dynamodb']
+    assert modify['Keys'] == {'owner_id': {'S': 'a'}}
+    assert modify['OldImage']['balance'] == {'N': '1'}
+    assert modify['NewImage']['balance'] == {'N': '2'}
+    assert 'NewImage' not in records[2]['dynamodb']
+
+
+def test_drain(accounts, arn, streams_client):
+    write_accounts(accounts)
+    collector = Collector()
+    consumer = streams.StreamConsumer(Account, streams_client, arn,
+                                      collector, batch_size=5)
+    assert consumer.drain() == 31
+    assert all(len(batch) <= 5 for batch in collector.batches)
+    assert all(len({r.shard_id for r in batch}) == 1
+               for batch in collector.batches)
+
+    balances = {}
+    for record in collector.records:
+        assert isinstance(record.keys, Account)
+        if record.event_name == 'REMOVE':
+            assert record.new is None
+            del balances[record.keys.owner_id]
+        else:
+            balances[record.new.owner_id] = record.new.balance
+    assert balances == {a.owner_id: a.balance for a in accounts.scan()}
+
+    # nothing new, then only the new records
+    assert consumer.drain() == 0
+    accounts.put(Account(owner_id='new', balance=0))
+    assert consumer.drain() == 1
+    assert collector.records[-1].keys.owner_id == 'new'
+
+
+def test_checkpoint_stores(accounts, arn, streams_client, client, tmpdir,
+                           table_prefix):
+    write_accounts(accounts)
+    checkpoint_table = table_prefix + 'StreamCheckpoints'
+    provision.create_table(
+        client, streams.TableCheckpointStore.spec(checkpoint_table))
+    try:
+        stores = [
+            lambda: streams.FileCheckpointStore(str(tmpdir / 'cp.json')),
+            lambda: streams.TableCheckpointStore(client, checkpoint_table,
+                                                 'test'),
+        ]
+        for i, make_store in enumerate(stores):
+            collector = Collector()
+            consumer = streams.StreamConsumer(
+                Account, streams_client, arn, collector,
+                checkpoints=make_store())
+            # the records of earlier iterations are included
+            assert consumer.drain() == 31 + 2 * i
+            accounts.put(Account(owner_id='later', balance=0))
+            # a new consumer with the same checkpoints resumes
+            consumer = streams.StreamConsumer(
+                Account, streams_client, arn, collector,
+                checkpoints=make_store())
+            assert consumer.drain() == 1
+            accounts.delete(Account(owner_id='later', balance=0))
+    finally:
+        provision.delete_table(client, checkpoint_table)
+
+
+def test_handler_error_keeps_checkpoint(accounts, arn, streams_client):
+    write_accounts(accounts)
+
+    def fail(batch):
+        raise RuntimeError('handler failed')
+
+    checkpoints = streams.MemoryCheckpointStore()
+    consumer = streams.StreamConsumer(Account, streams_client, arn, fail,
+                                      checkpoints=checkpoints)
+    with pytest.raises(RuntimeError):
+        consumer.drain()
+    assert checkpoints.checkpoints == {}
+
+    consumer = streams.StreamConsumer(Account, streams_client, arn,
+                                      Collector(), checkpoints=checkpoints)
+    assert consumer.drain() == 31
+
+
+def test_run(accounts, arn, streams_client):
+    collector = Collector()
+    consumer = streams.StreamConsumer(Account, streams_client, arn,
+                                      collector, poll_interval=0.01)
+    stop = threading.Event()
+    thread = threading.Thread(target=consumer.run, args=(stop,))
+    thread.start()
+    try:
+        write_accounts(accounts)
+        for _ in range(500):
+            if len(collector.records) == 31:
+                break
+            stop.wait(0.01)
+    finally:
+        stop.set()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert len(collector.records) == 31
+
+
+def test_closed_shards_end(client, accounts, arn, streams_client):
+    accounts.put(Account(owner_id='a', balance=1))
+    checkpoints = streams.MemoryCheckpointStore()
+    consumer = streams.StreamConsumer(Account, streams_client, arn,
+                                      Collector(), checkpoints=checkpoints)
+    provision.delete_table(client, accounts.name)
+    assert consumer.drain() == 1
+    assert set(checkpoints.checkpoints.values()) == {streams.SHARD_END}
+
+
+def test_overflow_chunks_skipped(client, table_prefix, streams_client):
+    table = Table(Attachment, client, name=table_prefix + 'StreamAttachment')
+    provision.create_table(client, table.spec(stream_specification=(
+        True, StreamViewType.NEW_AND_OLD_IMAGES)))
+    try:
+        table.put(Attachment(folder='f', filename='big',
+                             content=b'x' * 1000000))
+        table.put(Attachment(folder='f', filename='small', content=b'y'))
+        table.delete(table.get('f', 'big'))
+        collector = Collector()
+        consumer = streams.StreamConsumer(
+            Attachment, streams_client,
+            streams.stream_arn(client, table.name), collector, batch_size=2)
+        assert consumer.drain() == 3
+        assert [(r.event_name, r.keys.filename) for r in collector.records
+                ] == [('INSERT', 'big'), ('INSERT', 'small'),
+                      ('REMOVE', 'big')]
+        # images of overflowed items aren't decoded without their values
+        big, small, removed = collector.records
+        assert big.new is None and removed.old is None
+        assert small.new.content == b'y'
+        # the checkpoints moved past the chunk records
+        assert consumer.drain() == 0
+    finally:
+        provision.delete_table(client, table.name)
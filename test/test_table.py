@@ -0,0 +1,219 @@
+import datetime
+
+import pytest
+
+from pydynasync import attributes as A, models as M, provision
+from pydynasync.table import Table
+
+
+class Message(M.Model):
+
+    thread = A.String(hash_key=True)
+    posted = A.String(range_key=True)
+    body = A.String()
+    tags = A.StringSet(nullable=True)
+    flagged = A.Boolean(nullable=True)
+    replies = A.Integer(nullable=True)
+    edits = A.List(nullable=True)
+
+
+@pytest.fixture
+def messages(client, table_prefix):
+    table = Table(Message, client, name=table_prefix + 'TableMessage')
+    provision.create_table(client, table.spec())
+    yield table
+    provision.delete_table(client, table.name)
+
+
+def make_message(posted, **kwargs):
+    return Message(thread='t1', posted=posted, body=f'message {posted}',
+                   **kwargs)
+
+
+def test_table_requires_model(client):
+    with pytest.raises(TypeError):
+        Table(Message(), client)
+    assert Table(Message, client).name == 'Message'
+
+
+def test_put_get(messages):
+    message = make_message('2017-01-01', tags={'a', 'b'}, flagged=False,
+                           replies=3)
+    messages.put(message)
+    assert M.ModelMeta.get_changed(message) == {}
+
+    loaded = messages.get('t1', '2017-01-01')
+    assert loaded == message
+    assert loaded.tags == {'a', 'b'}
+    assert loaded.flagged is False
+    assert M.ModelMeta.get_changed(loaded) == {}
+    assert messages.get('t1', '2017-01-02') is None
+
+
+def test_put_marks_saved(messages):
+    message = make_message('2017-01-01')
+    messages.put(message)
+    message.body = 'edited'
+    assert M.ModelMeta.get_changed(message) == {'body': 'edited'}
+    messages.put(message)
+    assert M.ModelMeta.get_changed(message) == {}
+    assert messages.get('t1', '2017-01-01').body == 'edited'
+
+
+def test_put_wrong_model(messages):
+    class Other(M.Model):
+        id = A.Integer(hash_key=True)
+
+    with pytest.raises(TypeError):
+        messages.put(Other(id=1))
+
+
+def test_query_scan_delete(messages):
+    for day in range(1, 6):
+        messages.put(make_message(f'2017-01-0{day}'))
+    messages.put(Message(thread='t2', posted='2017-01-01', body='other'))
+
+    posted = [m.posted for m in messages.query('t1')]
+    assert posted == [f'2017-01-0{day}' for day in range(1, 6)]
+    posted = [m.posted for m in messages.query('t1', forward=False)]
+    assert posted == [f'2017-01-0{day}' for day in range(5, 0, -1)]
+    assert len(list(messages.scan())) == 6
+
+    messages.delete(messages.get('t1', '2017-01-03'))
+    assert messages.get('t1', '2017-01-03') is None
+    assert len(list(messages.query('t1'))) == 4
+
+
+class Reply(M.Model):
+
+    Id = A.CompositeKey(2, hash_key=True)
+    ReplyDateTime = A.DateTime(range_key=True)
+    Message = A.String(nullable=True)
+
+
+def test_query_range_conditions(messages, client, table_prefix):
+    for day in range(1, 6):
+        messages.put(make_message(f'2017-01-0{day}'))
+    messages.put(make_message('2017-02-01'))
+
+    def posted(*args, **kwargs):
+        return [m.posted for m in messages.query('t1', *args, **kwargs)]
+
+    assert posted('between', '2017-01-02', '2017-01-04') == [
+        '2017-01-02', '2017-01-03', '2017-01-04']
+    assert posted('begins_with', '2017-02') == ['2017-02-01']
+    assert posted('>', '2017-01-04', forward=False) == [
+        '2017-02-01', '2017-01-05']
+    with pytest.raises(TypeError):
+        messages.query('t1', 'between', '2017-01-02')
+    with pytest.raises(TypeError):
+        messages.query('t1', None, '2017-01-02')
+    with pytest.raises(ValueError):
+        messages.query('t1', '!=', '2017-01-02')
+
+    replies = Table(Reply, client, name=table_prefix + 'TableReply')
+    provision.create_table(client, replies.spec())
+    try:
+        thread = ('Amazon DynamoDB', 'DynamoDB Thread 1')
+        start = datetime.datetime(2015, 9, 1, tzinfo=datetime.timezone.utc)
+        for day in range(0, 30, 3):
+            replies.put(Reply(Id=thread, Message=str(day),
+                              ReplyDateTime=start + datetime.timedelta(day)))
+        week = [r.Message for r in replies.query(
+            thread, 'between', start + datetime.timedelta(7),
+            start + datetime.timedelta(14))]
+        assert week == ['9', '12']
+        assert len(list(replies.query(thread, 'begins_with', '2015-09-1'))
+                   ) == 4
+    finally:
+        provision.delete_table(client, replies.name)
+
+
+def test_update(messages):
+    message = make_message('2017-01-01', tags={'a'}, replies=1)
+    messages.put(message)
+    message.body = 'edited'
+    message.replies = None
+    messages.update(message)
+    assert M.ModelMeta.get_changed(message) == {}
+
+    loaded = messages.get('t1', '2017-01-01')
+    assert (loaded.body, loaded.tags, loaded.replies) == ('edited', {'a'},
+                                                          None)
+
+    # an update creates the item if needed
+    created = Message(thread='t1', posted='2017-01-02')
+    created.body = 'new'
+    messages.update(created)
+    assert messages.get('t1', '2017-01-02').body == 'new'
+
+
+class RecordingClient:
+
+    def __init__(self, client):
+        self.client = client
+        self.updates = []
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+        return self.client.update_item(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def test_update_deltas(messages):
+    client = RecordingClient(messages.client)
+    messages = Table(Message, client, name=messages.name)
+    tags = {f'tag{i}' for i in range(10)}
+    messages.put(make_message('2017-01-01', tags=tags,
+                              edits=['a', 'b']))
+    message = messages.get('t1', '2017-01-01')
+
+    message.tags.add('new')
+    message.edits.append('c')
+    messages.update(message)
+    update = client.updates[-1]
+    assert update['UpdateExpression'] == (
+        'SET #u0 = list_append(#u0, :u0) ADD #u1 :u1')
+    assert update['ExpressionAttributeValues'] == {
+        ':u0': {'L': [{'S': 'c'}]}, ':u1': {'SS': ['new']},
+    }
+
+    message.tags.discard('tag0')
+    messages.update(message)
+    assert client.updates[-1]['UpdateExpression'] == 'DELETE #u0 :u0'
+
+    loaded = messages.get('t1', '2017-01-01')
+    assert loaded.tags == tags - {'tag0'} | {'new'}
+    assert loaded.edits == ['a', 'b', 'c']
+
+    # adding and removing, removing most elements, or changing other than
+    # by appending writes the whole value
+    loaded.tags.add('x')
+    loaded.tags.discard('tag1')
+    loaded.edits[0] = 'edited'
+    messages.update(loaded)
+    assert client.updates[-1]['UpdateExpression'] == \
+        'SET #u0 = :u0, #u1 = :u1'
+    loaded.tags -= {f'tag{i}' for i in range(2, 8)}
+    messages.update(loaded)
+    assert client.updates[-1]['UpdateExpression'] == 'SET #u0 = :u0'
+    message = messages.get('t1', '2017-01-01')
+    assert (message.tags, message.edits) == (loaded.tags, loaded.edits)
+
+    # deleting the last elements removes the attribute
+    message.tags.difference_update(set(message.tags))
+    messages.update(message)
+    assert client.updates[-1]['UpdateExpression'] == 'DELETE #u0 :u0'
+    assert messages.get('t1', '2017-01-01').tags is None
+
+
+def test_projections(messages):
+    messages.put(make_message('2017-01-01', tags={'a'}, replies=2))
+    loaded = messages.get('t1', '2017-01-01', attributes=['posted', 'body'])
+    assert (loaded.thread, loaded.posted, loaded.body, loaded.tags) == (
+        None, '2017-01-01', 'message 2017-01-01', None)
+    assert [m.replies for m in messages.query(
+        't1', attributes=['replies'])] == [2]
+    assert [m.tags for m in messages.scan(attributes=['tags'])] == [{'a'}]
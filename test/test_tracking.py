@@ -0,0 +1,145 @@
+import copy
+import pickle
+
+import pytest
+
+from pydynasync import attributes as A, models as M, tracking
+
+
+class Post(M.Model):
+    id = A.Integer(hash_key=True)
+    tags = A.StringSet(nullable=True)
+    replies = A.List(nullable=True)
+    extra = A.Map(nullable=True)
+
+
+def changed(instance):
+    return set(M.ModelMeta.get_changed(instance))
+
+
+@pytest.fixture
+def post():
+    post = Post.from_item({
+        'id': {'N': '1'},
+        'tags': {'SS': ['a', 'b']},
+        'replies': {'L': [{'S': 'first'}]},
+        'extra': {'M': {'views_': {'N': '1'}}},
+    })
+    assert not changed(post)
+    return post
+
+
+def test_loaded_values_are_tracked(post):
+    assert isinstance(post.tags, tracking.TrackedSet)
+    assert isinstance(post.replies, tracking.TrackedList)
+    assert isinstance(post.extra, tracking.TrackedDict)
+    assert post.tags == {'a', 'b'}
+    assert post.replies == ['first']
+    assert post.extra == {'views_': 1}
+    assert post.tags.delta() == (set(), set())
+    assert post.replies.appended() == []
+
+
+def test_set_mutations(post):
+    post.tags.add('a')
+    assert not changed(post)
+    post.tags.add('c')
+    assert changed(post) == {'tags'}
+    post.tags.discard('a')
+    post.tags.discard('missing')
+    assert post.tags.delta() == ({'c'}, {'a'})
+    # adding back a removed element (or removing an added one) undoes it
+    post.tags |= {'a', 'd'}
+    post.tags -= {'c'}
+    assert post.tags == {'a', 'b', 'd'}
+    assert post.tags.delta() == ({'d'}, set())
+    with pytest.raises(KeyError):
+        post.tags.remove('missing')
+    with pytest.raises(TypeError):
+        post.tags.add(1)
+    assert 1 not in post.tags
+
+    post.tags &= {'a'}
+    assert post.tags.delta() is None
+
+    assert post.tags.pop() == 'a'
+    with pytest.raises(KeyError):
+        post.tags.pop()
+
+
+def test_list_mutations(post):
+    post.replies.append('second')
+    post.replies += ['third']
+    assert changed(post) == {'replies'}
+    assert post.replies.appended() == ['second', 'third']
+    post.replies[0] = 'edited'
+    assert post.replies.appended() is None
+
+
+def test_dict_mutations(post):
+    post.extra['likes'] = 2
+    assert changed(post) == {'extra'}
+    assert post.extra.replaced
+
+
+@pytest.mark.parametrize('name, update, expected', [
+    ('tags', lambda p: p.tags.__ior__({'c'}), {'a', 'b', 'c'}),
+    ('tags', lambda p: p.tags.__isub__({'a'}), {'b'}),
+    ('tags', lambda p: p.tags.__iand__({'a'}), {'a'}),
+    ('tags', lambda p: p.tags.__ixor__({'a', 'c'}), {'b', 'c'}),
+    ('replies', lambda p: p.replies.__iadd__(['second']),
+     ['first', 'second']),
+    ('replies', lambda p: p.replies.__imul__(2), ['first', 'first']),
+    ('extra', lambda p: p.extra.__ior__({'likes': 2}),
+     {'views_': 1, 'likes': 2}),
+])
+def test_in_place_operators(post, name, update, expected):
+    # as `post.tags |= {'c'}` does, assigning the same container back
+    setattr(post, name, update(post))
+    assert getattr(post, name) == expected
+    assert M.ModelMeta.get_changed(post) == {name: expected}
+
+
+def test_assignment_replaces(post):
+    tags = {'x'}
+    post.tags = tags
+    assert changed(post) == {'tags'}
+    assert post.tags.delta() is None
+    # the assigned value is copied, so changing it isn't tracked
+    tags.add('y')
+    assert post.tags == {'x'}
+
+    post.replies = None
+    assert changed(post) == {'tags', 'replies'}
+
+
+def test_saved_clears_log(post):
+    post.tags.add('c')
+    post.replies.append('second')
+    tags = post.tags
+    M.ModelMeta.set_saved(post)
+    assert not changed(post)
+    assert post.tags is tags
+    assert post.tags.delta() == (set(), set())
+    assert post.replies.appended() == []
+    post.tags.discard('c')
+    assert changed(post) == {'tags'}
+    assert post.tags.delta() == (set(), {'c'})
+
+
+def test_value_from_other_instance(post):
+    other = Post(id=2)
+    M.ModelMeta.clear_changed(other)
+    other.tags = post.tags
+    assert other.tags is not post.tags
+    post.tags.add('c')
+    assert other.tags == {'a', 'b'}
+    assert changed(other) == {'tags'}
+    assert other.tags.delta() is None
+
+
+def test_copies_are_untracked(post):
+    for value in (post.tags, post.replies, post.extra):
+        for cloned in (copy.copy(value), pickle.loads(pickle.dumps(value))):
+            assert cloned == value
+            assert not isinstance(cloned, tracking.Tracked)
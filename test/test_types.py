@@ -130,6 +130,38 @@ def test_attrtype_binary_call():
     }
 
 
+def test_attrtype_binary_buffers():
+    data = b'the quick brown fox'
+    expected = {'foo': {'B': base64.b64encode(data)}}
+    assert T.AttrType.B(foo=bytearray(data)) == expected
+    assert T.AttrType.B(foo=memoryview(data)) == expected
+
+
+def test_binary_value():
+    data = b'the quick brown fox'
+    assert T.binary_value(data) is data
+    assert T.binary_value(memoryview(data)) is data
+    assert T.binary_value(memoryview(data)[4:9]) == b'quick'
+    buf = bytearray(data)
+    assert T.binary_value(buf) is buf
+    assert T.binary_value(memoryview(buf)) is buf
+
+    with pytest.raises(TypeError):
+        T.binary_value('the quick brown fox')
+
+
+def test_attrtype_binary_client_round_trip():
+    data = b'\x00\x01\x02'
+    serialized = T.AttrType.B.to_client('b', memoryview(data))
+    assert serialized == {'b': {'B': data}}
+    assert serialized['b']['B'] is data
+    assert T.AttrType.B.from_client('b', serialized) is data
+
+    serialized = T.AttrType.BS.to_client('bs', [data, memoryview(b'abc')])
+    assert serialized == {'bs': {'BS': [data, b'abc']}}
+    assert T.AttrType.BS.from_client('bs', serialized) == {data, b'abc'}
+
+
 def test_attrtype_bool_call():
     assert T.AttrType.BOOL() == {}
 
@@ -253,8 +285,8 @@ def test_attrtype_binaryset_call():
         'top':
         {'M': {'middle': {'M': {'bottom': {'S': 'mybottom'}}}}}}),
 ])
-def test_attrtype_ddb_ops(client, test1_table, test1_spec, attr_type, value):
-    tablename = test1_spec.TableName
+def test_attrtype_ddb_ops(client, test1_table, attr_type, value):
+    tablename = test1_table['TableName']
     pk = '42'
     item = {
         'Id': {
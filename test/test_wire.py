@@ -0,0 +1,195 @@
+import base64
+import datetime
+import http.server
+import json
+import threading
+import time
+
+from botocore.exceptions import ClientError
+import pytest
+
+from pydynasync import attributes as A, memory, models as M, provision, wire
+from pydynasync.table import Table
+
+CREDENTIALS = ('AKIDEXAMPLE', 'secret')
+
+
+class Upload(M.Model):
+
+    folder = A.String(hash_key=True)
+    filename = A.String(range_key=True)
+    content = A.Binary()
+    thumbnails = A.BinarySet(nullable=True)
+    extra = A.Map(nullable=True)
+
+
+def decode_binary(value):
+    # binary values are base64-encoded in the JSON protocol
+    if isinstance(value, dict):
+        return {
+            key: (base64.b64decode(child) if key == 'B' and
+                  isinstance(child, str) else
+                  [base64.b64decode(e) for e in child] if key == 'BS' and
+                  isinstance(child, list) else decode_binary(child))
+            for key, child in value.items()
+        }
+    elif isinstance(value, list):
+        return [decode_binary(elem) for elem in value]
+    return value
+
+
+class StandIn:
+
+    """
+    A local HTTP stand-in for DynamoDB's JSON protocol, backed by a
+    MemoryClient, that can be told to throttle requests.
+    """
+
+    def __init__(self):
+        self.client = memory.MemoryClient()
+        self.requests = []
+        self.throttle = 0
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                stand_in.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+
+    def handle(self, request):
+        body = request.rfile.read(int(request.headers['Content-Length']))
+        target = request.headers['X-Amz-Target']
+        self.requests.append((dict(request.headers), body))
+        operation = target.rpartition('.')[2]
+        status, response = 200, None
+        if self.throttle:
+            self.throttle -= 1
+            status = 400
+            response = {'__type': 'com.amazonaws.dynamodb.v20120810#'
+                                  'ThrottlingException',
+                        'message': 'slow down'}
+        else:
+            method = getattr(self.client, ''.join(
+                '_' + c.lower() if c.isupper() else c
+                for c in operation).lstrip('_'))
+            try:
+                response = method(**decode_binary(json.loads(body)))
+                response.pop('ResponseMetadata', None)
+            except ClientError as e:
+                status = 400
+                response = {'__type': 'com.amazonaws.dynamodb.v20120810#' +
+                                      e.response['Error']['Code'],
+                            'message': e.response['Error']['Message']}
+        data = json.dumps(response, default=self.default).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', wire.CONTENT_TYPE)
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, datetime.datetime):
+            return obj.timestamp()
+        return base64.b64encode(obj).decode()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    stand_in = StandIn()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture
+def uploads(stand_in):
+    client = wire.WireClient(stand_in.endpoint, region='eu-west-1',
+                             credentials=CREDENTIALS)
+    table = Table(Upload, client)
+    provision.create_table(client, table.spec())
+    yield table
+    client.close()
+
+
+def test_round_trip(uploads, stand_in):
+    content = bytes(range(256))
+    upload = Upload(folder='f', filename='a.bin', content=content,
+                    thumbnails={b'small', b'large'},
+                    extra={'sizes': [1, 2], 'raw': b'\x00'})
+    uploads.put(upload)
+    headers, body = stand_in.requests[-1]
+    assert headers['X-Amz-Target'] == 'DynamoDB_20120810.PutItem'
+    assert headers['Content-Type'] == 'application/x-amz-json-1.0'
+    assert headers['Authorization'].startswith(
+        'AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/')
+    assert '/eu-west-1/dynamodb/aws4_request' in headers['Authorization']
+    sent = json.loads(body)['Item']
+    assert sent['content'] == {'B': base64.b64encode(content).decode()}
+
+    loaded = uploads.get('f', 'a.bin')
+    assert loaded.content == content
+    assert loaded.thumbnails == {b'small', b'large'}
+    assert loaded.extra == {'sizes': [1, 2], 'raw': b'\x00'}
+    assert [u.filename for u in uploads.query('f')] == ['a.bin']
+
+    raw = uploads.client.send('GetItem', {
+        'TableName': uploads.name, 'Key': Upload.make_key('f', 'a.bin')})
+    assert isinstance(raw, bytes)
+    assert json.loads(raw)['Item']['filename'] == {'S': 'a.bin'}
+
+
+def test_errors_and_retries(uploads, stand_in):
+    with pytest.raises(ClientError) as e:
+        uploads.client.describe_table(TableName='Missing')
+    assert e.value.response['Error']['Code'] == 'ResourceNotFoundException'
+    assert provision.table_status(uploads.client, 'Missing') is None
+
+    stand_in.throttle = 2
+    uploads.put(Upload(folder='f', filename='b', content=b'x'))
+    assert uploads.get('f', 'b').content == b'x'
+
+    stand_in.throttle = wire.DEFAULT_MAX_ATTEMPTS
+    with pytest.raises(ClientError) as e:
+        uploads.get('f', 'b')
+    assert e.value.response['Error']['Code'] == 'ThrottlingException'
+
+
+def test_signature_matches_botocore():
+    from botocore.auth import SigV4Auth
+    from botocore.awsrequest import AWSRequest
+    from botocore.credentials import Credentials
+
+    body = wire.encode_body({'TableName': 'T'})
+    request = AWSRequest(method='POST', url='http://localhost:8000/',
+                         data=body, headers={
+                             'Content-Type': wire.CONTENT_TYPE,
+                             'X-Amz-Target': 'DynamoDB_20120810.DescribeTable',
+                         })
+    SigV4Auth(Credentials('AKID', 'secret', 'token'), 'dynamodb',
+              'us-east-1').add_auth(request)
+    now = request.headers['X-Amz-Date']
+    headers = wire.sign({
+        'Content-Type': wire.CONTENT_TYPE,
+        'X-Amz-Target': 'DynamoDB_20120810.DescribeTable',
+    }, body, host='localhost:8000', region='us-east-1',
+        credentials=('AKID', 'secret', 'token'),
+        now=time.strptime(now, '%Y%m%dT%H%M%SZ'))
+    assert headers['Authorization'] == request.headers['Authorization']
+
+
+def test_invalid_endpoint():
+    with pytest.raises(ValueError):
+        wire.WireClient('memory://', credentials=CREDENTIALS)